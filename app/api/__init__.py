@@ -16,33 +16,60 @@
 # - Martin Ahindura 2023
 
 
+import asyncio
 import json
-import shutil
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import List, Literal, Optional, Tuple
 from uuid import UUID
 
-from fastapi import Body, Depends, FastAPI, File, HTTPException, UploadFile, status
+from fastapi import (
+    Body,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    status,
+)
 from fastapi.requests import Request
-from fastapi.responses import FileResponse, JSONResponse, Response
-from redis.client import Redis
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import ValidationError
+from redis.asyncio import Redis
 from rq import Worker
+from starlette.concurrency import run_in_threadpool
 from typing_extensions import Annotated
 
 import settings
 
 from ..libs import properties as props_lib
 from ..services.auth import service as auth_service
+from ..services.jobs import analytics as jobs_analytics
+from ..services.jobs import results as results_lib
 from ..services.jobs import service as jobs_service
-from ..services.jobs.workers.registration import job_register
+from ..services.jobs.dtos import JobPriorities
+from ..services.jobs.workers import JOB_REGISTER_TASK
+from ..utils.http import get_mss_client
 from ..utils.queues import QueuePool
 from .dependencies import (
+    get_auth_log_cache,
     get_bearer_token,
+    get_job_events_hub,
+    get_job_upload,
     get_redis_connection,
     get_valid_credentials_dep,
     get_whitelisted_ip,
 )
+from .events import JobEventsHub, stream_job_events
 from .exc import InvalidJobIdInUploadedFileError, IpNotAllowedError
+from .metrics import METRICS_MEDIA_TYPE, render_metrics
+from .properties import CachedProperties
+from .uploads import UPLOAD_FILE_FIELD, JobUpload
 
 # settings
 DEFAULT_PREFIX = settings.DEFAULT_PREFIX
@@ -52,12 +79,37 @@ LOGFILE_UPLOAD_POOL_DIRNAME = settings.LOGFILE_UPLOAD_POOL_DIRNAME
 LOGFILE_DOWNLOAD_POOL_DIRNAME = settings.LOGFILE_DOWNLOAD_POOL_DIRNAME
 JOB_UPLOAD_POOL_DIRNAME = settings.JOB_UPLOAD_POOL_DIRNAME
 
+_JSON_MEDIA_TYPE = "application/json"
+_RESULT_MEDIA_TYPES = (
+    _JSON_MEDIA_TYPE,
+    results_lib.NPY_MEDIA_TYPE,
+    results_lib.NPZ_MEDIA_TYPE,
+)
+
+# the operations that can be run on many jobs at once
+BulkJobOperation = Literal["status", "result", "cancel", "delete"]
+_MAX_BULK_JOB_IDS = 1000
+
+_DEVICE_V1_PROPERTIES = CachedProperties(props_lib.get_device_v1_info)
+_DEVICE_V2_PROPERTIES = CachedProperties(
+    props_lib.get_device_v2_info, is_versioned=False
+)
+_DEVICE_CALIBRATION_V2_PROPERTIES = CachedProperties(
+    props_lib.get_device_calibration_v2_info
+)
+
 # dependencies
 RedisDep = Annotated[Redis, Depends(get_redis_connection)]
+JobEventsHubDep = Annotated[JobEventsHub, Depends(get_job_events_hub)]
 
 
 # redis queues
-rq_queues = QueuePool(prefix=DEFAULT_PREFIX, connection=get_redis_connection())
+rq_queues = QueuePool(
+    prefix=DEFAULT_PREFIX,
+    connection=settings.REDIS_CONNECTION,
+    priority_stages=settings.PRIORITY_QUEUES,
+    aging_interval=settings.QUEUE_AGING_INTERVAL,
+)
 
 
 # application
@@ -68,6 +120,50 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+def initialize_backend_on_startup():
+    """Seeds the calibration data of this backend and sends its info to MSS
+
+    The QuantumExecutor is not constructed here. It is constructed lazily by
+    the execution worker when it runs its first job.
+    Any job entries still in the legacy job supervisor format are also migrated.
+    """
+    jobs_service.migrate_legacy_entries()
+    props_lib.initialize_backend(
+        backend_config=props_lib.get_backend_config(),
+        mss_client=get_mss_client(),
+        mss_url=settings.MSS_MACHINE_ROOT_URL,
+    )
+
+
+@app.on_event("startup")
+async def start_job_archiver():
+    """Starts moving the jobs that finished long ago to the archive, if enabled"""
+    if settings.JOB_ARCHIVE_AGE > 0:
+        app.state.job_archiver = asyncio.create_task(_archive_jobs_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_job_archiver():
+    """Stops moving the jobs that finished long ago to the archive"""
+    job_archiver: Optional[asyncio.Task] = getattr(app.state, "job_archiver", None)
+    if job_archiver is not None:
+        job_archiver.cancel()
+
+
+async def _archive_jobs_periodically():
+    """Moves the old jobs and then their auth logs to the archive at regular intervals"""
+    while True:
+        await asyncio.sleep(settings.JOB_ARCHIVE_INTERVAL)
+        try:
+            await run_in_threadpool(jobs_service.archive_jobs, settings.JOB_ARCHIVE_AGE)
+            await run_in_threadpool(
+                auth_service.archive_auth_logs, settings.REDIS_CONNECTION
+            )
+        except Exception as exp:
+            print(f"Job archiving failed: {exp}")
+
+
 @app.exception_handler(InvalidJobIdInUploadedFileError)
 async def invalid_job_id_in_file_exception_handler(
     request: Request, exp: InvalidJobIdInUploadedFileError
@@ -124,84 +220,321 @@ async def register_credentials(
 ):
     """Registers the credentials passed to it"""
     try:
-        auth_service.save_credentials(redis_connection, payload=body)
+        await auth_service.save_credentials_async(redis_connection, payload=body)
     except auth_service.JobAlreadyExists as exp:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"{exp}")
     return {"message": "ok"}
 
 
-@app.post("/jobs")
+@app.post(
+    "/jobs",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            UPLOAD_FILE_FIELD: {"type": "string", "format": "binary"}
+                        },
+                        "required": [UPLOAD_FILE_FIELD],
+                    }
+                },
+                "application/json": {"schema": {"type": "object"}},
+            },
+            "required": True,
+        }
+    },
+)
 async def upload_job(
-    upload_file: UploadFile = File(...),
+    redis_connection: RedisDep,
+    upload: JobUpload = Depends(get_job_upload),
     credentials: auth_service.Credentials = Depends(
         get_valid_credentials_dep(expected_status=auth_service.JobStatus.REGISTERED)
     ),
 ):
-    # store the received file in the job upload pool
+    """Uploads a job file for registration
+
+    The job file is either the 'upload_file' field of a multipart form or the
+    whole request body. It may be gzip, deflate or zstd encoded as indicated
+    by the 'Content-Encoding' header.
+    """
+    # the received file is already in the job upload pool
     file_name = job_id = credentials.job_id
-    file_path = Path(STORAGE_ROOT) / STORAGE_PREFIX_DIRNAME / JOB_UPLOAD_POOL_DIRNAME
-    file_path.mkdir(parents=True, exist_ok=True)
-    store_file = file_path / file_name
+    store_file = upload.path.parent / file_name
 
-    if jobs_service.does_job_exist(job_id):
+    if await jobs_service.does_job_exist_async(redis_connection, job_id):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"job_id {job_id} already exists",
         )
 
-    # save it
-    upload_file.file.seek(0)
-    with store_file.open("wb") as destination:
-        shutil.copyfileobj(upload_file.file, destination)
-    upload_file.file.close()
+    try:
+        priorities = JobPriorities.model_validate(upload.items.get("priorities") or {})
+    except ValidationError as exp:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"invalid priorities: {exp}",
+        )
 
-    # enqueue for registration
-    rq_queues.job_registration_queue.enqueue(
-        job_register,
+    await run_in_threadpool(upload.path.replace, store_file)
+
+    # enqueue for registration, with the items already extracted from the file
+    items = {key: value for key, value in upload.items.items() if key != "job_id"}
+    items["priorities"] = priorities.model_dump(by_alias=True)
+    await run_in_threadpool(
+        rq_queues.job_registration_queue.enqueue_with_priority,
+        priorities.for_stage("registration"),
+        JOB_REGISTER_TASK,
         store_file,
-        job_id=credentials.job_id + f"_{jobs_service.Location.REG_Q.name}",
+        items,
+        job_id=jobs_service.get_rq_job_id(job_id, jobs_service.Location.REG_Q),
     )
     return {"message": file_name}
 
 
+@app.get("/analytics/stages", dependencies=[Depends(get_whitelisted_ip)])
+async def fetch_stage_analytics(window: float = Query(3600.0, gt=0)):
+    """Returns the percentiles of the queue wait and processing time of each stage
+
+    They are computed from the transitions of the jobs in the last 'window' seconds,
+    along with the throughput of finished jobs.
+    """
+    return await run_in_threadpool(jobs_analytics.compute_stage_percentiles, window)
+
+
 @app.get("/jobs", dependencies=[Depends(get_whitelisted_ip)])
-async def fetch_all_jobs():
-    return jobs_service.fetch_all_jobs()
+async def fetch_all_jobs(
+    response: Response,
+    redis_connection: RedisDep,
+    location: Optional[str] = None,
+    state: Optional[jobs_service.JobState] = None,
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Returns a page of the jobs, oldest first
+
+    The cursor of the next page, if any, is returned in the 'X-Next-Cursor' header.
+    """
+    try:
+        location_filter = None if location is None else jobs_service.Location[location]
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"unknown location '{location}'",
+        )
+
+    try:
+        jobs, next_cursor = await jobs_service.list_jobs_async(
+            redis_connection,
+            location=location_filter,
+            state=state,
+            since=since,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exp:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{exp}")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
+
+
+@app.post("/jobs/bulk/{operation}")
+async def run_bulk_job_operation(
+    operation: BulkJobOperation,
+    redis_connection: RedisDep,
+    job_ids: List[str] = Body(..., embed=True, max_length=_MAX_BULK_JOB_IDS),
+    reason: Optional[str] = Body(None, embed=True),
+    app_token: Optional[str] = Depends(get_bearer_token),
+    auth_cache: Optional[auth_service.AuthLogCache] = Depends(get_auth_log_cache),
+):
+    """Gets the status or result of, cancels, or deletes many jobs at once
+
+    The body is of the form {"job_ids": [...], "reason": "..."}, the reason
+    being used only when cancelling. The jobs are authenticated, read and
+    updated in a handful of round trips to redis however many they are.
+
+    The response maps each job id to what the endpoint of that operation on that
+    single job would return i.e. {"message": ...} or, if the credentials are not
+    valid for that job, {"detail": ...}
+    """
+    requested_job_ids = list(dict.fromkeys(job_ids))
+    errors = await auth_service.authenticate_many_async(
+        redis_connection,
+        credentials=[
+            auth_service.Credentials(job_id=job_id, app_token=f"{app_token}")
+            for job_id in requested_job_ids
+        ],
+        cache=auth_cache,
+    )
+    response = {
+        job_id: {"detail": f"{error}"}
+        for job_id, error in zip(requested_job_ids, errors)
+        if error is not None
+    }
+    job_ids = [job_id for job_id in requested_job_ids if job_id not in response]
+
+    if operation == "status":
+        entries = await jobs_service.fetch_jobs_async(
+            redis_connection, job_ids, keys=["status"], format=True
+        )
+        messages = {job_id: entry["status"] for job_id, entry in entries.items()}
+    elif operation == "result":
+        entries = await jobs_service.fetch_jobs_async(
+            redis_connection, job_ids, keys=["status.finished", "result"]
+        )
+        messages = {
+            job_id: entry.get("result")
+            if entry["status"].get("finished")
+            else "job has not finished"
+            for job_id, entry in entries.items()
+        }
+    elif operation == "cancel":
+        # rq has no async API so cancelling runs in a thread
+        outcomes = await run_in_threadpool(jobs_service.cancel_jobs, job_ids, reason)
+        messages = {
+            job_id: "job cancelled" if is_cancelled else "job has finished"
+            for job_id, is_cancelled in outcomes.items()
+        }
+    else:
+        removed_job_ids = await run_in_threadpool(jobs_service.remove_jobs, job_ids)
+        messages = {job_id: "job deleted" for job_id in removed_job_ids}
+
+    for job_id in job_ids:
+        response[job_id] = {"message": messages.get(job_id, f"job {job_id} not found")}
+    return {job_id: response[job_id] for job_id in requested_job_ids}
 
 
 @app.get("/jobs/{job_id}", dependencies=[Depends(get_valid_credentials_dep())])
-async def fetch_job(job_id: str):
-    job = jobs_service.fetch_job(job_id)
+async def fetch_job(job_id: str, redis_connection: RedisDep):
+    job = await jobs_service.fetch_job_async(redis_connection, job_id)
     return {"message": job or f"job {job_id} not found"}
 
 
 @app.get("/jobs/{job_id}/status", dependencies=[Depends(get_valid_credentials_dep())])
-async def fetch_job_status(job_id: str):
-    job_status = jobs_service.fetch_job(job_id, "status", format=True)
+async def fetch_job_status(job_id: str, redis_connection: RedisDep):
+    job_status = await jobs_service.fetch_job_async(
+        redis_connection, job_id, "status", format=True
+    )
     return {"message": job_status or f"job {job_id} not found"}
 
 
 @app.get("/jobs/{job_id}/result", dependencies=[Depends(get_valid_credentials_dep())])
-async def fetch_job_result(job_id: str):
-    job = jobs_service.fetch_job(job_id)
+async def fetch_job_result(
+    job_id: str,
+    redis_connection: RedisDep,
+    response: Response,
+    accept: Optional[str] = Header(None),
+):
+    """Returns the result of the job in the format negotiated by the 'Accept' header
+
+    The result is JSON by default. With 'application/x-npy', its memory is returned
+    as a 2D NumPy array of the outcomes of the experiments by shots, and with
+    'application/x-npz', as one NumPy array per experiment named 'experiment_{index}'.
+    If the job is not found or has not finished, a JSON message is returned
+    whatever the format.
+    """
+    # the response varies with the 'Accept' header whatever its format
+    response.headers["Vary"] = "Accept"
+    media_type = _negotiate_media_type(accept, _RESULT_MEDIA_TYPES)
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"result available as {', '.join(_RESULT_MEDIA_TYPES)}",
+            headers={"Vary": "Accept"},
+        )
 
-    if not job:
+    if media_type == _JSON_MEDIA_TYPE:
+        job = await jobs_service.fetch_job_async(redis_connection, job_id)
+
+        if not job:
+            return {"message": f"job {job_id} not found"}
+        elif job["status"]["finished"]:
+            return {"message": job["result"]}
+        else:
+            return {"message": "job has not finished"}
+
+    try:
+        memory = await jobs_service.fetch_result_memory_async(redis_connection, job_id)
+    except jobs_service.JobNotFound:
         return {"message": f"job {job_id} not found"}
-    elif job["status"]["finished"]:
-        return {"message": job["result"]}
-    else:
+
+    if memory is None:
         return {"message": "job has not finished"}
 
+    if media_type == results_lib.NPY_MEDIA_TYPE:
+        try:
+            content = await run_in_threadpool(results_lib.to_npy, memory)
+        except ValueError as exp:
+            raise HTTPException(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                detail=f"{exp}, use {results_lib.NPZ_MEDIA_TYPE}",
+                headers={"Vary": "Accept"},
+            )
+    else:
+        content = await run_in_threadpool(results_lib.to_npz, memory)
+
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
+
+@app.get("/jobs/{job_id}/events", dependencies=[Depends(get_valid_credentials_dep())])
+async def push_job_events(
+    job_id: str, request: Request, redis_connection: RedisDep, hub: JobEventsHubDep
+):
+    """Pushes the status of the job on each change, then its result, as Server-Sent Events
+
+    This is an alternative to polling '/jobs/{job_id}/status' and '/jobs/{job_id}/result'
+    """
+    return StreamingResponse(
+        stream_job_events(request, redis_connection, hub=hub, job_id=job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.delete("/jobs/{job_id}", dependencies=[Depends(get_valid_credentials_dep())])
 async def remove_job(job_id: str):
-    jobs_service.remove_job(job_id)
+    # rq has no async API so removing, which cancels the rq jobs, runs in a thread
+    await run_in_threadpool(jobs_service.remove_job, job_id)
 
 
 @app.post("/jobs/{job_id}/cancel", dependencies=[Depends(get_valid_credentials_dep())])
 async def cancel_job(job_id: str, reason: Optional[str] = Body(None, embed=False)):
     print(f"Cancelling job {job_id}")
-    jobs_service.cancel_job(job_id, reason)
+    # rq has no async API so cancelling runs in a thread
+    await run_in_threadpool(jobs_service.cancel_job, job_id, reason)
+
+
+@app.put(
+    "/jobs/{job_id}/priorities", dependencies=[Depends(get_valid_credentials_dep())]
+)
+async def update_job_priorities(job_id: str, priorities: JobPriorities):
+    """Sets the global and local priorities of the job
+
+    If the job is waiting in a queue that dispatches by priority,
+    it is moved to its new place in that queue.
+    """
+    try:
+        location = await run_in_threadpool(
+            jobs_service.set_priorities, job_id, priorities
+        )
+    except jobs_service.JobNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"job {job_id} not found"
+        )
+
+    stage = jobs_service.QUEUE_STAGES.get(location)
+    if stage is not None:
+        await run_in_threadpool(
+            rq_queues.get_queue(stage).set_priority,
+            jobs_service.get_rq_job_id(job_id, location),
+            priorities.for_stage(stage),
+        )
+
+    return {"message": priorities.model_dump(by_alias=True)}
 
 
 @app.get(
@@ -217,7 +550,7 @@ async def download_logfile(logfile_id: UUID):
         / file_name
     )
 
-    if file.exists():
+    if await run_in_threadpool(file.exists):
         return FileResponse(file)
     else:
         return {"message": "logfile not found"}
@@ -225,8 +558,8 @@ async def download_logfile(logfile_id: UUID):
 
 # FIXME: this endpoint might be unnecessary going forward or might need to return proper JSON data
 @app.get("/rq-info", dependencies=[Depends(get_whitelisted_ip)])
-async def get_rq_info(redis_connection: RedisDep):
-    workers = Worker.all(connection=redis_connection)
+async def get_rq_info():
+    workers = await run_in_threadpool(Worker.all, connection=settings.REDIS_CONNECTION)
     print(str(workers))
     if len(workers) == 0:
         return {"message": "No worker registered"}
@@ -240,30 +573,81 @@ async def get_rq_info(redis_connection: RedisDep):
     return {"message": msg}
 
 
+@app.get("/metrics", dependencies=[Depends(get_whitelisted_ip)])
+async def get_metrics():
+    """Returns the metrics of the queues, the workers and the stages of jobs
+
+    The metrics are in the Prometheus text exposition format.
+    """
+    metrics = await run_in_threadpool(render_metrics, rq_queues)
+    return Response(content=metrics, media_type=METRICS_MEDIA_TYPE)
+
+
 @app.get("/backend_properties", dependencies=[Depends(get_whitelisted_ip)])
-async def create_current_snapshot():
-    return props_lib.get_device_v1_info()
+async def create_current_snapshot(request: Request, redis_connection: RedisDep):
+    return await _DEVICE_V1_PROPERTIES.get_response(request, redis_connection)
 
 
 @app.get("/v2/static-properties", dependencies=[Depends(get_whitelisted_ip)])
-async def create_current_snapshot():
-    return props_lib.get_device_v2_info()
+async def create_current_snapshot(request: Request, redis_connection: RedisDep):
+    return await _DEVICE_V2_PROPERTIES.get_response(request, redis_connection)
 
 
 @app.get("/v2/dynamic-properties", dependencies=[Depends(get_whitelisted_ip)])
-async def create_current_snapshot():
-    return props_lib.get_device_calibration_v2_info()
+async def create_current_snapshot(request: Request, redis_connection: RedisDep):
+    return await _DEVICE_CALIBRATION_V2_PROPERTIES.get_response(
+        request, redis_connection
+    )
 
 
 # FIXME: this endpoint might be unnecessary
 @app.get("/web-gui", dependencies=[Depends(get_whitelisted_ip)])
 async def get_snapshot(redis_connection: RedisDep):
-    snapshot = redis_connection.get("current_snapshot")
+    snapshot = await redis_connection.get("current_snapshot")
     return json.loads(snapshot)
 
 
 # FIXME: this endpoint might be unnecessary
 @app.get("/web-gui/config", dependencies=[Depends(get_whitelisted_ip)])
 async def web_config(redis_connection: RedisDep):
-    snapshot = redis_connection.get("config")
+    snapshot = await redis_connection.get("config")
     return json.loads(snapshot)
+
+
+def _negotiate_media_type(
+    accept: Optional[str], available: Tuple[str, ...]
+) -> Optional[str]:
+    """Chooses the media type to respond with given the 'Accept' header of the request
+
+    Args:
+        accept: the value of the 'Accept' header, if any
+        available: the available media types, the first one being the default
+
+    Returns:
+        the available media type with the highest quality in the header,
+        or None if none is acceptable
+    """
+    if not accept:
+        return available[0]
+
+    best_media_type, best_quality = None, 0.0
+    for media_range in accept.split(","):
+        media_range, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        # wildcards match the first available media type i.e. the default
+        for media_type in available:
+            main_type = media_type.split("/")[0]
+            if media_range in (media_type, "*/*", f"{main_type}/*"):
+                if quality > best_quality:
+                    best_media_type, best_quality = media_type, quality
+                break
+
+    return best_media_type
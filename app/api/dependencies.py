@@ -10,23 +10,114 @@
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
 """Dependencies useful for the FastAPI API"""
-import json
-from typing import Optional
+import asyncio
+import weakref
+from pathlib import Path
+from typing import AsyncIterator, Optional
 
-from fastapi import Depends, HTTPException, UploadFile, status
+from fastapi import Depends, HTTPException, status
 from fastapi.requests import Request
-from redis import Redis
+from redis.asyncio import Redis
+from starlette.concurrency import run_in_threadpool
 
 import settings
 
 from ..services import auth as auth_service
 from ..utils.uuid import validate_uuid4_str
+from .events import JobEventsHub
 from .exc import InvalidJobIdInUploadedFileError, IpNotAllowedError
+from .uploads import JobUpload, receive_job_upload
 
+# the top-level items of an uploaded job that are extracted while receiving it
+JOB_UPLOAD_ITEMS = (
+    "job_id",
+    "name",
+    "is_calibration_supervisor_job",
+    "post_processing",
+    "priorities",
+)
 
-def get_redis_connection():
-    """Returns a redis connection"""
-    return settings.REDIS_CONNECTION
+
+# async redis clients can only be used in the event loop they were created in
+_ASYNC_REDIS_CONNECTIONS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def get_redis_connection() -> Redis:
+    """Returns the async redis connection of the current event loop
+
+    The connection is created with its own connection pool the first time
+    it is requested in a given event loop.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return _ASYNC_REDIS_CONNECTIONS[loop]
+    except KeyError:
+        connection = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            username=settings.REDIS_USER,
+            password=settings.REDIS_PASSWORD,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+        )
+        _ASYNC_REDIS_CONNECTIONS[loop] = connection
+        return connection
+
+
+_JOB_EVENTS_HUBS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, JobEventsHub]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+_AUTH_LOG_CACHES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, auth_service.AuthLogCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def get_auth_log_cache(
+    redis_connection: Redis = Depends(get_redis_connection),
+) -> Optional[auth_service.AuthLogCache]:
+    """Returns the cache of the auth logs of the current event loop
+
+    Args:
+        redis_connection: the async redis connection of the current event loop
+
+    Returns:
+        the cache or None if it is disabled in the settings
+    """
+    if settings.AUTH_CACHE_TTL <= 0 or settings.AUTH_CACHE_MAX_SIZE <= 0:
+        return None
+
+    loop = asyncio.get_running_loop()
+    try:
+        return _AUTH_LOG_CACHES[loop]
+    except KeyError:
+        cache = auth_service.AuthLogCache(
+            redis_connection,
+            max_size=settings.AUTH_CACHE_MAX_SIZE,
+            ttl=settings.AUTH_CACHE_TTL,
+        )
+        _AUTH_LOG_CACHES[loop] = cache
+        return cache
+
+
+async def get_job_events_hub(
+    redis_connection: Redis = Depends(get_redis_connection),
+) -> JobEventsHub:
+    """Returns the hub of the job events of the current event loop
+
+    Args:
+        redis_connection: the async redis connection of the current event loop
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return _JOB_EVENTS_HUBS[loop]
+    except KeyError:
+        hub = JobEventsHub(redis_connection)
+        _JOB_EVENTS_HUBS[loop] = hub
+        return hub
 
 
 def get_job_id_dependency(job_id_field: str):
@@ -58,6 +149,26 @@ def get_job_id_dependency(job_id_field: str):
     return get_job_id
 
 
+async def get_job_upload(request: Request) -> AsyncIterator[JobUpload]:
+    """Streams the uploaded job file into the job upload pool
+
+    The file is deleted after the response unless the endpoint has moved it.
+    Endpoints must declare this dependency before any that gets the job_id
+    from the uploaded file so that the file is deleted even if those fail.
+
+    Args:
+        request: the FastAPI request object
+
+    Returns:
+        the received job file and its extracted items
+    """
+    upload = await _get_or_receive_job_upload(request)
+    try:
+        yield upload
+    finally:
+        await run_in_threadpool(upload.discard)
+
+
 async def get_job_id_from_uploaded_file(
     request: Request, job_id_field: str
 ) -> Optional[str]:
@@ -73,12 +184,9 @@ async def get_job_id_from_uploaded_file(
     Raises:
         InvalidJobIdInUploadedFileError: f"The job does not have a valid UUID4 {job_id_field}"
     """
+    upload = await _get_or_receive_job_upload(request)
     try:
-        form = await request.form()
-        upload_file: UploadFile = form["upload_file"]
-        job_dict = json.load(upload_file.file)
-
-        job_id = job_dict[job_id_field]
+        job_id = upload.items[job_id_field]
         if validate_uuid4_str(job_id):
             return job_id
     except KeyError:
@@ -89,6 +197,32 @@ async def get_job_id_from_uploaded_file(
     raise InvalidJobIdInUploadedFileError(error_message)
 
 
+async def _get_or_receive_job_upload(request: Request) -> JobUpload:
+    """Returns the job file uploaded in this request, receiving it the first time
+
+    Args:
+        request: the FastAPI request object
+
+    Returns:
+        the received job file and its extracted items
+    """
+    try:
+        return request.state.job_upload
+    except AttributeError:
+        upload_pool = (
+            Path(settings.STORAGE_ROOT)
+            / settings.STORAGE_PREFIX_DIRNAME
+            / settings.JOB_UPLOAD_POOL_DIRNAME
+        )
+        request.state.job_upload = await receive_job_upload(
+            request,
+            directory=upload_pool,
+            keys=JOB_UPLOAD_ITEMS,
+            max_bytes=settings.JOB_UPLOAD_MAX_BYTES,
+        )
+        return request.state.job_upload
+
+
 def get_whitelisted_ip(request: Request) -> str:
     """Returns the whitelisted IP if exists or raises a IpNotAllowedError
 
@@ -119,10 +253,11 @@ def get_valid_credentials_dep(
         job_id_field: the name of the parameter or field that contains the job_id. Default is 'job_id'
     """
 
-    def dependency_injector(
+    async def dependency_injector(
         redis_connection: Redis = Depends(get_redis_connection),
         job_id: str = Depends(get_job_id_dependency(job_id_field=job_id_field)),
         app_token: Optional[str] = Depends(get_bearer_token),
+        cache: Optional[auth_service.AuthLogCache] = Depends(get_auth_log_cache),
     ) -> auth_service.Credentials:
         """Gets a valid app_token-job_id pair with the expected job status.
 
@@ -130,6 +265,7 @@ def get_valid_credentials_dep(
             job_id: the job_id as got from the parameters or from the uploaded file
             redis_connection: the connection to the redis database
             app_token: the app_token as got from the FastAPI request
+            cache: the in-process cache of the auth logs, if enabled
 
         Raises:
             HTTPException: status_code=401, detail=job {credentials.job_id} does not exist for current user
@@ -138,10 +274,11 @@ def get_valid_credentials_dep(
         """
         credentials = auth_service.Credentials(job_id=job_id, app_token=f"{app_token}")
         try:
-            auth_service.authenticate(
+            await auth_service.authenticate_async(
                 redis_connection,
                 credentials=credentials,
                 expected_status=expected_status,
+                cache=cache,
             )
         except auth_service.AuthenticationError as exp:
             raise HTTPException(
@@ -0,0 +1,177 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Push of job events to API clients as Server-Sent Events"""
+import asyncio
+import contextlib
+import json
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from fastapi.requests import Request
+from redis.asyncio import Redis
+
+from ..services.jobs import service as jobs_service
+from ..utils.redis import listen
+
+
+class JobEventsHub:
+    """Fans out the job events published on redis to the subscribers in this process
+
+    A single pattern subscription to the channels of all jobs is shared by all
+    the subscribers of the event loop, so each subscriber does not hold a
+    redis connection of its own.
+
+    Subscribers receive the JSON string of each event of their job in a queue.
+    They receive None if events might have been missed while the pub/sub
+    connection was lost, so that they can refetch the state of the job.
+    """
+
+    def __init__(self, redis_db: Redis):
+        self._redis_db = redis_db
+        self._queues: Dict[str, Set["asyncio.Queue[Optional[str]]"]] = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+        self._is_listening = asyncio.Event()
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator["asyncio.Queue"]:
+        """Subscribes to the events of the given job
+
+        The subscription is active when this returns, so no event published
+        afterwards is missed.
+
+        Args:
+            job_id: the id of the job
+
+        Returns:
+            an async context manager of the queue receiving the events of the job
+        """
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        self._queues[job_id].add(queue)
+        try:
+            if self._listener is None or self._listener.done():
+                self._is_listening.clear()
+                self._listener = asyncio.create_task(self._listen())
+            await self._is_listening.wait()
+            yield queue
+        finally:
+            self._queues[job_id].discard(queue)
+            if not self._queues[job_id]:
+                del self._queues[job_id]
+
+    async def _listen(self):
+        """Receives the events of all jobs and dispatches them to the subscribers"""
+        await listen(
+            self._redis_db,
+            f"{jobs_service.JOB_EVENTS_CHANNEL_PREFIX}*",
+            on_message=self._dispatch,
+            on_subscribed=self._is_listening.set,
+            on_lost=self._on_subscription_lost,
+            is_pattern=True,
+        )
+
+    def _dispatch(self, channel: bytes, data: bytes):
+        """Passes the event of a job to the subscribers of the job
+
+        Args:
+            channel: the channel of the job on which the event was published
+            data: the JSON string of the event
+        """
+        job_id = channel.decode("utf-8")[len(jobs_service.JOB_EVENTS_CHANNEL_PREFIX) :]
+        for queue in self._queues.get(job_id, ()):
+            queue.put_nowait(data.decode("utf-8"))
+
+    def _on_subscription_lost(self, exp: Exception):
+        """Has the subscribers refetch their jobs since events may have been missed
+
+        Args:
+            exp: the exception by which the subscription was lost
+        """
+        print(f"Job events subscription lost: {exp}")
+        self._is_listening.clear()
+        for queues in self._queues.values():
+            for queue in queues:
+                queue.put_nowait(None)
+
+
+async def stream_job_events(
+    request: Request,
+    redis_db: Redis,
+    hub: JobEventsHub,
+    job_id: str,
+    keepalive_interval: float = 15.0,
+) -> AsyncIterator[str]:
+    """Streams the status of the job, then its result, as Server-Sent Events
+
+    A 'status' event is sent with the current status of the job and then each time
+    the job changes location or state. When the job finishes, a 'result' event is
+    sent with its result and the stream ends. It also ends if the job fails or
+    is cancelled. A comment is sent every `keepalive_interval` seconds without events.
+
+    Args:
+        request: the FastAPI request object
+        redis_db: the async redis connection
+        hub: the hub of the job events
+        job_id: the id of the job
+        keepalive_interval: the seconds without events after which a comment is sent
+
+    Returns:
+        an async iterator of the Server-Sent Events
+    """
+    async with hub.subscribe(job_id) as events:
+        while True:
+            try:
+                status = await jobs_service.fetch_job_async(
+                    redis_db, job_id, "status", format=True
+                )
+            except jobs_service.JobNotFound:
+                # the job is not registered yet
+                status = None
+
+            if status is not None:
+                yield _format_event("status", status)
+
+                if status["finished"]:
+                    result = await jobs_service.fetch_job_async(
+                        redis_db, job_id, "result"
+                    )
+                    yield _format_event("result", result)
+                    return
+
+                if status["failed"]["time"] or status["cancelled"]["time"]:
+                    return
+
+            while True:
+                try:
+                    await asyncio.wait_for(events.get(), timeout=keepalive_interval)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                # coalesce the events that arrived in the meantime into one refetch
+                while not events.empty():
+                    events.get_nowait()
+                break
+
+
+def _format_event(event: str, data: Any) -> str:
+    """Formats the data as a Server-Sent Event
+
+    Args:
+        event: the name of the event
+        data: the JSON-serializable data of the event
+
+    Returns:
+        the Server-Sent Event as a string
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
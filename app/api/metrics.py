@@ -0,0 +1,189 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Metrics of the queues, the workers and the stages of jobs in Prometheus text format"""
+import time
+from typing import Dict, List, Tuple
+
+from rq import Queue, Worker
+from rq.job import Job
+from rq.utils import utcparse
+
+from ..services.jobs import service as jobs_service
+from ..services.jobs.service import TIMED_LOCATION_STAGES
+from ..utils.queues import QueuePool
+from ..utils.redis import to_str
+
+# the charset is appended by the response
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+# The histogram and its help text of each kind of time jobs spend at a location
+_HISTOGRAMS: Dict[str, Tuple[str, str]] = {
+    "queue_wait": (
+        "bcc_job_queue_wait_seconds",
+        "Seconds jobs waited in the queue of each stage",
+    ),
+    "processing": (
+        "bcc_job_processing_seconds",
+        "Seconds jobs were processed in each stage",
+    ),
+}
+
+
+def render_metrics(queue_pool: QueuePool) -> str:
+    """Renders the current metrics in Prometheus text exposition format
+
+    The queue depths, the ages of the oldest queued jobs and the states of the workers
+    are read from redis on each call. The histograms of the stages are those
+    accumulated by the job supervisor so no jobs are scanned.
+
+    Args:
+        queue_pool: the pool of the queues of BCC
+
+    Returns:
+        the metrics as text
+    """
+    queues = [
+        queue_pool.job_registration_queue,
+        queue_pool.job_preprocessing_queue,
+        queue_pool.job_execution_queue,
+        queue_pool.logfile_postprocessing_queue,
+    ]
+    lines: List[str] = []
+    lines.extend(_render_queues(queue_pool, queues))
+    lines.extend(_render_workers(queue_pool))
+    lines.extend(_render_stage_durations())
+    return "\n".join(lines) + "\n"
+
+
+def _render_queues(queue_pool: QueuePool, queues: List[Queue]) -> List[str]:
+    """Renders the depth and the age of the oldest job of each queue
+
+    Args:
+        queue_pool: the pool of the queues of BCC
+        queues: the queues to report on
+
+    Returns:
+        the lines of the metrics
+    """
+    with queue_pool.connection.pipeline() as pipe:
+        for queue in queues:
+            pipe.llen(queue.key)
+            pipe.lindex(queue.key, 0)
+        replies = pipe.execute()
+
+    depths = replies[0::2]
+    oldest_job_ids = [to_str(job_id) for job_id in replies[1::2]]
+
+    queued_job_ids = [job_id for job_id in oldest_job_ids if job_id]
+    with queue_pool.connection.pipeline() as pipe:
+        for job_id in queued_job_ids:
+            pipe.hget(Job.key_for(job_id), "enqueued_at")
+        enqueued_at_map = dict(zip(queued_job_ids, pipe.execute()))
+
+    now = time.time()
+    depth_lines = _header("bcc_queue_depth", "gauge", "Number of jobs in the queue")
+    age_lines = _header(
+        "bcc_queue_oldest_job_age_seconds",
+        "gauge",
+        "Seconds since the oldest job in the queue was enqueued",
+    )
+    for queue, depth, job_id in zip(queues, depths, oldest_job_ids):
+        labels = _labels(queue=queue.name)
+        depth_lines.append(f"bcc_queue_depth{labels} {depth}")
+
+        age = 0.0
+        enqueued_at = enqueued_at_map.get(job_id)
+        if enqueued_at:
+            enqueued_epoch = utcparse(to_str(enqueued_at)).timestamp()
+            age = max(now - enqueued_epoch, 0.0)
+        age_lines.append(f"bcc_queue_oldest_job_age_seconds{labels} {age:.3f}")
+
+    return depth_lines + age_lines
+
+
+def _render_workers(queue_pool: QueuePool) -> List[str]:
+    """Renders whether each registered worker is busy
+
+    Args:
+        queue_pool: the pool of the queues of BCC
+
+    Returns:
+        the lines of the metrics
+    """
+    lines = _header(
+        "bcc_worker_busy", "gauge", "1 if the worker is processing a job else 0"
+    )
+    for worker in Worker.all(connection=queue_pool.connection):
+        labels = _labels(worker=worker.name, queues=",".join(worker.queue_names()))
+        is_busy = worker.get_state() == "busy"
+        lines.append(f"bcc_worker_busy{labels} {int(is_busy)}")
+
+    return lines
+
+
+def _render_stage_durations() -> List[str]:
+    """Renders the histograms of the queue wait and the processing time of each stage
+
+    Returns:
+        the lines of the metrics
+    """
+    durations = jobs_service.fetch_location_durations()
+    bounds = [*(f"{bound}" for bound in jobs_service.LOCATION_DURATION_BUCKETS), "+Inf"]
+    empty_histogram = ([0] * len(bounds), 0.0)
+
+    lines: List[str] = []
+    for kind, (name, help_text) in _HISTOGRAMS.items():
+        lines.extend(_header(name, "histogram", help_text))
+        for location, (stage, location_kind) in TIMED_LOCATION_STAGES.items():
+            if location_kind != kind:
+                continue
+
+            counts, total = durations.get(location, empty_histogram)
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _labels(stage=stage, le=bound)
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(stage=stage)} {total}")
+            lines.append(f"{name}_count{_labels(stage=stage)} {cumulative}")
+
+    return lines
+
+
+def _header(name: str, metric_type: str, help_text: str) -> List[str]:
+    """Returns the HELP and TYPE lines of a metric
+
+    Args:
+        name: the name of the metric
+        metric_type: the Prometheus type of the metric e.g. 'gauge'
+        help_text: the description of the metric
+    """
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+
+def _labels(**labels: str) -> str:
+    """Formats the labels of a sample, escaping their values
+
+    Args:
+        labels: the names and values of the labels
+    """
+    items = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return f"{{{items}}}"
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value as required by the Prometheus text format
+
+    Args:
+        value: the label value
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
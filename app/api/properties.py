@@ -0,0 +1,103 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""In-process cache of the device properties served by the API, with ETag support"""
+import hashlib
+from typing import Callable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.requests import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from starlette.concurrency import run_in_threadpool
+
+from ..libs import properties as props_lib
+
+
+class CachedProperties:
+    """The serialized device properties, rebuilt only when the calibration changes
+
+    The properties are built at most once per calibration version in this process.
+    If they do not depend on the calibration, i.e. `is_versioned` is False,
+    they are built once and for all.
+
+    Attributes:
+        builder: the function that builds the properties from the store
+        is_versioned: whether the properties depend on the calibration data
+    """
+
+    def __init__(self, builder: Callable[[], BaseModel], is_versioned: bool = True):
+        self.builder = builder
+        self.is_versioned = is_versioned
+        # (version, body, etag) replaced as a whole so readers never see a mix
+        self._cached: Optional[Tuple[int, bytes, str]] = None
+
+    async def get_response(self, request: Request, redis_db: Redis) -> Response:
+        """Returns the response for the properties, 304 if the client has them already
+
+        Args:
+            request: the FastAPI request object
+            redis_db: the async redis connection
+
+        Returns:
+            the JSON response of the properties with their ETag, or an empty
+            304 response if the 'If-None-Match' header matches the ETag
+        """
+        version = 0
+        if self.is_versioned:
+            # read before building so that a concurrent write makes the next request rebuild
+            version = int(await redis_db.get(props_lib.CALIBRATION_VERSION_KEY) or 0)
+
+        cached = self._cached
+        if cached is None or cached[0] != version:
+            cached = await run_in_threadpool(self._build, version)
+
+        _, body, etag = cached
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches_etag(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def _build(self, version: int) -> Tuple[int, bytes, str]:
+        """Builds and serializes the properties, caching them as those of the version
+
+        Args:
+            version: the calibration version the properties are built from
+
+        Returns:
+            tuple of the version, the JSON body and the ETag of the properties
+        """
+        body = JSONResponse(content=jsonable_encoder(self.builder())).body
+        self._cached = (version, body, f'"{hashlib.sha1(body).hexdigest()}"')
+        return self._cached
+
+
+def _matches_etag(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether the 'If-None-Match' header matches the given ETag
+
+    Args:
+        if_none_match: the value of the 'If-None-Match' header if any
+        etag: the current ETag of the resource
+
+    Returns:
+        True if the client's copy of the resource is current
+    """
+    if not if_none_match:
+        return False
+
+    for value in if_none_match.split(","):
+        value = value.strip()
+        if value == "*" or value.removeprefix("W/") == etag:
+            return True
+
+    return False
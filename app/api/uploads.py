@@ -0,0 +1,279 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Streaming of uploaded job files straight into the job upload pool"""
+import uuid
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+import anyio
+import zstandard
+from fastapi import HTTPException, status
+from fastapi.requests import Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+from ..utils.json import JsonItemsScanner
+
+# the name of the form field holding the job file in multipart uploads
+UPLOAD_FILE_FIELD = "upload_file"
+# the most bytes decompressed at a time, so that the size limit is checked
+# before a highly compressed body is expanded in memory
+_DECOMPRESSION_STEP = 64 * 1024
+# the zstd decompressor has no output limit so its input is fed in small slices
+_ZSTD_INPUT_STEP = 1024
+
+
+@dataclass
+class JobUpload:
+    """A job file received in the upload pool
+
+    Attributes:
+        path: the temporary path of the file in the upload pool
+        items: the top-level items of the job extracted while receiving it
+    """
+
+    path: Path
+    items: Dict[str, Any]
+
+    def discard(self):
+        """Deletes the file if it is still at its temporary path"""
+        self.path.unlink(missing_ok=True)
+
+
+async def receive_job_upload(
+    request: Request,
+    directory: Path,
+    keys: Iterable[str],
+    max_bytes: Optional[int] = None,
+) -> JobUpload:
+    """Streams the job file in the request body into a temporary file in the directory
+
+    The body is either a multipart form with the job file in its 'upload_file' field
+    or the job file itself. A gzip, deflate or zstd 'Content-Encoding' is decompressed
+    on the fly. The given top-level items of the job are extracted as it streams by,
+    so the file is read exactly once.
+
+    Args:
+        request: the FastAPI request object
+        directory: the directory to save the file in, usually the job upload pool
+        keys: the top-level keys of the job whose values are to be extracted
+        max_bytes: the maximum size of the job file after decompression, if any
+
+    Returns:
+        the received job file and its extracted items
+
+    Raises:
+        HTTPException: status_code=415, if the content encoding is not supported
+        HTTPException: status_code=400, if the body cannot be decompressed
+        HTTPException: status_code=413, if the job file exceeds max_bytes
+    """
+    chunks = request.stream()
+    for encoding in reversed(_get_content_encodings(request)):
+        chunks = _decompress(chunks, encoding)
+
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    if content_type == b"multipart/form-data":
+        chunks = _extract_form_file(chunks, boundary=options.get(b"boundary", b""))
+
+    scanner = JsonItemsScanner(keys)
+    await anyio.Path(directory).mkdir(parents=True, exist_ok=True)
+    path = directory / f".{uuid.uuid4()}.part"
+    size = 0
+    try:
+        async with await anyio.open_file(path, "wb") as file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"job file exceeds {max_bytes} bytes",
+                    )
+                scanner.feed(chunk)
+                await file.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    return JobUpload(path=path, items=scanner.items)
+
+
+def _get_content_encodings(request: Request) -> List[str]:
+    """Returns the content encodings of the request body, in the order they were applied
+
+    Args:
+        request: the FastAPI request object
+    """
+    header = request.headers.get("content-encoding", "")
+    encodings = [value.strip().lower() for value in header.split(",")]
+    return [value for value in encodings if value and value != "identity"]
+
+
+async def _decompress(
+    chunks: AsyncIterator[bytes], encoding: str
+) -> AsyncIterator[bytes]:
+    """Decompresses the stream of chunks encoded with the given content encoding
+
+    Args:
+        chunks: the compressed chunks
+        encoding: the content encoding e.g. 'gzip', 'deflate' or 'zstd'
+
+    Returns:
+        an async iterator of the decompressed chunks
+
+    Raises:
+        HTTPException: status_code=415, if the content encoding is not supported
+        HTTPException: status_code=400, if the chunks cannot be decompressed
+    """
+    decompressor = _get_decompressor(encoding)
+
+    try:
+        async for chunk in chunks:
+            for data in _decompress_chunk(decompressor, chunk, encoding=encoding):
+                yield data
+
+        data = decompressor.flush()
+        if data:
+            yield data
+    except HTTPException:
+        raise
+    except Exception as exp:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"body could not be decompressed as {encoding}: {exp}",
+        )
+
+
+def _decompress_chunk(decompressor, chunk: bytes, encoding: str) -> Iterator[bytes]:
+    """Decompresses the chunk in pieces of bounded size
+
+    Args:
+        decompressor: the streaming decompressor returned by `_get_decompressor`
+        chunk: the next compressed bytes
+        encoding: the content encoding the decompressor was returned for
+
+    Returns:
+        an iterator of the decompressed pieces
+    """
+    if encoding == "zstd":
+        for start in range(0, len(chunk), _ZSTD_INPUT_STEP):
+            data = decompressor.decompress(chunk[start : start + _ZSTD_INPUT_STEP])
+            if data:
+                yield data
+        return
+
+    data = decompressor.decompress(chunk, _DECOMPRESSION_STEP)
+    while data:
+        yield data
+        data = decompressor.decompress(
+            decompressor.unconsumed_tail, _DECOMPRESSION_STEP
+        )
+
+
+def _get_decompressor(encoding: str):
+    """Returns a streaming decompressor for the given content encoding
+
+    Args:
+        encoding: the content encoding e.g. 'gzip', 'deflate' or 'zstd'
+
+    Returns:
+        an object with `decompress(data)` and `flush()` methods
+
+    Raises:
+        HTTPException: status_code=415, if the content encoding is not supported
+    """
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if encoding == "deflate":
+        return zlib.decompressobj()
+
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"unsupported content encoding '{encoding}'",
+    )
+
+
+async def _extract_form_file(
+    chunks: AsyncIterator[bytes], boundary: bytes
+) -> AsyncIterator[bytes]:
+    """Extracts the contents of the 'upload_file' field from a multipart form stream
+
+    Args:
+        chunks: the chunks of the multipart form
+        boundary: the boundary of the multipart form
+
+    Returns:
+        an async iterator of the chunks of the 'upload_file' field
+    """
+    parser = _FormFileParser(boundary=boundary, field_name=UPLOAD_FILE_FIELD)
+    async for chunk in chunks:
+        for data in parser.write(chunk):
+            yield data
+
+
+class _FormFileParser:
+    """A streaming parser of a multipart form that only keeps the data of one field"""
+
+    def __init__(self, boundary: bytes, field_name: str):
+        self._field_name = field_name.encode("utf-8")
+        self._is_in_field = False
+        self._header_field = b""
+        self._header_value = b""
+        self._data: List[bytes] = []
+        self._parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+            },
+        )
+
+    def write(self, chunk: bytes) -> List[bytes]:
+        """Parses the next chunk of the form
+
+        Args:
+            chunk: the next bytes of the multipart form
+
+        Returns:
+            the data of the field found in this chunk
+        """
+        self._parser.write(chunk)
+        data, self._data = self._data, []
+        return data
+
+    def _on_part_begin(self):
+        self._is_in_field = False
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._is_in_field:
+            self._data.append(data[start:end])
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            self._is_in_field = options.get(b"name") == self._field_name
+
+        self._header_field = b""
+        self._header_value = b""
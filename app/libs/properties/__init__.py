@@ -52,6 +52,12 @@ from .utils.data import (
     set_qubit_calibration_data,
     set_resonator_calibration_data,
 )
+from .utils.storage import (
+    CALIBRATION_VERSION_KEY,
+    get_calibration_version,
+    get_discriminators_version,
+    set_discriminators_version,
+)
 
 _BACKEND_CONFIG: Optional[BackendConfig] = None
 
@@ -122,16 +128,10 @@ def initialize_backend(
         set_resonator_calibration_data(resonator_data)
 
         # set discriminator data
-        disc_units = calibration_config.units.get("discriminators", {})
         discriminator_data = discriminator_config
         if discriminator_config is None:
             discriminator_data = calibration_config.discriminators
-
-        for disc_conf in discriminator_data.values():
-            disc_data = {
-                qbit: attach_units(v, disc_units) for qbit, v in disc_conf.items()
-            }
-            set_discriminator_data(disc_data)
+        set_simulator_discriminators(backend_config, discriminator_data)
 
         # set coupler calibration data
         coupler_units = calibration_config.units.get("coupler", {})
@@ -151,6 +151,22 @@ def initialize_backend(
         )
 
 
+def set_simulator_discriminators(
+    backend_config: BackendConfig,
+    discriminator_config: Dict[str, Dict[str, Dict[str, Union[float, str]]]],
+):
+    """Sets the discriminators of the simulated device in the store (redis)
+
+    Args:
+        backend_config: the configuration of the backend, which must be a simulator
+        discriminator_config: the discriminator data, by discriminator then qubit
+    """
+    disc_units = backend_config.calibration_config.units.get("discriminators", {})
+    for disc_conf in discriminator_config.values():
+        disc_data = {qbit: attach_units(v, disc_units) for qbit, v in disc_conf.items()}
+        set_discriminator_data(disc_data)
+
+
 def get_device_v1_info(
     backend_config: Optional[BackendConfig] = None,
 ) -> DeviceV1:
@@ -14,7 +14,11 @@
 from typing import Dict, List, Literal, Optional, Union
 
 from ..dtos import CalibrationValue
-from .storage import get_component_property, set_component_property
+from .storage import (
+    bump_calibration_version,
+    get_component_property,
+    set_component_property,
+)
 
 
 def get_inner_value(
@@ -165,70 +169,98 @@ def _read_calibration_value(
 def set_qubit_calibration_data(data: List[Dict[str, Optional[Dict]]]):
     """Sets the calibration of the qubits of the device in the store (redis)
 
+    The calibration version is bumped once all the data is written, if any of it
+    differs from what was stored.
+
     Args:
         data: the calibration data for all the qubits of a given device
     """
     # FIXME: Use this at the start of the simulator or whenever an automatic recalibration occurs
     #   so that it can be picked up when new calibration data is requested
+    is_changed = False
     for qubit_conf in data:
         qubit_id = str(qubit_conf["id"]["value"]).strip("q")
         for k, v in qubit_conf.items():
             if isinstance(v, dict):
-                set_component_property(
+                is_changed |= set_component_property(
                     component="qubit", name=k, component_id=qubit_id, **v
                 )
 
+    if is_changed:
+        bump_calibration_version()
+
 
 def set_resonator_calibration_data(data: List[Dict[str, Optional[Dict]]]):
     """Sets the calibration of the resonators of the device in the store (redis)
 
+    The calibration version is bumped once all the data is written, if any of it
+    differs from what was stored.
+
     Args:
         data: the calibration data for all the resonators of a given device
     """
     # FIXME: Use this at the start of the simulator or whenever an automatic recalibration occurs
     #   so that it can be picked up when new calibration data is requested
+    is_changed = False
     for resonator_conf in data:
         qubit_id = str(resonator_conf["id"]["value"]).strip("q")
         for k, v in resonator_conf.items():
             if isinstance(v, dict):
-                set_component_property(
+                is_changed |= set_component_property(
                     component="readout_resonator", name=k, component_id=qubit_id, **v
                 )
 
+    if is_changed:
+        bump_calibration_version()
+
 
 def set_discriminator_data(data: Dict[str, Dict[str, Optional[Dict]]]):
     """Sets the discriminator data of the device in the store (redis)
 
+    The calibration version is bumped once all the data is written, if any of it
+    differs from what was stored.
+
     Args:
         data: the discriminator data of a given device
     """
     # FIXME: Use this at the start of the simulator or whenever an automatic recalibration occurs
     #   so that it can be picked up when new calibration data is requested
+    is_changed = False
     for key, discriminator_conf in data.items():
         qubit_id = str(key).strip("q")
         for k, v in discriminator_conf.items():
             if isinstance(v, dict):
-                set_component_property(
+                is_changed |= set_component_property(
                     component="discriminator", name=k, component_id=qubit_id, **v
                 )
 
+    if is_changed:
+        bump_calibration_version()
+
 
 def set_coupler_calibration_data(data: List[Dict[str, Optional[Dict]]]):
     """Sets the calibration of the couplers of the device in the store (redis)
 
+    The calibration version is bumped once all the data is written, if any of it
+    differs from what was stored.
+
     Args:
         data: the calibration data for all the couplers of a given device
     """
     # FIXME: Use this at the start of the simulator or whenever an automatic recalibration occurs
     #   so that it can be picked up when new calibration data is requested
+    is_changed = False
     for coupler_conf in data:
         coupler_id = str(coupler_conf["id"]["value"]).strip("c")
         for k, v in coupler_conf.items():
             if isinstance(v, dict):
-                set_component_property(
+                is_changed |= set_component_property(
                     component="coupler", name=k, component_id=coupler_id, **v
                 )
 
+    if is_changed:
+        bump_calibration_version()
+
 
 def attach_units_many(
     data: List[Dict[str, Union[str, float]]], units_map: Dict[str, str]
@@ -18,6 +18,7 @@ from typing import Any, List, Optional, Tuple, TypeVar, Union
 import redis
 
 import settings
+from app.utils.redis import to_str
 
 from .date_time import utc_now_iso
 from .logging import get_logger
@@ -141,6 +142,25 @@ class BackendProperty:
         results = _transaction([timestamp_key], set_fields)
         return results is not None
 
+    def is_stored(self) -> bool:
+        """Return True if all the non-None fields, "value" included, are
+        already stored in Redis with the same values, and False otherwise.
+        """
+        fields = [
+            (field, value)
+            for field, value in self.__dict__.items()
+            if field in _included_fields and value is not None
+        ]
+        if not fields:
+            return False
+
+        keys = [self._create_redis_key(field) for field, _ in fields]
+        stored_values = settings.REDIS_CONNECTION.mget(keys)
+        return all(
+            stored is not None and to_str(stored) == to_string(value)
+            for (_, value), stored in zip(fields, stored_values)
+        )
+
     def write(self) -> bool:
         """Write the whole record into Redis. Suitable for initialization."""
         success = self.write_metadata()
@@ -465,6 +485,55 @@ def create_redis_key(
     return f"{property_type}{opt_component}{opt_component_id}:{name}{opt_field}"
 
 
+# the counter bumped whenever the calibration data of the device is written,
+# so that the readers can tell when what they built from it is stale
+CALIBRATION_VERSION_KEY = create_redis_key(PropertyType.DEVICE, "calibration_version")
+
+
+def get_calibration_version() -> int:
+    """Returns the current version of the calibration data of the device
+
+    Returns:
+        the version, 0 if the calibration data has never been written
+    """
+    return int(settings.REDIS_CONNECTION.get(CALIBRATION_VERSION_KEY) or 0)
+
+
+def bump_calibration_version() -> int:
+    """Increments the version of the calibration data of the device
+
+    Returns:
+        the new version
+    """
+    return settings.REDIS_CONNECTION.incr(CALIBRATION_VERSION_KEY)
+
+
+# the calibration version at which the discriminators of the simulator were
+# last trained, so that they are trained once per calibration, not per executor
+DISCRIMINATORS_VERSION_KEY = create_redis_key(
+    PropertyType.DEVICE, "discriminators_version"
+)
+
+
+def get_discriminators_version() -> Optional[int]:
+    """Returns the calibration version at which the discriminators were last trained
+
+    Returns:
+        the version, None if the discriminators have never been trained
+    """
+    version = settings.REDIS_CONNECTION.get(DISCRIMINATORS_VERSION_KEY)
+    return None if version is None else int(version)
+
+
+def set_discriminators_version(version: int):
+    """Records the calibration version at which the discriminators were trained
+
+    Args:
+        version: the calibration version
+    """
+    settings.REDIS_CONNECTION.set(DISCRIMINATORS_VERSION_KEY, version)
+
+
 """Component helpers"""
 
 
@@ -473,17 +542,22 @@ def set_component_property(
     name: str,
     component_id: str,
     **fields,
-):
+) -> bool:
     """Set the component device property identified by
     property_type, name, component, and component_id, to the bindings given
-    in fields.
+    in fields. Return True if anything was written, and False if Redis
+    already held the same bindings.
     """
     property_type = PropertyType.DEVICE
     p = BackendProperty(
         property_type, name, component=component, component_id=component_id, **fields
     )
+    if p.is_stored():
+        return False
+
     p.write_metadata()
     p.write_value()
+    return True
 
 
 def get_component_property(
@@ -550,5 +624,4 @@ def _eval_redis_value(value: Union[bytes, str]) -> Any:
     Returns:
         the evaluated value
     """
-    value_str = value if isinstance(value, str) else value.decode("utf-8")
-    return ast.literal_eval(value_str)
+    return ast.literal_eval(to_str(value))
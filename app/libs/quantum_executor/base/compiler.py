@@ -0,0 +1,233 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Compilation of PulseQobjs into programs that are ready to run on the executors
+
+The compilation needs no connection to the hardware so it is done ahead of execution,
+in the pre-processing worker, and the compiled qobj is stored to file for the
+execution worker to load.
+"""
+import abc
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qiskit.qobj import PulseQobj
+from qiskit_ibm_provider.utils import json_decoder
+
+from app.libs.quantum_executor.base.experiment import NativeExperiment
+from app.libs.quantum_executor.base.quantum_job import to_native_qobj_config
+from app.libs.quantum_executor.base.quantum_job.dtos import NativeQobjConfig
+from app.libs.quantum_executor.utils.serialization import iqx_rld
+
+
+@dataclass(frozen=True)
+class CompiledExperiment:
+    """A native experiment compiled into the program its executor runs
+
+    Attributes:
+        name: the name of the experiment
+        program: the program to run e.g. a compiled quantify schedule
+    """
+
+    name: str
+    program: Any
+
+
+@dataclass(frozen=True)
+class CompiledQobj:
+    """A PulseQobj with its experiments compiled for a given executor
+
+    Attributes:
+        qobj: the qobj whose pulse library has been unwrapped
+        native_config: the native config of the qobj
+        experiments: the compiled experiments in the order of the qobj
+        calibration_version: the version of the calibration data at the time
+            of compilation, if known
+    """
+
+    qobj: PulseQobj
+    native_config: NativeQobjConfig
+    experiments: List[CompiledExperiment]
+    calibration_version: Optional[int] = None
+
+    def __reduce__(self):
+        # the config of a PulseQobj cannot be unpickled, so its dict is pickled instead
+        return (
+            _new_compiled_qobj,
+            (
+                self.qobj.to_dict(),
+                self.native_config,
+                self.experiments,
+                self.calibration_version,
+            ),
+        )
+
+
+def _new_compiled_qobj(
+    qobj_dict: Dict[str, Any],
+    native_config: NativeQobjConfig,
+    experiments: List[CompiledExperiment],
+    calibration_version: Optional[int],
+) -> CompiledQobj:
+    """Creates the compiled qobj from its pickled state
+
+    Args:
+        qobj_dict: the dict of the qobj whose pulse library has been unwrapped
+        native_config: the native config of the qobj
+        experiments: the compiled experiments in the order of the qobj
+        calibration_version: the version of the calibration data at the time
+            of compilation, if known
+
+    Returns:
+        the compiled qobj
+    """
+    return CompiledQobj(
+        qobj=PulseQobj.from_dict(qobj_dict),
+        native_config=native_config,
+        experiments=experiments,
+        calibration_version=calibration_version,
+    )
+
+
+class QuantumCompiler(abc.ABC):
+    """The compiler of PulseQobjs into the programs of a given executor"""
+
+    def compile(self, qobj: PulseQobj, /) -> CompiledQobj:
+        """Compiles the experiments of the qobj
+
+        Note that the pulse library of the qobj is unwrapped in-place
+
+        Args:
+            qobj: the Pulse qobject containing the experiments
+
+        Returns:
+            the compiled qobj
+        """
+        qobj.config.pulse_library = {
+            i.name: np.asarray(i.samples) for i in qobj.config.pulse_library
+        }
+        return self._compile_unwrapped(qobj)
+
+    def recompile(self, compiled_qobj: CompiledQobj, /) -> CompiledQobj:
+        """Compiles the experiments of an already compiled qobj again
+
+        e.g. when the calibration has changed since it was compiled
+
+        Args:
+            compiled_qobj: the compiled qobj
+
+        Returns:
+            the newly compiled qobj
+        """
+        return self._compile_unwrapped(compiled_qobj.qobj)
+
+    def _compile_unwrapped(self, qobj: PulseQobj, /) -> CompiledQobj:
+        """Compiles the experiments of the qobj whose pulse library is unwrapped
+
+        Args:
+            qobj: the Pulse qobject containing the experiments
+
+        Returns:
+            the compiled qobj
+        """
+        native_config = to_native_qobj_config(qobj.config)
+        native_expts = self._to_native_experiments(qobj, native_config)
+        experiments = [
+            CompiledExperiment(
+                name=expt.header.name,
+                program=self._compile_native(expt, native_config=native_config),
+            )
+            for expt in native_expts
+        ]
+        return CompiledQobj(
+            qobj=qobj, native_config=native_config, experiments=experiments
+        )
+
+    @abc.abstractmethod
+    def _to_native_experiments(
+        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
+    ) -> List[NativeExperiment]:
+        """Constructs native experiments from the PulseQobj instance
+
+        Args:
+            qobj: the Pulse qobject containing the experiments
+            native_config: the native config for the qobj
+
+        Returns:
+            list of NativeExperiment's
+        """
+        pass
+
+    def _compile_native(
+        self, experiment: NativeExperiment, /, *, native_config: NativeQobjConfig
+    ) -> Any:
+        """Compiles the native experiment into the program to run
+
+        By default, the program is the schedule of the experiment
+
+        Args:
+            experiment: the native experiment to compile
+            native_config: the native config for the qobj
+
+        Returns:
+            the program to run
+        """
+        return experiment.schedule
+
+
+def decode_qobj(qobj_dict: Dict[str, Any]) -> PulseQobj:
+    """Decodes the qobj dict as uploaded by the SDK into a PulseQobj
+
+    Before submission, the qobj dict was compressed to ease transportation
+    and its complex values were split into pairs. Both are reversed here, in-place.
+
+    Args:
+        qobj_dict: the dict of the PulseQobj to decode
+
+    Returns:
+        the PulseQobj
+    """
+    # --- In-place RLD pulse library
+    # [([a,b], 2),...] -> [[a,b],[a,b],...]
+    for pulse in qobj_dict["config"]["pulse_library"]:
+        pulse["samples"] = iqx_rld(pulse["samples"])
+
+    # --- In-place decode complex values
+    # [[a,b],[c,d],...] -> [a + ib,c + id,...]
+    json_decoder.decode_pulse_qobj(qobj_dict)
+    return PulseQobj.from_dict(qobj_dict)
+
+
+def save_compiled_qobj(compiled_qobj: CompiledQobj, file: Path):
+    """Saves the compiled qobj to the given file
+
+    Args:
+        compiled_qobj: the compiled qobj to save
+        file: the path to the file
+    """
+    with file.open("wb") as f:
+        pickle.dump(compiled_qobj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_compiled_qobj(file: Path) -> CompiledQobj:
+    """Loads the compiled qobj saved in the given file
+
+    Args:
+        file: the path to the file
+
+    Returns:
+        the compiled qobj
+    """
+    with file.open("rb") as f:
+        return pickle.load(f)
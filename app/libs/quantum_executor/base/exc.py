@@ -0,0 +1,19 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Exceptions specific to the quantum executor"""
+from app.utils.exc import BaseBccException
+
+
+class JobCancelledError(BaseBccException):
+    """Exception when the job being run is found to be cancelled at a checkpoint"""
+
+    pass
@@ -12,54 +12,44 @@
 # that they have been altered from the originals.
 
 import abc
-from datetime import datetime
 from pathlib import Path
 from traceback import format_exc
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-import numpy as np
 from qiskit.qobj import PulseQobj
 from quantify_core.data import handling as dh
 from quantify_core.data.handling import create_exp_folder, gen_tuid
 
 import settings
-from app.libs.quantum_executor.base.experiment import NativeExperiment
-from app.libs.quantum_executor.base.quantum_job import (
-    save_job_in_hdf5,
-    to_native_qobj_config,
+from app.libs.quantum_executor.base.compiler import (
+    CompiledExperiment,
+    CompiledQobj,
+    QuantumCompiler,
 )
+from app.libs.quantum_executor.base.exc import JobCancelledError
+from app.libs.quantum_executor.base.quantum_job import save_job_in_hdf5
 from app.libs.quantum_executor.base.quantum_job.dtos import NativeQobjConfig, QuantumJob
 from app.libs.quantum_executor.base.quantum_job.typing import QExperimentResult
 from app.libs.quantum_executor.utils.logger import ExperimentLogger
 
 
 class QuantumExecutor(abc.ABC):
+    # the check of whether the job being run has been cancelled, if any
+    _is_cancelled: Optional[Callable[[], bool]] = None
+
     def __init__(
         self,
+        compiler: QuantumCompiler,
         hardware_map: Optional[Dict[str, Tuple[str, str]]] = None,
     ):
         dh.set_datadir(settings.EXECUTOR_DATA_DIR)
+        self.compiler = compiler
         self.hardware_map = hardware_map
 
-    @abc.abstractmethod
-    def _to_native_experiments(
-        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
-    ) -> List[NativeExperiment]:
-        """Constructs native experiments from the PulseQobj instance
-
-        Args:
-            qobj: the Pulse qobject containing the experiments
-            native_config: the native config for the qobj
-
-        Returns:
-            list of NativeExperiment's
-        """
-        pass
-
     @abc.abstractmethod
     def _run_native(
         self,
-        experiment: NativeExperiment,
+        experiment: CompiledExperiment,
         /,
         *,
         native_config: NativeQobjConfig,
@@ -92,7 +82,7 @@ class QuantumExecutor(abc.ABC):
             ...
 
         Args:
-            experiment: the native experiment to run
+            experiment: the compiled experiment to run
             native_config: native config for the qobj
             logger: the logger for the given experiment which logs data in a specific folder
 
@@ -107,16 +97,68 @@ class QuantumExecutor(abc.ABC):
         /,
         *,
         job_id: str = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
     ) -> Optional[Path]:
-        """Runs the experiments and returns the results file path
+        """Compiles and runs the experiments and returns the results file path
 
         Args:
             qobj: the Quantum object that is to be executed
             job_id: the ID of the job
+            is_cancelled: the check of whether the job has been cancelled, if any
 
         Returns:
             the path to the results obtained after measurement
+
+        Raises:
+            JobCancelledError: the job was cancelled before the run completed
         """
+        compiled_qobj = self.compiler.compile(qobj)
+        return self.run_compiled(
+            compiled_qobj, job_id=job_id, is_cancelled=is_cancelled
+        )
+
+    def run_compiled(
+        self,
+        compiled_qobj: CompiledQobj,
+        /,
+        *,
+        job_id: str = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Optional[Path]:
+        """Runs the experiments compiled by the compiler and returns the results file path
+
+        The run stops at the next checkpoint, e.g. between experiments,
+        once the job is found to be cancelled.
+
+        Args:
+            compiled_qobj: the compiled Quantum object that is to be executed
+            job_id: the ID of the job
+            is_cancelled: the check of whether the job has been cancelled, if any
+
+        Returns:
+            the path to the results obtained after measurement
+
+        Raises:
+            JobCancelledError: the job was cancelled before the run completed
+        """
+        self._is_cancelled = is_cancelled
+        try:
+            return self._run(compiled_qobj, job_id=job_id)
+        finally:
+            self._is_cancelled = None
+
+    def _run(self, compiled_qobj: CompiledQobj, /, *, job_id: Optional[str]) -> Path:
+        """Runs the compiled experiments and returns the results file path
+
+        Args:
+            compiled_qobj: the compiled Quantum object that is to be executed
+            job_id: the ID of the job
+
+        Returns:
+            the path to the results obtained after measurement
+        """
+        qobj = compiled_qobj.qobj
+        native_config = compiled_qobj.native_config
         tuid = gen_tuid()
         qobj_header = qobj.header.to_dict()
         qobj_tag = qobj_header.get("tag", "")
@@ -125,24 +167,10 @@ class QuantumExecutor(abc.ABC):
         logger.info(f"Starting job: {tuid}")
 
         try:
-            # unwrap pulse library
-            qobj.config.pulse_library = {
-                i.name: np.asarray(i.samples) for i in qobj.config.pulse_library
-            }
-
-            # translate qobj experiments to quantify schedules
-            logger.info(f"Started compilation for job id: {job_id} at {datetime.now()}")
-            native_config = to_native_qobj_config(qobj.config)
-            native_expts = self._to_native_experiments(qobj, native_config)
-            logger.info(f"Translated to {len(native_expts)} native experiments.")
-
             logger.info(f"Running experiments for job id: {job_id}")
-            experiment_results = {
-                expt.header.name: self._run_native(
-                    expt, native_config=native_config, logger=logger
-                )
-                for expt in native_expts
-            }
+            experiment_results = self._run_experiments(
+                compiled_qobj.experiments, native_config=native_config, logger=logger
+            )
 
             job = QuantumJob(
                 job_id=job_id,
@@ -164,6 +192,10 @@ class QuantumExecutor(abc.ABC):
                 f"Completed {job_id if job_id else 'local job'} with tuid {tuid}."
             )
 
+        except JobCancelledError:
+            logger.info(f"Cancelled job: {job_id}, tuid: {tuid}")
+            raise
+
         # record exceptions
         except Exception as e:
             logger.error(f"\nFailed job: {job_id}, tuid: {tuid}\n{format_exc()}")
@@ -171,6 +203,57 @@ class QuantumExecutor(abc.ABC):
 
         return results_file_path
 
+    def _run_experiments(
+        self,
+        experiments: List[CompiledExperiment],
+        /,
+        *,
+        native_config: NativeQobjConfig,
+        logger: ExperimentLogger,
+    ) -> Dict[str, QExperimentResult]:
+        """Runs the compiled experiments one after the other
+
+        Args:
+            experiments: the compiled experiments to run
+            native_config: native config for the qobj
+            logger: the logger for the given experiments
+
+        Returns:
+            the results by experiment name, in the order of the experiments
+
+        Raises:
+            JobCancelledError: the job was cancelled before all experiments were run
+        """
+        experiment_results = {}
+        for expt in experiments:
+            self._raise_if_cancelled()
+            experiment_results[expt.name] = self._run_native(
+                expt, native_config=native_config, logger=logger
+            )
+        return experiment_results
+
+    def _raise_if_cancelled(self):
+        """Stops the run if the job has been cancelled
+
+        It is a checkpoint, called where the run can be stopped safely.
+
+        Raises:
+            JobCancelledError: the job has been cancelled
+        """
+        if self._is_cancelled is not None and self._is_cancelled():
+            raise JobCancelledError("the job has been cancelled")
+
+    def is_healthy(self) -> bool:
+        """Checks whether the executor can still run jobs
+
+        It is called between jobs by long-lived workers, which construct a new
+        executor when it fails.
+
+        Returns:
+            True if the executor can run the next job
+        """
+        return True
+
     @abc.abstractmethod
     def close(self):
         pass
@@ -15,7 +15,7 @@
 
 import re
 from pathlib import Path
-from typing import Any, Callable, List, Literal, Match, Type, TypeVar, Union
+from typing import Any, Callable, List, Literal, Match, Tuple, Type, TypeVar, Union
 
 import h5py
 import numpy as np
@@ -57,17 +57,8 @@ _HDF5_HEADER_METADATA_PATH = "header/qobj/backend"
 _HDF5_SWEEP_DATA_PATH = "header/qobj/sweep"
 
 
-_dec_to_hex = np.frompyfunc(
-    hex, nin=1, nout=1
-)  # type: Callable[[npt.NDArray[np.int64]], npt.NDArray[np.str_]]
-"""Converts a numpy 1D array of decimal numbers to a numpy array of hex strings
-
-Args:
-    __number: the numpy array of decimals
-
-Returns:
-    the numpy 1D array of hex strings
-"""
+# the number of bits in each word of packed outcomes
+_WORD_BITS = 64
 
 
 def read_job_from_hdf5(file: Path) -> QuantumJob:
@@ -134,62 +125,79 @@ def save_job_in_hdf5(job: QuantumJob, file: Path):
 
 def discriminate_results(
     job: QuantumJob,
-    discriminator: Callable[[int, npt.NDArray[np.complexfloating]], int],
+    discriminator: Callable[[int, npt.NDArray[np.complexfloating]], npt.NDArray],
     *,
     num_of_states: Union[Literal[2], Literal[3]] = 2,
     byteorder: ByteOrder = ByteOrder.LITTLE_ENDIAN,
     **kwargs,
-) -> List[List[str]]:
+) -> List[npt.NDArray[np.uint64]]:
     """
-    Interpret measurement data from experiments as bitstrings.
+    Interpret measurement data from experiments as packed outcomes.
+
+    The IQ points of all the acquisition channels of an experiment are stacked in one
+    matrix and discriminated together if the discriminator has a
+    `discriminate_channels(channels, iq_points)` method taking the channel indices and
+    the (n_channels, n_shots) matrix of their IQ points, else one channel at a time.
 
-    The returned hex values corresponds to how the classical slot register
-    is read "from right to left" in binary if Little endian and vice versa if big-endian.
-    This binary value is returned in base 16 (or hex).
+    The outcome of each shot is the classical slot register read "from right to left"
+    if Little endian and vice versa if big-endian, as an unsigned integer. Registers
+    wider than 64 bits are split in words of 64 bits, the least significant first.
+    Use `outcomes_to_hex` to get their hex (base 16) representations.
 
     Args:
         job: quantum job whose results are to be discriminated
         discriminator: a function which takes two arguments "qubit_index" and "iq_points" (an array)
-            and returns a binary value (0/1).
+            and returns an array of the states (e.g. 0/1) of the points.
         num_of_states: the number of states the discriminator produces; default=2
         byteorder: the byte order of the acquisition channel list; default=ByteOrder.LITTLE_ENDIAN
 
     Returns:
-        Nested list of the hex (base 16) representations of the states e.g. 0, 1.
-        Each inner list corresponds to one experiment.
-        Each item in the inner list corresponds to a shot number
+        List of the outcomes of each experiment, as a (n_shots,) array of uint64,
+        or a (n_shots, n_words) array of uint64 if the register is wider than 64 bits
+
+    Raises:
+        ValueError: the register of non-binary states does not fit in 64 bits
     """
     assert callable(discriminator)
-    discriminated_results_in_hex: List[List[str]] = []
+    discriminated_results: List[npt.NDArray[np.uint64]] = []
 
     for expt_dataset in job.raw_results.values():
-        # Get all channel indices from the dataset keys
-        channel_indices = [int(ch) for ch in expt_dataset.keys()]
-        max_channel = max(channel_indices) if channel_indices else 0
-        no_of_repetitions = expt_dataset.sizes["repetition"]
-        # Create an array large enough to index by the maximum channel number.
-        expt_discriminated_results = np.zeros(
-            (max_channel + 1, no_of_repetitions), dtype=np.int8
-        )
+        channels, iq_points = _stack_acquisitions(expt_dataset)
+        states = _discriminate_channels(discriminator, channels, iq_points)
 
-        for acquisition_channel, acquisitions in expt_dataset.items():
-            _, no_of_acquisitions = acquisitions.shape
-            assert (
-                no_of_acquisitions == 1
-            ), "Max one acquisition per channel for word readout."
-            idx = int(acquisition_channel)
-            acquisition_data = acquisitions.data[:, 0]
-            expt_discriminated_results[idx] = discriminator(idx, acquisition_data)
-
-        # convert to hex per repetition
-        bitarrays_per_rep = expt_discriminated_results.transpose()
-        base_10_per_rep = _bitarrays_to_decimal(
-            bitarrays_per_rep, base=num_of_states, byteorder=byteorder
-        )
-        hex_per_rep = _dec_to_hex(base_10_per_rep)
-        discriminated_results_in_hex.append(hex_per_rep.tolist())
+        # the slot of each channel in the register, from the least significant
+        width = int(channels.max()) + 1 if channels.size else 1
+        if byteorder == ByteOrder.LITTLE_ENDIAN:
+            slots = channels
+        else:
+            slots = width - 1 - channels
+
+        outcomes = _pack_states(states, slots=slots, width=width, base=num_of_states)
+        discriminated_results.append(outcomes)
+
+    return discriminated_results
 
-    return discriminated_results_in_hex
+
+def outcomes_to_hex(outcomes: npt.NDArray[np.uint64]) -> List[str]:
+    """Converts the packed outcomes of the shots of an experiment to hex strings
+
+    Args:
+        outcomes: the (n_shots,) array of outcomes or the (n_shots, n_words) array
+            of their words of 64 bits, the least significant first,
+            as returned by `discriminate_results`
+
+    Returns:
+        the hex (base 16) representations of the outcomes e.g. '0x1'
+    """
+    if outcomes.ndim == 1:
+        return [hex(value) for value in outcomes.tolist()]
+
+    data = np.ascontiguousarray(outcomes, dtype="<u8").tobytes()
+    size = outcomes.shape[1] * outcomes.itemsize
+    return [
+        hex(int.from_bytes(data[offset : offset + size], "little"))
+        for offset in range(0, len(data), size)
+    ]
 
 
 def to_native_qobj_config(config: PulseQobjConfig) -> "NativeQobjConfig":
@@ -511,30 +519,97 @@ def _get_meas_protocol(qobj_conf: PulseQobjConfig) -> "MeasProtocol":
     }[qobj_conf.meas_level]
 
 
-def _bitarrays_to_decimal(
-    array: npt.NDArray[np.int8],
-    base: int,
-    byteorder: ByteOrder = ByteOrder.LITTLE_ENDIAN,
-):
+def _stack_acquisitions(
+    expt_dataset: QDataset,
+) -> Tuple[npt.NDArray[np.intp], npt.NDArray[np.complex128]]:
+    """Stacks the IQ points of all the acquisition channels of an experiment
+
+    Args:
+        expt_dataset: the dataset of the acquisitions of the experiment
+
+    Returns:
+        tuple of the indices of the channels and the (n_channels, n_shots) matrix
+            of their IQ points
     """
-    Convert a 2D array in any base to integers in base 10 with selectable byte order.
+    channels = np.array([int(ch) for ch in expt_dataset.keys()], dtype=np.intp)
+    no_of_repetitions = expt_dataset.sizes["repetition"]
+    iq_points = np.empty((len(channels), no_of_repetitions), dtype=np.complex128)
+
+    for row, acquisitions in enumerate(expt_dataset.values()):
+        _, no_of_acquisitions = acquisitions.shape
+        assert (
+            no_of_acquisitions == 1
+        ), "Max one acquisition per channel for word readout."
+        iq_points[row] = acquisitions.data[:, 0]
 
-    Parameters:
-        array: Input 2D array of integers in the specified base.
-        base: The base of the input array (e.g., 2 for binary, 3 for base-3).
-        byteorder: 'big-endian' (MSD first), or 'little-endian' (LSD first).
+    return channels, iq_points
+
+
+def _discriminate_channels(
+    discriminator: Callable[[int, npt.NDArray[np.complexfloating]], npt.NDArray],
+    channels: npt.NDArray[np.intp],
+    iq_points: npt.NDArray[np.complex128],
+) -> npt.NDArray[np.uint8]:
+    """Discriminates the IQ points of the given acquisition channels
+
+    Args:
+        discriminator: the discriminator, with or without `discriminate_channels`
+        channels: the indices of the acquisition channels
+        iq_points: the (n_channels, n_shots) matrix of their IQ points
 
     Returns:
-        numpy.ndarray: 1D array of integers representing each row.
+        the (n_channels, n_shots) matrix of the states of the IQ points
     """
-    # Flip the array for little-endian (LSD first)
-    if byteorder == ByteOrder.LITTLE_ENDIAN:
-        array = array[:, ::-1]
+    discriminate_all = getattr(discriminator, "discriminate_channels", None)
+    if discriminate_all is not None:
+        return np.asarray(discriminate_all(channels, iq_points), dtype=np.uint8)
 
-    # Compute the powers of the base, e.g. for base 3 => [3^2, 3^1, 3^0]
-    powers_of_base = base ** np.arange(array.shape[1] - 1, -1, -1)
+    states = np.empty(iq_points.shape, dtype=np.uint8)
+    for row, idx in enumerate(channels.tolist()):
+        states[row] = discriminator(idx, iq_points[row])
+    return states
 
-    # Convert each row to integers (base 10)
-    integers = array @ powers_of_base
 
-    return integers
+def _pack_states(
+    states: npt.NDArray[np.uint8],
+    slots: npt.NDArray[np.intp],
+    width: int,
+    base: int,
+) -> npt.NDArray[np.uint64]:
+    """Packs the states of the channels of each shot in an unsigned integer
+
+    Args:
+        states: the (n_channels, n_shots) matrix of the states of the channels
+        slots: the slot of each channel in the register, from the least significant
+        width: the number of slots in the register
+        base: the number of states of each slot
+
+    Returns:
+        the (n_shots,) array of outcomes, or the (n_shots, n_words) array of their
+            words of 64 bits, the least significant first, if they exceed 64 bits
+
+    Raises:
+        ValueError: the register of non-binary states does not fit in 64 bits
+    """
+    no_of_repetitions = states.shape[1]
+
+    if base == 2:
+        register = np.zeros((width, no_of_repetitions), dtype=np.uint8)
+        register[slots] = states
+        # (n_bytes, n_shots) bytes of 8 slots each, copied into zero-padded words
+        packed = np.packbits(register, axis=0, bitorder="little")
+        no_of_words = -(-width // _WORD_BITS)
+        words = np.zeros((no_of_repetitions, no_of_words * 8), dtype=np.uint8)
+        words[:, : packed.shape[0]] = packed.T
+        outcomes = words.view("<u8").astype(np.uint64, copy=False)
+        return outcomes[:, 0] if no_of_words == 1 else outcomes
+
+    if base**width > 2**_WORD_BITS:
+        raise ValueError(f"{width} slots of base {base} do not fit in 64 bits")
+
+    outcomes = np.zeros(no_of_repetitions, dtype=np.uint64)
+    for channel_states, slot in zip(states, slots.tolist()):
+        outcomes += np.multiply(
+            channel_states, np.uint64(base**slot), dtype=np.uint64
+        )
+    return outcomes
@@ -0,0 +1,47 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""The compiler of PulseQobjs into qiskit pulse schedules"""
+from typing import List
+
+from qiskit.qobj import PulseQobj
+
+from app.libs.quantum_executor.base.compiler import QuantumCompiler
+from app.libs.quantum_executor.qiskit.experiment import QiskitDynamicsExperiment
+
+from ..base.quantum_job import get_experiment_name
+from ..base.quantum_job.dtos import NativeQobjConfig
+
+
+class QiskitDynamicsCompiler(QuantumCompiler):
+    """The compiler of PulseQobjs into schedules for the qiskit dynamics backends"""
+
+    def _to_native_experiments(
+        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
+    ) -> List[QiskitDynamicsExperiment]:
+        """Constructs qiskit dynamics experiments from the PulseQobj instance
+
+        Args:
+            qobj: the Pulse qobject containing the experiments
+            native_config: the native config for the qobj
+
+        Returns:
+            list of QiskitDynamicsExperiment's
+        """
+        native_experiments = [
+            QiskitDynamicsExperiment.from_qobj_expt(
+                name=get_experiment_name(expt.header.name, idx + 1),
+                expt=expt,
+                qobj_config=qobj.config,
+            )
+            for idx, expt in enumerate(qobj.experiments)
+        ]
+        return native_experiments
@@ -12,23 +12,24 @@
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
 import enum
-from typing import List, Type
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Type
 
 import numpy as np
 from numpy import typing as npt
-from qiskit.qobj import PulseQobj
 from qiskit.result import Result as qiskitResult
 
+from app.libs.quantum_executor.base.compiler import CompiledExperiment
 from app.libs.quantum_executor.base.executor import QuantumExecutor
-from app.libs.quantum_executor.base.experiment import NativeExperiment
-from app.libs.quantum_executor.qiskit.experiment import QiskitDynamicsExperiment
+from app.libs.quantum_executor.qiskit.compiler import QiskitDynamicsCompiler
 
 from ...properties import BackendConfig
 from ..base.quantum_job import (
     MeasRet,
     QDataset,
     RepetitionsByAcquisitionsMatrix,
-    get_experiment_name,
 )
 from ..base.quantum_job.dtos import NativeQobjConfig
 from ..base.quantum_job.typing import QExperimentResult
@@ -38,71 +39,187 @@ from .backends.one_qubit import QiskitPulse1Q
 from .backends.two_qubit import QiskitPulse2Q
 
 
+# the seconds between checks of the cancellation of a job whose experiments
+# are running in the simulation pool
+_CANCEL_CHECK_INTERVAL = 0.5
+# the seconds to wait for a process of the simulation pool to answer a health check
+_POOL_HEALTH_CHECK_TIMEOUT = 10.0
+
+
 class QiskitDynamicsExecutor(QuantumExecutor):
     def __init__(
         self,
         backend_config: BackendConfig,
         backend_cls: Type[QiskitPulseBackend] = QiskitPulse1Q,
+        pool_size: int = 1,
+        batch_size: int = 0,
         **kwargs,
     ):
         """Creates the QiskitDynamicsExecutor for the given backend class and key-word args
 
+        The experiments of each job are simulated in batches, each in a single run
+        of the backend, to save the setup of the solver and the results per experiment.
+        With a pool size greater than one, the batches are simulated in parallel
+        in a pool of processes, each with its own executor initialized when
+        the pool starts. The pool is started by the first job of several batches,
+        so jobs of one batch never pay for it.
+
         Args:
             backend_config: the configuration of the backend
             backend_cls: the class of the backend
+            pool_size: the number of processes simulating the experiments of a job
+            batch_size: the maximum number of experiments simulated in one run
+                of the backend; 0 simulates all the experiments of a job in one run
             kwargs: extra key-word args to pass to the backend on initialisation
         """
-        super().__init__()
+        super().__init__(compiler=QiskitDynamicsCompiler())
         self.backend = backend_cls(backend_config=backend_config, **kwargs)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self._backend_config = backend_config
+        self._backend_cls = backend_cls
+        self._backend_kwargs = kwargs
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _run_experiments(
+        self,
+        experiments: List[CompiledExperiment],
+        /,
+        *,
+        native_config: NativeQobjConfig,
+        logger: ExperimentLogger,
+    ) -> Dict[str, QExperimentResult]:
+        batches = self._get_batches(experiments)
+        if self.pool_size < 2 or len(batches) < 2:
+            results = []
+            for batch in batches:
+                self._raise_if_cancelled()
+                results.extend(self._run_batch(batch, native_config=native_config))
+            return {expt.name: result for expt, result in zip(experiments, results)}
+
+        self._raise_if_cancelled()
+        pool = self._get_pool()
+        futures = [pool.submit(_run_in_pool, batch, native_config) for batch in batches]
+        try:
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=_CANCEL_CHECK_INTERVAL)
+                self._raise_if_cancelled()
+        finally:
+            # the batches not yet started are dropped if the job is cancelled
+            for future in futures:
+                future.cancel()
+
+        results = [result for future in futures for result in future.result()]
+        return {expt.name: result for expt, result in zip(experiments, results)}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Returns the simulation pool, starting it on first call
+
+        Returns:
+            the pool of processes simulating the batches of experiments
+        """
+        if self._pool is None:
+            self._pool = _new_simulation_pool(
+                self.pool_size,
+                backend_config=self._backend_config,
+                backend_cls=self._backend_cls,
+                backend_kwargs=self._backend_kwargs,
+            )
+        return self._pool
+
+    def _get_batches(
+        self, experiments: List[CompiledExperiment]
+    ) -> List[List[CompiledExperiment]]:
+        """Splits the experiments into the batches to simulate, in order
+
+        The batches are no larger than the batch size, and small enough to give
+        every process of the pool a batch.
+
+        Args:
+            experiments: the compiled experiments to run
+
+        Returns:
+            the consecutive batches of experiments
+        """
+        size = math.ceil(len(experiments) / self.pool_size)
+        if self.batch_size > 0:
+            size = min(size, self.batch_size)
+        size = max(size, 1)
+        return [
+            experiments[start : start + size]
+            for start in range(0, len(experiments), size)
+        ]
 
     def _run_native(
         self,
-        experiment: NativeExperiment,
+        experiment: CompiledExperiment,
         /,
         *,
         native_config: NativeQobjConfig,
         logger: ExperimentLogger,
     ) -> QExperimentResult:
-        meas_return = _QiskitDynMeasReturn.from_native_qobj_config(native_config)
-        shots = native_config.shots
-        job = self.backend.run(
-            experiment.schedule, shots=shots, meas_return=meas_return
-        )
-        result: qiskitResult = job.result()
-        data: npt.NDArray[np.floating] = result.data()["memory"]
-        return _to_xarray(data=data, meas_return=meas_return)
+        return self._run_batch([experiment], native_config=native_config)[0]
 
-    def _to_native_experiments(
-        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
-    ) -> List[QiskitDynamicsExperiment]:
-        """Constructs qiskit dynamics experiments from the PulseQobj instance
+    def _run_batch(
+        self,
+        experiments: List[CompiledExperiment],
+        /,
+        *,
+        native_config: NativeQobjConfig,
+    ) -> List[QExperimentResult]:
+        """Simulates the experiments in a single run of the backend
 
         Args:
-            qobj: the Pulse qobject containing the experiments
-            native_config: the native config for the qobj
+            experiments: the compiled experiments to run
+            native_config: native config for the qobj
 
         Returns:
-            list of QiskitDynamicsExperiment's
+            the results of the experiments, in their order
         """
-        native_experiments = [
-            QiskitDynamicsExperiment.from_qobj_expt(
-                name=get_experiment_name(expt.header.name, idx + 1),
-                expt=expt,
-                qobj_config=qobj.config,
+        meas_return = _QiskitDynMeasReturn.from_native_qobj_config(native_config)
+        shots = native_config.shots
+        job = self.backend.run(
+            [expt.program for expt in experiments],
+            shots=shots,
+            meas_return=meas_return,
+        )
+        result: qiskitResult = job.result()
+        results = []
+        for idx in range(len(experiments)):
+            data: npt.NDArray[np.floating] = result.data(idx)["memory"]
+            results.append(_to_xarray(data=data, meas_return=meas_return))
+        return results
+
+    def is_healthy(self) -> bool:
+        # a pool one of whose processes died fails all the jobs;
+        # a pool not started yet is started afresh by the next job
+        if self._pool is None:
+            return True
+        try:
+            return self._pool.submit(_is_pool_process_ready).result(
+                timeout=_POOL_HEALTH_CHECK_TIMEOUT
             )
-            for idx, expt in enumerate(qobj.experiments)
-        ]
-        return native_experiments
+        except Exception as exp:
+            print(f"Simulation pool is unhealthy. exp: {exp}")
+            return False
 
     def close(self):
-        pass
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
 
     @classmethod
-    def new_one_qubit(cls, backend_config: BackendConfig):
+    def new_one_qubit(
+        cls, backend_config: BackendConfig, pool_size: int = 1, batch_size: int = 0
+    ):
         """Generates a new one-qubit qiskit-dynamics executor
 
         Args:
             backend_config: the backend configuration
+            pool_size: the number of processes simulating the experiments of a job
+            batch_size: the maximum number of experiments simulated in one run
+                of the backend; 0 simulates all the experiments of a job in one run
 
         Returns:
             an instance of this class that has one-qubit
@@ -111,16 +228,23 @@ class QiskitDynamicsExecutor(QuantumExecutor):
         return cls(
             backend_config=backend_config,
             backend_cls=QiskitPulse1Q,
+            pool_size=pool_size,
+            batch_size=batch_size,
             meas_level=1,
             meas_return="single",
         )
 
     @classmethod
-    def new_two_qubit(cls, backend_config: BackendConfig):
+    def new_two_qubit(
+        cls, backend_config: BackendConfig, pool_size: int = 1, batch_size: int = 0
+    ):
         """Generates a new two-qubit qiskit-dynamics executor
 
         Args:
             backend_config: the backend configuration
+            pool_size: the number of processes simulating the experiments of a job
+            batch_size: the maximum number of experiments simulated in one run
+                of the backend; 0 simulates all the experiments of a job in one run
 
         Returns:
             an instance of this class that has two coupled qubits
@@ -128,11 +252,87 @@ class QiskitDynamicsExecutor(QuantumExecutor):
         return cls(
             backend_config=backend_config,
             backend_cls=QiskitPulse2Q,
+            pool_size=pool_size,
+            batch_size=batch_size,
             meas_level=1,
             meas_return="single",
         )
 
 
+# Simulation pool
+# ---------------
+# The executor of each process of the pool, initialized when the process starts
+_POOL_EXECUTOR: Optional[QiskitDynamicsExecutor] = None
+
+
+def _new_simulation_pool(
+    pool_size: int,
+    backend_config: BackendConfig,
+    backend_cls: Type[QiskitPulseBackend],
+    backend_kwargs: Dict[str, Any],
+) -> ProcessPoolExecutor:
+    """Starts a pool of processes each with an executor of the given backend
+
+    The processes are spawned rather than forked because jax is not fork-safe,
+    and they are all started and initialized before this function returns.
+
+    Args:
+        pool_size: the number of processes
+        backend_config: the configuration of the backend
+        backend_cls: the class of the backend
+        backend_kwargs: extra key-word args to pass to the backend on initialisation
+
+    Returns:
+        the pool of initialized processes
+    """
+    pool = ProcessPoolExecutor(
+        max_workers=pool_size,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pool_process,
+        initargs=(backend_config, backend_cls, backend_kwargs),
+    )
+    wait([pool.submit(_is_pool_process_ready) for _ in range(pool_size)])
+    return pool
+
+
+def _init_pool_process(
+    backend_config: BackendConfig,
+    backend_cls: Type[QiskitPulseBackend],
+    backend_kwargs: Dict[str, Any],
+):
+    """Constructs the executor of this process of the simulation pool
+
+    Args:
+        backend_config: the configuration of the backend
+        backend_cls: the class of the backend
+        backend_kwargs: extra key-word args to pass to the backend on initialisation
+    """
+    global _POOL_EXECUTOR
+    _POOL_EXECUTOR = QiskitDynamicsExecutor(
+        backend_config=backend_config, backend_cls=backend_cls, **backend_kwargs
+    )
+
+
+def _is_pool_process_ready() -> bool:
+    """Returns whether the executor of this process of the simulation pool is ready"""
+    return _POOL_EXECUTOR is not None
+
+
+def _run_in_pool(
+    experiments: List[CompiledExperiment], native_config: NativeQobjConfig
+) -> List[QExperimentResult]:
+    """Simulates the batch of experiments on the executor of this process of the pool
+
+    Args:
+        experiments: the compiled experiments to run
+        native_config: native config for the qobj
+
+    Returns:
+        the results of the experiments, in their order
+    """
+    return _POOL_EXECUTOR._run_batch(experiments, native_config=native_config)
+
+
 class _QiskitDynMeasReturn(str, enum.Enum):
     """Enum for the meas returns of qiskit dynamics backend"""
 
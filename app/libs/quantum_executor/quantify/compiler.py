@@ -0,0 +1,201 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""The compiler of PulseQobjs into quantify compiled schedules"""
+import copy
+import enum
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from qiskit.qobj import PulseQobj
+from quantify_scheduler import CompiledSchedule, Schedule
+from quantify_scheduler.backends.graph_compilation import SerialCompiler
+from quantify_scheduler.device_under_test.quantum_device import QuantumDevice
+
+from app.libs.properties import get_calibration_version
+from app.libs.properties.dtos import BackendConfig
+from app.libs.quantum_executor.base.compiler import QuantumCompiler
+from app.libs.quantum_executor.base.quantum_job import get_experiment_name
+from app.libs.quantum_executor.base.quantum_job.dtos import NativeQobjConfig
+from app.libs.quantum_executor.quantify.experiment import QuantifyExperiment
+from app.libs.quantum_executor.utils.cache import DiskCache
+from app.libs.quantum_executor.utils.config import load_quantify_config
+from app.libs.quantum_executor.utils.portclock import generate_hardware_map
+
+
+class QuantifyCompiler(QuantumCompiler):
+    """The compiler of PulseQobjs into schedules ready for the qblox instruments
+
+    It only needs the hardware configuration, not a connection to the hardware.
+    If given a cache, the compiled schedules are looked up in it by a fingerprint of
+    the schedule, the hardware configuration and the calibration version,
+    so resubmitted experiments are not compiled again.
+    """
+
+    def __init__(
+        self,
+        quantify_config_file: Union[str, bytes, os.PathLike],
+        backend_config: BackendConfig,
+        cache: Optional[DiskCache] = None,
+    ):
+        self.quantify_config = load_quantify_config(quantify_config_file)
+        self.cache = cache
+        self._quantify_config_hash = hashlib.sha256(
+            Path(quantify_config_file).read_bytes()
+        ).hexdigest()
+        self.hardware_map = generate_hardware_map(
+            qubit_ids=backend_config.device_config.qubit_ids,
+            coupling_dict=backend_config.device_config.coupling_dict,
+            quantify_config=self.quantify_config,
+        )
+
+    def _to_native_experiments(
+        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
+    ) -> List[QuantifyExperiment]:
+        native_experiments = [
+            QuantifyExperiment.from_qobj_expt(
+                name=get_experiment_name(expt.header.name, idx + 1),
+                expt=expt,
+                qobj_config=qobj.config,
+                hardware_map=self.hardware_map,
+                native_config=native_config,
+            )
+            for idx, expt in enumerate(qobj.experiments)
+        ]
+        return native_experiments
+
+    def _compile_native(
+        self, experiment: QuantifyExperiment, /, *, native_config: NativeQobjConfig
+    ) -> CompiledSchedule:
+        schedule = experiment.schedule
+        if self.cache is None:
+            return self._compile_schedule(schedule)
+
+        key = self._get_cache_key(schedule)
+        compiled_schedule: Optional[CompiledSchedule] = self.cache.get(key)
+        if compiled_schedule is not None:
+            # the name is left out of the fingerprint
+            compiled_schedule["name"] = schedule.name
+            return compiled_schedule
+
+        compiled_schedule = self._compile_schedule(schedule)
+        self.cache.put(key, compiled_schedule)
+        return compiled_schedule
+
+    def _compile_schedule(self, schedule: Schedule) -> CompiledSchedule:
+        """Compiles the schedule for the hardware in the quantify config
+
+        Args:
+            schedule: the schedule to compile
+
+        Returns:
+            the compiled schedule
+        """
+        t1 = datetime.now()
+        schedule_to_compile = copy.deepcopy(schedule)
+
+        quantum_device = QuantumDevice("DUT")
+        quantum_device.hardware_config(self.quantify_config)
+
+        compiler = SerialCompiler(name="compiler")
+        compiled_schedule = compiler.compile(
+            schedule=schedule_to_compile,
+            config=quantum_device.generate_compilation_config(),
+        )
+        t2 = datetime.now()
+        print(t2 - t1, "DURATION OF COMPILING")
+        return compiled_schedule
+
+    def _get_cache_key(self, schedule: Schedule) -> str:
+        """Returns the key of the compiled schedule in the cache
+
+        Args:
+            schedule: the schedule to compile
+
+        Returns:
+            the hex digest of the fingerprint of the schedule, the hardware
+            configuration and the calibration version
+        """
+        fingerprint = {
+            "schedule": _get_schedule_fingerprint(schedule),
+            "quantify_config": self._quantify_config_hash,
+            "calibration_version": get_calibration_version(),
+        }
+        data = json.dumps(fingerprint, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _get_schedule_fingerprint(schedule: Schedule) -> Any:
+    """Returns a JSON-serializable form of the schedule that is equal for equal schedules
+
+    The random labels of the schedulables and the operation ids, which are hashes
+    that change from process to process, are replaced by their positions.
+    The name of the schedule is left out.
+
+    Args:
+        schedule: the schedule to fingerprint
+
+    Returns:
+        the canonical form of the schedule
+    """
+    aliases: Dict[Any, str] = {
+        label: f"schedulable-{idx}" for idx, label in enumerate(schedule.schedulables)
+    }
+    aliases.update(
+        {op_id: f"operation-{idx}" for idx, op_id in enumerate(schedule.operations)}
+    )
+    data = {key: value for key, value in schedule.data.items() if key != "name"}
+    return _canonicalize(data, aliases)
+
+
+def _canonicalize(value: Any, aliases: Dict[Any, str]) -> Any:
+    """Converts the value into plain JSON-serializable values, replacing the aliased ones
+
+    Args:
+        value: the value to convert
+        aliases: the map of the values to replace and their replacements
+
+    Returns:
+        the canonical form of the value
+    """
+    if isinstance(value, (str, int)) and value in aliases:
+        return aliases[value]
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, Mapping):
+        return {
+            str(_canonicalize(k, aliases)): _canonicalize(v, aliases)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(item, aliases) for item in value]
+    if isinstance(value, np.ndarray):
+        data = np.ascontiguousarray(value).tobytes()
+        return {
+            "dtype": str(value.dtype),
+            "shape": list(value.shape),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+    if isinstance(value, np.generic):
+        return _canonicalize(value.item(), aliases)
+    if isinstance(value, complex):
+        return {"real": value.real, "imag": value.imag}
+    if isinstance(value, enum.Enum):
+        return _canonicalize(value.value, aliases)
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
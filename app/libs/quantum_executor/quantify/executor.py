@@ -19,30 +19,22 @@
 This module implements the executor.
 """
 
-import copy
 import os
 from datetime import datetime
-from typing import List, Optional, Union
+from typing import Optional, Union
 
 import qblox_instruments
-from qiskit.qobj import PulseQobj
-from quantify_scheduler.backends.graph_compilation import SerialCompiler
-from quantify_scheduler.device_under_test.quantum_device import QuantumDevice
 from quantify_scheduler.instrument_coordinator import InstrumentCoordinator
 from quantify_scheduler.instrument_coordinator.components.qblox import ClusterComponent
 
 from app.libs.properties.dtos import BackendConfig
+from app.libs.quantum_executor.base.compiler import CompiledExperiment
 from app.libs.quantum_executor.base.executor import QuantumExecutor
-from app.libs.quantum_executor.base.quantum_job import get_experiment_name
 from app.libs.quantum_executor.base.quantum_job.dtos import NativeQobjConfig
 from app.libs.quantum_executor.base.quantum_job.typing import QExperimentResult
-from app.libs.quantum_executor.quantify.experiment import QuantifyExperiment
-from app.libs.quantum_executor.utils.config import (
-    QuantifyMetadata,
-    load_quantify_config,
-)
+from app.libs.quantum_executor.quantify.compiler import QuantifyCompiler
+from app.libs.quantum_executor.utils.config import QuantifyMetadata
 from app.libs.quantum_executor.utils.logger import ExperimentLogger
-from app.libs.quantum_executor.utils.portclock import generate_hardware_map
 
 
 class QuantifyExecutor(QuantumExecutor):
@@ -56,18 +48,13 @@ class QuantifyExecutor(QuantumExecutor):
         quantify_metadata_file: Union[str, bytes, os.PathLike],
         backend_config: BackendConfig,
     ):
-        self.quantify_config = load_quantify_config(quantify_config_file)
-
-        qubit_ids = backend_config.device_config.qubit_ids
-        coupling_dict = backend_config.device_config.coupling_dict
+        compiler = QuantifyCompiler(
+            quantify_config_file=quantify_config_file, backend_config=backend_config
+        )
+        self.quantify_config = compiler.quantify_config
 
         # --- Initialize executor and hardware ---
-        self.hardware_map = generate_hardware_map(
-            qubit_ids=qubit_ids,
-            coupling_dict=coupling_dict,
-            quantify_config=self.quantify_config,
-        )
-        super().__init__(hardware_map=self.hardware_map)
+        super().__init__(compiler=compiler, hardware_map=compiler.hardware_map)
 
         # make sure all previous connections are closed
         qblox_instruments.Cluster.close_all()
@@ -83,58 +70,46 @@ class QuantifyExecutor(QuantumExecutor):
             cluster.reset()  # resets cluster for consistency
             self._coordinator.add_component(ClusterComponent(cluster))
 
-    def _to_native_experiments(
-        self, qobj: PulseQobj, native_config: NativeQobjConfig, /
-    ) -> List[QuantifyExperiment]:
-        native_experiments = [
-            QuantifyExperiment.from_qobj_expt(
-                name=get_experiment_name(expt.header.name, idx + 1),
-                expt=expt,
-                qobj_config=qobj.config,
-                hardware_map=self.hardware_map,
-                native_config=native_config,
-            )
-            for idx, expt in enumerate(qobj.experiments)
-        ]
-        return native_experiments
-
     def _run_native(
         self,
-        experiment: QuantifyExperiment,
+        experiment: CompiledExperiment,
         *,
         native_config: NativeQobjConfig,
         logger: ExperimentLogger,
     ) -> QExperimentResult:
         # Stop any running sequences.
         self._coordinator.stop()
-        t1 = datetime.now()
-        schedule_to_compile = copy.deepcopy(experiment.schedule)
-
-        quantum_device = QuantumDevice("DUT")
-        clean_config = self.quantify_config
-        quantum_device.hardware_config(clean_config)
-
-        compiler = SerialCompiler(name="compiler")
-        compiled_schedule = compiler.compile(
-            schedule=schedule_to_compile,
-            config=quantum_device.generate_compilation_config(),
-        )
-        t2 = datetime.now()
-        print(t2 - t1, "DURATION OF COMPILING")
+        # the schedule was compiled by the QuantifyCompiler
+        compiled_schedule = experiment.program
 
         logger.log_Q1ASM_programs(compiled_schedule)
         logger.log_schedule(compiled_schedule)
 
         self._coordinator.prepare(compiled_schedule)
+        # the last checkpoint before the instruments are started
+        self._raise_if_cancelled()
         t3 = datetime.now()
         self._coordinator.start()
         self._coordinator.wait_done(timeout_sec=10)
+        # the acquisitions of a cancelled job are not worth retrieving
+        self._raise_if_cancelled()
         results = self._coordinator.retrieve_acquisition()
         print(f"{results=}")
         t4 = datetime.now()
         print(t4 - t3, "DURATION OF MEASURING")
         return QExperimentResult.from_xarray(results)
 
+    def is_healthy(self) -> bool:
+        # querying the state of the instruments fails if the clusters are unreachable
+        if self._coordinator is None:
+            return False
+        try:
+            self._coordinator.is_running
+        except Exception as exp:
+            print(f"Instrument coordinator is unhealthy. exp: {exp}")
+            return False
+        return True
+
     @classmethod
     def close(cls):
         if cls._coordinator is not None:
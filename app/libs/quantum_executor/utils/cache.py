@@ -0,0 +1,112 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""A content-addressed cache of pickled objects on disk"""
+import os
+import pickle
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+
+_SUFFIX = ".pickle"
+
+
+class DiskCache:
+    """A directory of pickled objects, each in a file named after its key
+
+    The least recently used objects are evicted once the files take more than
+    the maximum number of bytes. The modification time of a file is its last use.
+    The cache can be shared by several processes: files are written to
+    a temporary file first and then renamed, so a reader never sees a partial file.
+
+    Attributes:
+        directory: the directory of the files
+        max_bytes: the maximum total size of the files
+        hits: the number of lookups in this process that found the object
+        misses: the number of lookups in this process that did not
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Gets the object of the given key, marking it as recently used
+
+        Args:
+            key: the key of the object
+
+        Returns:
+            the object or None if it is not in the cache
+        """
+        path = self._get_path(key)
+        try:
+            with path.open("rb") as file:
+                value = pickle.load(file)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # a file that cannot be loaded e.g. of an older library version is dropped
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """Stores the object under the given key, evicting old objects if need be
+
+        Objects larger than the cache itself are not stored.
+
+        Args:
+            key: the key of the object
+            value: the object to store
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._get_path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Deletes the least recently used files until they fit in max_bytes"""
+        entries: List[Tuple[float, int, Path]] = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # deleted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+
+    def _get_path(self, key: str) -> Path:
+        """Returns the path to the file of the given key
+
+        Args:
+            key: the key of the object
+        """
+        return self.directory / f"{key}{_SUFFIX}"
@@ -11,9 +11,29 @@
 # that they have been altered from the originals.
 
 """Utilities for connections to quantum_executor service"""
+from contextlib import AbstractContextManager, nullcontext
+
 from filelock import FileLock
 
+import settings
+
+# the executor types that simulate the hardware and thus need no lock
+SIMULATOR_EXECUTOR_TYPES = ("qiskit_pulse_1q", "qiskit_pulse_2q")
+
+
+def get_executor_lock(
+    executor_type: str = settings.EXECUTOR_TYPE,
+) -> AbstractContextManager:
+    """Get a lock on the quantum executor to avoid interference when controlling it
+
+    Simulators share no hardware so their jobs are not locked and can run in parallel.
+
+    Args:
+        executor_type: the type of the executor to lock
 
-def get_executor_lock():
-    """Get a lock on the quantum executor to avoid interference when controlling it"""
+    Returns:
+        the lock, to use as a context manager
+    """
+    if executor_type in SIMULATOR_EXECUTOR_TYPES:
+        return nullcontext()
     return FileLock(".quantum-executor.lock")
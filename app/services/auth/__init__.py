@@ -1,11 +1,24 @@
 """Entry point for the auth service"""
+from .cache import AuthLogCache
 from .dtos import Credentials, JobStatus
 from .exc import AuthenticationError, AuthorizationError, JobAlreadyExists
-from .service import authenticate, save_credentials
+from .service import (
+    archive_auth_logs,
+    authenticate,
+    authenticate_async,
+    authenticate_many_async,
+    save_credentials,
+    save_credentials_async,
+)
 
 __all__ = [
+    archive_auth_logs,
     save_credentials,
+    save_credentials_async,
     authenticate,
+    authenticate_async,
+    authenticate_many_async,
+    AuthLogCache,
     Credentials,
     JobStatus,
     JobAlreadyExists,
@@ -0,0 +1,145 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""In-process cache of the auth logs, invalidated through redis pub/sub"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from redis.asyncio import Redis as AsyncRedis
+
+from app.utils.redis import listen
+
+from .dtos import AuthLog
+
+# the channel on which the composite keys of the changed auth logs are published
+AUTH_INVALIDATIONS_CHANNEL = "auth_service:invalidations"
+
+
+class AuthLogCache:
+    """A bounded LRU cache of auth logs whose entries expire after a time-to-live
+
+    Entries are dropped as soon as their auth log changes in redis, as announced
+    on the 'auth_service:invalidations' channel. The cache is bypassed whenever
+    it is not subscribed to that channel, so it never serves an auth log that
+    changed while it could not hear about it.
+
+    Only existing auth logs are cached so that newly saved credentials are
+    usable right away.
+
+    Attributes:
+        max_size: the maximum number of auth logs kept
+        ttl: the seconds after which a cached auth log is read from redis again
+    """
+
+    def __init__(self, redis_db: AsyncRedis, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._redis_db = redis_db
+        self._entries: "OrderedDict[str, Tuple[float, AuthLog]]" = OrderedDict()
+        # incremented on each invalidation so that auth logs read before it are not cached
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+        self._is_listening = False
+
+    @property
+    def generation(self) -> int:
+        """The number of invalidations so far, to pass to `set` after reading redis"""
+        return self._generation
+
+    def get(self, key: str) -> Optional[AuthLog]:
+        """Returns the cached auth log of the given composite key if still valid
+
+        It also starts listening to the invalidations if it is not yet doing so.
+
+        Args:
+            key: the composite key of the app token and job id
+
+        Returns:
+            the auth log or None if it is not cached, has expired or
+            the cache is not listening to the invalidations
+        """
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        if not self._is_listening:
+            return None
+
+        try:
+            expires_at, auth_log = self._entries[key]
+        except KeyError:
+            return None
+
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return auth_log
+
+    def set(self, key: str, auth_log: AuthLog, generation: int):
+        """Caches the auth log of the given composite key
+
+        Args:
+            key: the composite key of the app token and job id
+            auth_log: the auth log as read from redis
+            generation: the `generation` of the cache before the auth log was read;
+                if there has been an invalidation since, the auth log is not cached
+        """
+        if not self._is_listening or generation != self._generation:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, auth_log)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drops the auth log of the given composite key, or all if no key is given
+
+        Args:
+            key: the composite key of the app token and job id
+        """
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _listen(self):
+        """Receives the invalidations and drops the corresponding auth logs"""
+        try:
+            await listen(
+                self._redis_db,
+                AUTH_INVALIDATIONS_CHANNEL,
+                on_message=lambda _, data: self.invalidate(data.decode("utf-8")),
+                on_subscribed=self._on_subscribed,
+                on_lost=self._on_subscription_lost,
+            )
+        finally:
+            self._is_listening = False
+
+    def _on_subscribed(self):
+        """Starts caching once subscribed to the invalidations"""
+        # changes may have been missed before the subscription
+        self.invalidate()
+        self._is_listening = True
+
+    def _on_subscription_lost(self, exp: Exception):
+        """Stops caching until subscribed to the invalidations again
+
+        Args:
+            exp: the exception by which the subscription was lost
+        """
+        print(f"Auth invalidations subscription lost: {exp}")
+        self._is_listening = False
+        self.invalidate()
@@ -1,14 +1,25 @@
 """The service file for handling authentication"""
+import asyncio
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from redis.asyncio import Redis as AsyncRedis
 from redis.client import Redis
 
+import settings
+from app.utils.archive import Archive
+from app.utils.exc import BaseBccException
+from app.utils.redis import to_str
+
+from .cache import AUTH_INVALIDATIONS_CHANNEL, AuthLogCache
 from .dtos import AuthLog, Credentials, JobStatus
 from .exc import AuthenticationError, AuthorizationError, JobAlreadyExists
 
 _AUTH_HASH_KEY = "auth_service"
 _SEPARATOR = "@@@"
+# The auth logs of archived jobs are moved to the archive.
+# They are read from there whenever they are not in redis.
+_ARCHIVE = Archive(settings.JOB_ARCHIVE_FILE)
 
 
 def save_credentials(redis_db: Redis, payload: Credentials):
@@ -22,7 +33,36 @@ def save_credentials(redis_db: Redis, payload: Credentials):
         JobAlreadyExists: job id '{payload.job_id}' already exists
     """
     redis_key = _get_composite_key((payload.app_token, payload.job_id))
-    if redis_db.hexists(_AUTH_HASH_KEY, redis_key):
+    if redis_db.hexists(_AUTH_HASH_KEY, redis_key) or _ARCHIVE.get_auth_logs(
+        [redis_key]
+    ):
+        raise JobAlreadyExists(f"job id '{payload.job_id}' already exists")
+
+    timestamp = datetime.utcnow()
+    auth_log = AuthLog(
+        status=JobStatus.REGISTERED,
+        created_at=timestamp,
+        updated_at=timestamp,
+    )
+
+    pipe = redis_db.pipeline()
+    pipe.hset(_AUTH_HASH_KEY, redis_key, auth_log.json())
+    pipe.publish(AUTH_INVALIDATIONS_CHANNEL, redis_key)
+    pipe.execute()
+
+
+async def save_credentials_async(redis_db: AsyncRedis, payload: Credentials):
+    """Saves the credentials passed, without blocking the event loop
+
+    Args:
+        redis_db: the async redis database connection where to save the credentials
+        payload: the credentials to save
+
+    Raises:
+        JobAlreadyExists: job id '{payload.job_id}' already exists
+    """
+    redis_key = _get_composite_key((payload.app_token, payload.job_id))
+    if await asyncio.to_thread(_ARCHIVE.get_auth_logs, [redis_key]):
         raise JobAlreadyExists(f"job id '{payload.job_id}' already exists")
 
     timestamp = datetime.utcnow()
@@ -32,7 +72,11 @@ def save_credentials(redis_db: Redis, payload: Credentials):
         updated_at=timestamp,
     )
 
-    redis_db.hset(_AUTH_HASH_KEY, redis_key, auth_log.json())
+    is_saved = await redis_db.hsetnx(_AUTH_HASH_KEY, redis_key, auth_log.json())
+    if not is_saved:
+        raise JobAlreadyExists(f"job id '{payload.job_id}' already exists")
+
+    await redis_db.publish(AUTH_INVALIDATIONS_CHANNEL, redis_key)
 
 
 def authenticate(
@@ -53,14 +97,198 @@ def authenticate(
     """
     redis_key = _get_composite_key((credentials.app_token, credentials.job_id))
     auth_log_str = redis_db.hget(_AUTH_HASH_KEY, redis_key)
+    if auth_log_str is None:
+        auth_log_str = _ARCHIVE.get_auth_logs([redis_key]).get(redis_key)
+    _validate_auth_log(auth_log_str, credentials, expected_status=expected_status)
+
+
+async def authenticate_async(
+    redis_db: AsyncRedis,
+    credentials: Credentials,
+    expected_status: Optional[JobStatus] = None,
+    cache: Optional[AuthLogCache] = None,
+):
+    """Checks whether the given credentials are valid, without blocking the event loop
+
+    Args:
+        redis_db: the async redis database connection where the credentials are saved
+        credentials: the credentials to authenticate
+        expected_status: the status that the job should be at. If None, status does not matter
+        cache: the in-process cache of the auth logs to read from first, if any
+
+    Raises:
+        AuthenticationError: job {credentials.job_id} does not exist for current user
+        AuthorizationError: job {credentials.job_id} is already {auth_log.status}
+    """
+    redis_key = _get_composite_key((credentials.app_token, credentials.job_id))
+    auth_log = None if cache is None else cache.get(redis_key)
+    if auth_log is None:
+        generation = None if cache is None else cache.generation
+        auth_log_str = await redis_db.hget(_AUTH_HASH_KEY, redis_key)
+        if auth_log_str is None:
+            archived = await asyncio.to_thread(_ARCHIVE.get_auth_logs, [redis_key])
+            auth_log_str = archived.get(redis_key)
+        auth_log = _parse_auth_log(auth_log_str, credentials)
+        if cache is not None:
+            cache.set(redis_key, auth_log, generation=generation)
+
+    _authorize(auth_log, credentials, expected_status=expected_status)
+
+
+async def authenticate_many_async(
+    redis_db: AsyncRedis,
+    credentials: List[Credentials],
+    expected_status: Optional[JobStatus] = None,
+    cache: Optional[AuthLogCache] = None,
+) -> List[Optional[BaseBccException]]:
+    """Checks whether each of the given credentials is valid in a single call to redis
+
+    Args:
+        redis_db: the async redis database connection where the credentials are saved
+        credentials: the list of credentials to authenticate
+        expected_status: the status that the jobs should be at. If None, status does not matter
+        cache: the in-process cache of the auth logs to read from first, if any
+
+    Returns:
+        for each of the credentials, None if they are valid, else the
+            AuthenticationError or AuthorizationError they raise
+    """
+    redis_keys = [
+        _get_composite_key((item.app_token, item.job_id)) for item in credentials
+    ]
+    cached_auth_logs = {}
+    if cache is not None:
+        cached_auth_logs = {key: cache.get(key) for key in redis_keys}
+
+    missing_keys = [key for key in redis_keys if cached_auth_logs.get(key) is None]
+    raw_auth_logs = {}
+    if missing_keys:
+        generation = None if cache is None else cache.generation
+        values = await redis_db.hmget(_AUTH_HASH_KEY, missing_keys)
+        raw_auth_logs = dict(zip(missing_keys, values))
+        unsaved_keys = [key for key, value in raw_auth_logs.items() if value is None]
+        if unsaved_keys:
+            archived = await asyncio.to_thread(_ARCHIVE.get_auth_logs, unsaved_keys)
+            raw_auth_logs.update(archived)
 
+    errors: List[Optional[BaseBccException]] = []
+    for item, redis_key in zip(credentials, redis_keys):
+        try:
+            auth_log = cached_auth_logs.get(redis_key)
+            if auth_log is None:
+                auth_log = _parse_auth_log(raw_auth_logs[redis_key], item)
+                if cache is not None:
+                    cache.set(redis_key, auth_log, generation=generation)
+
+            _authorize(auth_log, item, expected_status=expected_status)
+            errors.append(None)
+        except (AuthenticationError, AuthorizationError) as exp:
+            errors.append(exp)
+
+    return errors
+
+
+def archive_auth_logs(redis_db: Redis, batch_size: int = 500) -> int:
+    """Moves the auth logs of the archived jobs to the archive
+
+    The auth hash is scanned in batches, so redis is never blocked for long.
+    The in-process caches of the auth logs are notified of the moved auth logs.
+
+    Args:
+        redis_db: the redis database connection where the credentials are saved
+        batch_size: the approximate number of auth logs read at a time
+
+    Returns:
+        the number of auth logs archived
+    """
+    archived_count = 0
+    cursor = 0
+    while True:
+        cursor, raw_auth_logs = redis_db.hscan(_AUTH_HASH_KEY, cursor, count=batch_size)
+        auth_logs: Dict[str, Tuple[str, str]] = {}
+        for raw_key, raw_auth_log in raw_auth_logs.items():
+            key = to_str(raw_key)
+            auth_logs[key] = (key.rsplit(_SEPARATOR, 1)[-1], to_str(raw_auth_log))
+
+        archived_job_ids = set(
+            _ARCHIVE.get_archived_job_ids([job_id for job_id, _ in auth_logs.values()])
+        )
+        archived_auth_logs = {
+            key: value
+            for key, value in auth_logs.items()
+            if value[0] in archived_job_ids
+        }
+        if archived_auth_logs:
+            _ARCHIVE.save_auth_logs(archived_auth_logs)
+            pipe = redis_db.pipeline()
+            pipe.hdel(_AUTH_HASH_KEY, *archived_auth_logs.keys())
+            for key in archived_auth_logs:
+                pipe.publish(AUTH_INVALIDATIONS_CHANNEL, key)
+            pipe.execute()
+            archived_count += len(archived_auth_logs)
+
+        if cursor == 0:
+            break
+
+    return archived_count
+
+
+def _validate_auth_log(
+    auth_log_str: Optional[bytes],
+    credentials: Credentials,
+    expected_status: Optional[JobStatus] = None,
+):
+    """Checks whether the auth log saved for the given credentials is valid
+
+    Args:
+        auth_log_str: the auth log as saved in redis or None if there was none
+        credentials: the credentials being authenticated
+        expected_status: the status that the job should be at. If None, status does not matter
+
+    Raises:
+        AuthenticationError: job {credentials.job_id} does not exist for current user
+        AuthorizationError: job {credentials.job_id} is already {auth_log.status}
+    """
+    auth_log = _parse_auth_log(auth_log_str, credentials)
+    _authorize(auth_log, credentials, expected_status=expected_status)
+
+
+def _parse_auth_log(auth_log_str: Optional[bytes], credentials: Credentials) -> AuthLog:
+    """Parses the auth log saved for the given credentials
+
+    Args:
+        auth_log_str: the auth log as saved in redis or None if there was none
+        credentials: the credentials being authenticated
+
+    Returns:
+        the auth log
+
+    Raises:
+        AuthenticationError: job {credentials.job_id} does not exist for current user
+    """
     if auth_log_str is None:
         raise AuthenticationError(
             f"job {credentials.job_id} does not exist for current user"
         )
 
-    auth_log = AuthLog.parse_raw(auth_log_str)
+    return AuthLog.parse_raw(auth_log_str)
 
+
+def _authorize(
+    auth_log: AuthLog,
+    credentials: Credentials,
+    expected_status: Optional[JobStatus] = None,
+):
+    """Checks whether the job of the auth log has the expected status
+
+    Args:
+        auth_log: the auth log saved for the given credentials
+        credentials: the credentials being authenticated
+        expected_status: the status that the job should be at. If None, status does not matter
+
+    Raises:
+        AuthorizationError: job {credentials.job_id} is already {auth_log.status}
+    """
     if expected_status and auth_log.status != expected_status:
         raise AuthorizationError(
             f"job {credentials.job_id} is already {auth_log.status}"
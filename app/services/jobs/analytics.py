@@ -0,0 +1,121 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Analytics of the stages of jobs, computed from the stream of their transitions"""
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import settings
+from app.utils.redis import to_str
+
+from .service import JOB_TRANSITIONS_STREAM_KEY, TIMED_LOCATION_STAGES, Location
+
+# The default percentiles of the time jobs spend at each stage
+PERCENTILES: Tuple[float, ...] = (50, 95, 99)
+
+# the number of transitions read from the stream per round trip
+_BATCH_SIZE = 1000
+
+
+def compute_stage_percentiles(
+    window: float, percentiles: Sequence[float] = PERCENTILES
+) -> Dict[str, Any]:
+    """Computes the percentiles of the queue wait and processing time of each stage
+
+    Only the jobs that left a location within the sliding window ending now
+    are considered, and only the transitions still in the capped stream.
+
+    Args:
+        window: the seconds of the sliding window
+        percentiles: the percentiles to compute, between 0 and 100
+
+    Returns:
+        dict of the 'window' in seconds, the number of jobs 'finished' in it,
+        the 'throughput' in finished jobs per second, and the 'stages', a dict of
+        each stage and its 'queue_wait' and 'processing' times, each a dict of
+        the 'count' of jobs and the seconds at each percentile e.g. 'p95',
+        None if there were no jobs
+    """
+    start_ms = max(int((time.time() - window) * 1000), 0)
+    durations: Dict[Location, List[int]] = {
+        location: [] for location in TIMED_LOCATION_STAGES
+    }
+    finished = 0
+
+    for transition in _read_transitions(start=f"{start_ms}"):
+        if "finished" in transition.get("states", "").split(","):
+            finished += 1
+
+        arrived_ts = transition.get("arrived_ts")
+        previous_location = transition.get("previous_location")
+        if not arrived_ts or not previous_location:
+            continue
+
+        location = Location(int(previous_location))
+        if location in durations:
+            durations[location].append(int(transition["ts"]) - int(arrived_ts))
+
+    stages: Dict[str, Dict[str, Dict[str, Optional[float]]]] = {}
+    for location, (stage, kind) in TIMED_LOCATION_STAGES.items():
+        stages.setdefault(stage, {})[kind] = _summarize(
+            durations[location], percentiles
+        )
+
+    return {
+        "window": window,
+        "finished": finished,
+        "throughput": finished / window,
+        "stages": stages,
+    }
+
+
+def _read_transitions(start: str) -> Iterator[Dict[str, str]]:
+    """Reads the transitions in the stream from the given stream id onwards
+
+    Args:
+        start: the stream id, or epoch milliseconds, from which to read
+
+    Returns:
+        iterator of the fields of the transitions, oldest first
+    """
+    connection = settings.REDIS_CONNECTION
+    while True:
+        entries = connection.xrange(
+            JOB_TRANSITIONS_STREAM_KEY, min=start, max="+", count=_BATCH_SIZE
+        )
+        for _, fields in entries:
+            yield {to_str(key): to_str(value) for key, value in fields.items()}
+
+        if len(entries) < _BATCH_SIZE:
+            return
+        start = f"({to_str(entries[-1][0])}"
+
+
+def _summarize(
+    durations_ns: List[int], percentiles: Sequence[float]
+) -> Dict[str, Optional[float]]:
+    """Returns the count and the percentiles in seconds of the given durations
+
+    Args:
+        durations_ns: the durations in nanoseconds
+        percentiles: the percentiles to compute, between 0 and 100
+    """
+    summary: Dict[str, Optional[float]] = {"count": len(durations_ns)}
+    if durations_ns:
+        values = np.percentile(np.asarray(durations_ns) / 1e9, percentiles)
+    else:
+        values = [None] * len(percentiles)
+
+    for percentile, value in zip(percentiles, values):
+        summary[f"p{percentile:g}"] = None if value is None else float(value)
+    return summary
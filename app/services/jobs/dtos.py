@@ -0,0 +1,42 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Data Transfer Objects for the jobs service"""
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class LocalPriorities(BaseModel):
+    """The priorities of a job in the queues of the stages after registration"""
+
+    pre_processing: int = 0
+    execution: int = 0
+    post_processing: int = 0
+
+
+class JobPriorities(BaseModel):
+    """The priorities of a job; the higher, the sooner it is dispatched
+
+    The priority of the job in the queue of a stage is its global priority
+    plus its local priority for that stage.
+    """
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    global_: int = Field(0, alias="global")
+    local: LocalPriorities = LocalPriorities()
+
+    def for_stage(self, stage: str) -> int:
+        """Returns the priority of the job in the queue of the given stage
+
+        Args:
+            stage: 'registration', 'pre_processing', 'execution' or 'post_processing'
+        """
+        return self.global_ + getattr(self.local, stage, 0)
@@ -0,0 +1,195 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Compact encoding of the results of jobs
+
+The memory of a result i.e. the list of the outcomes of each shot of each experiment,
+is stored as one contiguous array of unsigned integers per experiment instead of
+nested lists of hex strings. The packed form is:
+
+    MAGIC | header length (uint32, little-endian) | JSON header | data
+
+where the header holds the dtype of the arrays, the number of shots of each
+experiment and the other items of the result, and the data is the concatenation
+of the arrays of the experiments.
+"""
+import io
+import json
+import struct
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# starts with a byte that cannot start a JSON document
+_MAGIC = b"\x93TGR\x01"
+_HEADER_LENGTH = struct.Struct("<I")
+_DTYPES = (np.dtype("<u1"), np.dtype("<u2"), np.dtype("<u4"), np.dtype("<u8"))
+
+NPY_MEDIA_TYPE = "application/x-npy"
+NPZ_MEDIA_TYPE = "application/x-npz"
+
+
+def is_packed(data: Union[str, bytes]) -> bool:
+    """Whether the data is a packed result
+
+    Args:
+        data: the value of the result as stored in redis
+    """
+    return isinstance(data, bytes) and data.startswith(_MAGIC)
+
+
+def pack_result(result: Dict[str, Any]) -> Optional[bytes]:
+    """Packs the result, storing its memory as arrays of unsigned integers
+
+    Args:
+        result: the result of the job with a 'memory' item that is a list of
+            the hex strings, or an array of outcomes, of each experiment
+
+    Returns:
+        the packed result or None if the result has no memory that can be packed
+            e.g. outcomes that are not canonical hex strings or exceed 64 bits
+    """
+    memory = result.get("memory")
+    if not isinstance(memory, (list, tuple)):
+        return None
+
+    try:
+        arrays = [_to_outcomes(experiment) for experiment in memory]
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+    max_value = max((int(array.max()) for array in arrays if array.size), default=0)
+    dtype = next(dtype for dtype in _DTYPES if max_value <= np.iinfo(dtype).max)
+
+    header = json.dumps(
+        {
+            "dtype": dtype.str,
+            "shots": [len(array) for array in arrays],
+            "items": {key: value for key, value in result.items() if key != "memory"},
+        }
+    ).encode("utf-8")
+    data = b"".join(array.astype(dtype).tobytes() for array in arrays)
+    return _MAGIC + _HEADER_LENGTH.pack(len(header)) + header + data
+
+
+def unpack_memory(data: bytes) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """Unpacks the memory of a packed result as arrays of outcomes
+
+    The arrays are read-only views on the data, which is never copied.
+
+    Args:
+        data: the packed result
+
+    Returns:
+        tuple of the array of outcomes of each experiment and the other items of the result
+    """
+    offset = len(_MAGIC) + _HEADER_LENGTH.size
+    (header_length,) = _HEADER_LENGTH.unpack_from(data, len(_MAGIC))
+    header = json.loads(data[offset : offset + header_length])
+    offset += header_length
+
+    dtype = np.dtype(header["dtype"])
+    arrays = []
+    for shots in header["shots"]:
+        arrays.append(np.frombuffer(data, dtype=dtype, count=shots, offset=offset))
+        offset += shots * dtype.itemsize
+
+    return arrays, header["items"]
+
+
+def unpack_result(data: bytes) -> Dict[str, Any]:
+    """Unpacks a packed result with its memory as lists of hex strings
+
+    Args:
+        data: the packed result
+
+    Returns:
+        the result as it was before it was packed
+    """
+    arrays, items = unpack_memory(data)
+    return {
+        **items,
+        "memory": [[hex(value) for value in array.tolist()] for array in arrays],
+    }
+
+
+def get_memory_arrays(result: Union[bytes, Dict[str, Any]]) -> List[np.ndarray]:
+    """Returns the memory of the result as arrays of outcomes, whether packed or not
+
+    Args:
+        result: the packed result or the result with its memory as lists of hex strings
+
+    Returns:
+        the array of outcomes of each experiment
+    """
+    if is_packed(result):
+        arrays, _ = unpack_memory(result)
+        return arrays
+
+    return [_to_outcomes(experiment) for experiment in result.get("memory") or []]
+
+
+def to_npy(arrays: List[np.ndarray]) -> bytes:
+    """Encodes the memory as a 2D NumPy array of experiments by shots in .npy format
+
+    Args:
+        arrays: the array of outcomes of each experiment
+
+    Returns:
+        the .npy file contents
+
+    Raises:
+        ValueError: the experiments do not have the same number of shots
+    """
+    if len({len(array) for array in arrays}) > 1:
+        raise ValueError("the experiments do not have the same number of shots")
+
+    dtype = arrays[0].dtype if arrays else _DTYPES[0]
+    buffer = io.BytesIO()
+    np.save(buffer, np.array(arrays, dtype=dtype).reshape(len(arrays), -1))
+    return buffer.getvalue()
+
+
+def to_npz(arrays: List[np.ndarray]) -> bytes:
+    """Encodes the memory as NumPy arrays named 'experiment_{index}' in .npz format
+
+    Args:
+        arrays: the array of outcomes of each experiment
+
+    Returns:
+        the .npz file contents
+    """
+    buffer = io.BytesIO()
+    np.savez(buffer, **{f"experiment_{idx}": array for idx, array in enumerate(arrays)})
+    return buffer.getvalue()
+
+
+def _to_outcomes(experiment: Union[Sequence[str], np.ndarray]) -> np.ndarray:
+    """Converts the outcomes of the shots of an experiment to an array of integers
+
+    Args:
+        experiment: the hex strings or the array of integers of each shot
+
+    Returns:
+        the array of the outcomes
+
+    Raises:
+        ValueError: the outcomes are not canonical hex strings
+        OverflowError: an outcome does not fit in 64 bits
+    """
+    if isinstance(experiment, np.ndarray):
+        return experiment.astype(np.uint64, copy=False)
+
+    values = [int(value, 16) for value in experiment]
+    if any(hex(value) != text for value, text in zip(values, experiment)):
+        raise ValueError("the outcomes are not canonical hex strings")
+
+    return np.array(values, dtype=np.uint64)
@@ -14,22 +14,98 @@
 #
 # - Martin Ahindura, 2023
 
+import asyncio
+import functools
 import json
+import time
+from datetime import datetime, timedelta, timezone
 from enum import Enum, unique
 from pathlib import Path
-from typing import Any, Dict, Literal, Optional, Tuple, Union
-
-from rq.command import send_stop_job_command
-from rq.job import Job
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+from redis.asyncio import Redis as AsyncRedis
+from redis.client import Pipeline
+from redis.exceptions import WatchError
+from rq.command import send_command
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
 
 import settings
 
 from ...libs.properties.utils import date_time
+from ...utils.archive import Archive, ArchivedJob
+from ...utils.logs import BufferedLogWriter
+from ...utils.redis import to_str
+from . import results as results_lib
+from .dtos import JobPriorities
 
 STORAGE_ROOT = settings.STORAGE_ROOT
 JOB_SUPERVISOR_LOG = settings.JOB_SUPERVISOR_LOG
+JOB_SUPERVISOR_LOG_FORMAT = settings.JOB_SUPERVISOR_LOG_FORMAT
 STORAGE_PREFIX_DIRNAME = settings.STORAGE_PREFIX_DIRNAME
+
+# Each job entry is stored in its own redis hash whose fields are the
+# dot-separated paths to the leaves of the entry e.g. 'status.location'
+# so that updates and partial reads only touch the fields concerned.
+_JOB_KEY_PREFIX = "job_supervisor:jobs:"
+_FIELD_SEPARATOR = "."
+# the field of the result, which is packed to save space. See results.py
+_RESULT_FIELD = "result"
+# the field of the epoch nanoseconds at which the job arrived at its location,
+# which the float scores of the location indexes keep only to the microsecond
+# for recent times. It is not part of the entry of the job.
+_LOCATED_TS_FIELD = "located_ts"
+# Sorted sets of job ids scored by the epoch time at which the job was registered,
+# arrived at a given location, or finished, failed or was cancelled.
+_JOB_INDEX_PREFIX = "job_supervisor:index:"
+_REGISTERED_INDEX_KEY = f"{_JOB_INDEX_PREFIX}registered"
+# the legacy hash in which each job entry was a single JSON string
 _SUPERVISOR_HASH_KEY = "job_supervisor"
+# Every change of location or state of a job is published on its own pub/sub channel
+JOB_EVENTS_CHANNEL_PREFIX = "job_supervisor:events:"
+# The entries of jobs that have long finished, failed or been cancelled are moved
+# to the archive. They are read from there whenever they are not in redis.
+_ARCHIVE = Archive(settings.JOB_ARCHIVE_FILE)
+# the number of times a batch of jobs changed while being archived is tried again
+# before it is left in redis until the next call
+_ARCHIVE_BATCH_ATTEMPTS = 3
+# The histograms of the seconds jobs spent at each location, accumulated as the jobs
+# leave it, in a hash whose fields are '{location value}:{bucket index}' and
+# '{location value}:sum'. The buckets are the upper bounds below, then +Inf.
+_LOCATION_DURATIONS_KEY = "job_supervisor:metrics:location_durations"
+LOCATION_DURATION_BUCKETS: Tuple[float, ...] = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+    1800.0,
+    3600.0,
+)
+# Every change of location or state of a job is also appended to this capped stream
+# with timestamps in epoch nanoseconds, of microsecond precision as they are derived
+# from the timestamps of the entries, for the analytics across jobs. See analytics.py
+JOB_TRANSITIONS_STREAM_KEY = "job_supervisor:transitions"
 
 LOCALHOST = "localhost"
 
@@ -39,9 +115,14 @@ _EXECUTION_STAGE = "execution"
 _POST_PROCESSING_STAGE = "post_processing"
 _FINAL_STAGE = "final"
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 # Type hint constants
 Entry = Dict[str, Any]
 Result = Tuple[str, str]
+JobState = Literal["finished", "failed", "cancelled"]
+
+_JOB_STATES: Tuple[JobState, ...] = ("finished", "failed", "cancelled")
 
 
 @unique
@@ -60,6 +141,26 @@ class Location(Enum):
     FINAL_W = 9
 
 
+# The stage whose queue the job waits in at each queue location
+QUEUE_STAGES: Dict[Location, str] = {
+    Location.REG_Q: _REGISTRATION_STAGE,
+    Location.PRE_PROC_Q: _PRE_PROCESSING_STAGE,
+    Location.EXEC_Q: _EXECUTION_STAGE,
+    Location.PST_PROC_Q: _POST_PROCESSING_STAGE,
+}
+
+# The stage and the kind of time, "queue_wait" or "processing", that jobs spend
+# at each location timed by the metrics and the analytics
+TIMED_LOCATION_STAGES: Dict[Location, Tuple[str, str]] = {
+    Location.REG_W: (_REGISTRATION_STAGE, "processing"),
+    Location.PRE_PROC_Q: (_PRE_PROCESSING_STAGE, "queue_wait"),
+    Location.PRE_PROC_W: (_PRE_PROCESSING_STAGE, "processing"),
+    Location.EXEC_Q: (_EXECUTION_STAGE, "queue_wait"),
+    Location.EXEC_W: (_EXECUTION_STAGE, "processing"),
+    Location.PST_PROC_Q: (_POST_PROCESSING_STAGE, "queue_wait"),
+    Location.PST_PROC_W: (_POST_PROCESSING_STAGE, "processing"),
+}
+
 # Parse a location
 STR_LOC: Dict[Location, str] = {
     Location.REG_Q: "registration queue",
@@ -85,6 +186,26 @@ _LOCATION_TIMESTAMP_MAP: Dict[Location, Tuple[str, str, str]] = {
     Location.FINAL_Q: ("timestamps", _POST_PROCESSING_STAGE, "finished"),
 }
 
+# The paths in the job entry whose values are dicts that are stored field by field
+_NESTED_FIELDS = {
+    "priorities",
+    "priorities.local",
+    "status",
+    "status.cancelled",
+    "status.failed",
+    "timestamps",
+    *(
+        f"timestamps.{stage}"
+        for stage in (
+            _REGISTRATION_STAGE,
+            _PRE_PROCESSING_STAGE,
+            _EXECUTION_STAGE,
+            _POST_PROCESSING_STAGE,
+            _FINAL_STAGE,
+        )
+    ),
+}
+
 
 class EnumEncoder(json.JSONEncoder):
     """Encodes children of enumerable classes"""
@@ -111,18 +232,20 @@ def now() -> str:
 
 
 def fetch_redis_entry(job_id: str) -> Entry:
-    """Query redis for job supervisor entry."""
-    entry = settings.REDIS_CONNECTION.hget(_SUPERVISOR_HASH_KEY, job_id)
+    """Query redis for job supervisor entry, or the archive if it is not in redis."""
+    fields = settings.REDIS_CONNECTION.hgetall(_get_job_key(job_id))
+    if not fields:
+        fields = _fetch_archived_fields([job_id]).get(job_id)
 
-    if not entry:
+    if not fields:
         log(f"Job {job_id} not found", level=LogLevel.ERROR)
         raise JobNotFound(job_id)
 
-    return _load_json(entry)
+    return _load_entry(fields)
 
 
 def does_job_exist(job_id: str) -> bool:
-    """Checks whether a given job already exists
+    """Checks whether a given job already exists, in redis or in the archive
 
     Args:
         job_id: the id of the job
@@ -130,37 +253,50 @@ def does_job_exist(job_id: str) -> bool:
     Returns:
         True if the job exists else False
     """
-    entry = settings.REDIS_CONNECTION.hget(_SUPERVISOR_HASH_KEY, job_id)
-    return entry is not None
+    if settings.REDIS_CONNECTION.exists(_get_job_key(job_id)) > 0:
+        return True
+    return len(_ARCHIVE.get_archived_job_ids([job_id])) > 0
+
 
+def register_job(job_id: str, priorities: Optional[Dict[str, Any]] = None) -> None:
+    """Creates the entry of a job that has just reached the registration worker
 
-def register_job(job_id: str) -> None:
+    Args:
+        job_id: the id of the job
+        priorities: the priorities of the job, the default ones if None
+    """
     # job entry skeleton
-    entry = {
-        "id": job_id,
-        "priorities": {
-            "global": 0,
-            "local": {"pre_processing": 0, "execution": 0, "post_processing": 0},
-        },
-        "status": {
-            "location": Location.REG_W,
-            "started": now(),
-            "finished": None,
-            "cancelled": {"time": None, "reason": None},
-            "failed": {"time": None, "reason": None},
-        },
-        "timestamps": {
-            _REGISTRATION_STAGE: {"started": now(), "finished": None},
-            _PRE_PROCESSING_STAGE: {"started": None, "finished": None},
-            _EXECUTION_STAGE: {"started": None, "finished": None},
-            _POST_PROCESSING_STAGE: {"started": None, "finished": None},
-            _FINAL_STAGE: {"started": None, "finished": None},
-        },
-        "result": None,
-    }
-    settings.REDIS_CONNECTION.hset(
-        _SUPERVISOR_HASH_KEY, job_id, json.dumps(entry, cls=EnumEncoder)
-    )
+    entry = _new_entry(job_id)
+    if priorities is not None:
+        entry["priorities"] = priorities
+
+    registered_ts = _to_epoch_ns(entry["status"]["started"])
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        pipe.delete(_get_job_key(job_id))
+        pipe.hset(
+            _get_job_key(job_id),
+            mapping={**_flatten(entry), _LOCATED_TS_FIELD: registered_ts},
+        )
+        _add_to_indexes(pipe, job_id, entry)
+        pipe.publish(
+            get_job_events_channel(job_id),
+            _get_event_message(
+                job_id, Location.REG_W, states=(), timestamp=entry["status"]["started"]
+            ),
+        )
+        pipe.xadd(
+            JOB_TRANSITIONS_STREAM_KEY,
+            {
+                "job_id": job_id,
+                "location": Location.REG_W.value,
+                "previous_location": "",
+                "states": "",
+                "ts": registered_ts,
+            },
+            maxlen=settings.JOB_TRANSITIONS_MAXLEN,
+            approximate=True,
+        )
+        pipe.execute()
 
     # log entry
     log(f"Registered entry for job {job_id}")
@@ -169,35 +305,249 @@ def register_job(job_id: str) -> None:
 def update_job_entry(job_id: str, value: Any, *keys: str) -> None:
     """Updates job dict entry with given key(s).
 
+    Only the fields of the entry under the given keys are written,
+    in a single round trip to redis.
+    If no keys are passed, the value is a dict that is merged into the entry.
+
     Args:
         job_id: identifier of job to be updated
         value: new value of dictionary entry
         keys: nested keys of dictionary
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    fields = _flatten(value, *keys)
+    if fields:
+        _patch_entry(job_id, fields)
+
+
+def transition_job(
+    job_id: str,
+    location: Optional[Location] = None,
+    *,
+    final_timestamp: Optional[Literal["started", "finished"]] = None,
+    failed: bool = False,
+    cancelled: bool = False,
+    reason: Optional[str] = None,
+    result: Optional[Dict[str, Any]] = None,
+    items: Optional[Entry] = None,
+) -> Location:
+    """Moves the job to the next point of its life cycle in a single atomic call to redis
+
+    The location, the timestamp of the stage of that location, and optionally,
+    the failure, the cancellation, the result and any other top-level items are
+    all written to the job's entry at once, and the indexes of jobs are updated.
+
+    Args:
+        job_id: identifier of the job
+        location: the new location of the job. If None, the location is not changed
+        final_timestamp: the timestamp of the final stage to set to current time if any
+        failed: whether the job has failed
+        cancelled: whether the job has been cancelled
+        reason: the reason for the failure or the cancellation
+        result: the result of the job. If passed, the job is marked as finished
+        items: other top-level items to merge into the entry of the job
+
+    Returns:
+        the location of the job before this transition
+
+    Raises:
+        JobNotFound: Job {job_id} not found
     """
-    entry: Entry = fetch_redis_entry(job_id)
-    _deep_update(entry, value, keys)
-    settings.REDIS_CONNECTION.hset(
-        _SUPERVISOR_HASH_KEY, job_id, json.dumps(entry, cls=EnumEncoder)
+    timestamp = now()
+    fields = _flatten(items or {})
+    states: List[JobState] = []
+
+    if location is not None:
+        fields.update(_flatten(location, "status", "location"))
+        if location in QUEUE_STAGES:
+            fields.update(_flatten(get_rq_job_id(job_id, location), "rq_job_id"))
+        if location in _LOCATION_TIMESTAMP_MAP:
+            fields.update(_flatten(timestamp, *_LOCATION_TIMESTAMP_MAP[location]))
+
+    if final_timestamp is not None:
+        fields.update(_flatten(timestamp, "timestamps", _FINAL_STAGE, final_timestamp))
+
+    if failed:
+        states.append("failed")
+        fields.update(
+            _flatten({"time": timestamp, "reason": reason}, "status", "failed")
+        )
+
+    if cancelled:
+        states.append("cancelled")
+        fields.update(
+            _flatten({"time": timestamp, "reason": reason}, "status", "cancelled")
+        )
+
+    if result is not None:
+        states.append("finished")
+        fields.update(_flatten(timestamp, "status", "finished"))
+        fields.update(_flatten(result, "result"))
+
+    return _patch_entry(
+        job_id,
+        fields,
+        location=location,
+        states=states,
+        timestamp=timestamp,
     )
 
 
-def _deep_update(dict: Entry, value: Any, keys: Tuple[str]) -> Entry:
-    """Update a nested dictionary.
+def migrate_legacy_entries() -> int:
+    """Moves the job entries stored as JSON strings in the legacy hash to per-job hashes
+
+    Returns:
+        the number of entries migrated
+    """
+    legacy_entries = settings.REDIS_CONNECTION.hgetall(_SUPERVISOR_HASH_KEY)
+    if not legacy_entries:
+        return 0
+
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        for raw_job_id, raw_entry in legacy_entries.items():
+            job_id = to_str(raw_job_id)
+            entry = json.loads(raw_entry)
+            fields = _flatten(entry)
+            if fields:
+                pipe.hset(_get_job_key(job_id), mapping=fields)
+                _add_to_indexes(pipe, job_id, entry)
+
+        pipe.hdel(_SUPERVISOR_HASH_KEY, *legacy_entries.keys())
+        pipe.execute()
+
+    log(f"Migrated {len(legacy_entries)} job entries to per-job hashes")
+    return len(legacy_entries)
+
+
+def archive_jobs(older_than: float, batch_size: int = 100) -> int:
+    """Moves the jobs that finished, failed or were cancelled long ago to the archive
+
+    The jobs are found through the indexes of the states, so only the jobs to be
+    archived are read. They remain available through this service, which reads
+    the archive whenever a job is not in redis. Batches of jobs that keep being
+    changed while they are archived are left in redis until the next call.
+
+    Args:
+        older_than: the minimum number of seconds since the job got to the state
+        batch_size: the maximum number of jobs moved in one transaction
+
+    Returns:
+        the number of jobs archived
+    """
+    max_score = time.time() - older_than
+    archived_count = 0
+    skipped_job_ids: Set[str] = set()
+    while True:
+        # the skipped jobs are still in the indexes, ahead of the others
+        num = batch_size + len(skipped_job_ids)
+        with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+            for state in _JOB_STATES:
+                pipe.zrangebyscore(
+                    _get_state_index_key(state), 0, max_score, start=0, num=num
+                )
+            batches = pipe.execute()
+
+        job_ids = [
+            job_id
+            for job_id in dict.fromkeys(to_str(v) for batch in batches for v in batch)
+            if job_id not in skipped_job_ids
+        ]
+        if not job_ids:
+            break
+
+        job_ids = job_ids[:batch_size]
+        moved_count = _archive_batch(job_ids)
+        if moved_count is None:
+            skipped_job_ids.update(job_ids)
+            continue
+        archived_count += moved_count
+
+    if archived_count:
+        log(f"Archived {archived_count} jobs")
+    return archived_count
+
+
+def _archive_batch(job_ids: List[str]) -> Optional[int]:
+    """Moves the given jobs from redis to the archive, trying again if they change
 
     Args:
-        dict: nested dictionary to be updated
-        value: value to set
-        keys: nested keys
+        job_ids: the ids of the jobs to archive
 
     Returns:
-        Entry: the updated entry
-            (note that this is the reference to the input dictionary)
+        the number of jobs archived, or None if any of them was changed during
+        each of the `_ARCHIVE_BATCH_ATTEMPTS` attempts, in which case they all
+        remain in redis only
     """
-    if len(keys) == 1:
-        dict[keys[0]] = value
-        return dict
+    for _ in range(_ARCHIVE_BATCH_ATTEMPTS):
+        archived_count = _try_archive_batch(job_ids)
+        if archived_count is not None:
+            return archived_count
 
-    return {keys[0]: _deep_update(dict[keys[0]], value, keys[1:])}
+    return None
+
+
+def _try_archive_batch(job_ids: List[str]) -> Optional[int]:
+    """Moves the given jobs from redis to the archive in a single transaction
+
+    The jobs are written to the archive before they are removed from redis,
+    so they are never missing from both. If the transaction fails, they are
+    deleted from the archive again, so that no stale copy of them remains there.
+
+    Args:
+        job_ids: the ids of the jobs to archive
+
+    Returns:
+        the number of jobs archived, or None if any of them was changed meanwhile
+        in which case none of them is removed from redis
+    """
+    keys = [_get_job_key(job_id) for job_id in job_ids]
+    jobs: List[ArchivedJob] = []
+    with settings.REDIS_CONNECTION.pipeline() as transaction:
+        try:
+            transaction.watch(*keys)
+            with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                hashes = pipe.execute()
+
+            archived_at = time.time()
+            for job_id, raw_fields in zip(job_ids, hashes):
+                if not raw_fields:
+                    continue
+                fields = {to_str(field): value for field, value in raw_fields.items()}
+                # the result is not needed for the scores and can be large
+                entry = _load_entry(
+                    {k: v for k, v in fields.items() if k != _RESULT_FIELD}
+                )
+                registered_at, location, located_at, state_times = _get_index_scores(
+                    entry
+                )
+                jobs.append(
+                    ArchivedJob(
+                        job_id=job_id,
+                        fields=fields,
+                        registered_at=registered_at,
+                        location=None if location is None else location.value,
+                        located_at=located_at,
+                        state_times=state_times,
+                        archived_at=archived_at,
+                    )
+                )
+            _ARCHIVE.save_jobs(jobs, result_field=_RESULT_FIELD)
+
+            transaction.multi()
+            for job_id, key in zip(job_ids, keys):
+                transaction.delete(key)
+                for index_key in _INDEX_KEYS:
+                    transaction.zrem(index_key, job_id)
+            transaction.execute()
+        except WatchError:
+            _ARCHIVE.delete_jobs([job.job_id for job in jobs], include_auth_logs=False)
+            return None
+
+    return len(jobs)
 
 
 def cancel_job(job_id: str, reason: str) -> None:
@@ -212,21 +562,18 @@ def cancel_job(job_id: str, reason: str) -> None:
         )
         return
 
-    # Tries to fetch all jobs with Location suffixes for given job id
-    # Somewhat redundant solution, adding more information to the Location enum
-    # will mend this.
-    jobs = Job.fetch_many(
-        [f"{job_id}_{loc.name}" for loc in Location], settings.REDIS_CONNECTION
+    location, rq_job_id = settings.REDIS_CONNECTION.hmget(
+        _get_job_key(job_id), ["status.location", "rq_job_id"]
     )
+    if location is None:
+        log(
+            f"Job {job_id} has been archived, cancellation cancelled",
+            level=LogLevel.WARNING,
+        )
+        return
 
-    for job in filter(None, jobs):
-        # Depending on whether job is in a worker or queue, call appropriate cancel method
-        if job.worker_name:
-            send_stop_job_command(settings.REDIS_CONNECTION, job.id)
-        else:
-            job.cancel()
-
-    update_job_entry(job_id, {"time": now(), "reason": reason}, "status", "cancelled")
+    _stop_rq_jobs(_get_rq_job_ids(job_id, rq_job_id))
+    transition_job(job_id, cancelled=True, reason=reason)
 
     if reason:
         log_message = f"Job {job_id} cancelled due to {reason}"
@@ -236,6 +583,78 @@ def cancel_job(job_id: str, reason: str) -> None:
     log(log_message)
 
 
+def cancel_jobs(job_ids: List[str], reason: Optional[str] = None) -> Dict[str, bool]:
+    """Cancels many jobs by their ids, regardless of which Queue they are in
+
+    The statuses of the jobs are read in one round trip to redis, their rq jobs
+    fetched in another and stopped or cancelled in a third, and their entries
+    updated in a fourth, however many jobs there are.
+
+    Args:
+        job_ids: the ids of the jobs
+        reason: the reason for the cancellation
+
+    Returns:
+        dict of job id and whether the job was cancelled, False if it had finished
+            already or has been archived, for the jobs that exist
+    """
+    with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hmget(
+                _get_job_key(job_id),
+                ["status.location", "status.finished", "rq_job_id"],
+            )
+        statuses = pipe.execute()
+
+    outcomes = {
+        job_id: not (finished and json.loads(finished))
+        for job_id, (location, finished, _) in zip(job_ids, statuses)
+        if location is not None
+    }
+    rq_job_id_map = {
+        job_id: rq_job_id for job_id, (*_, rq_job_id) in zip(job_ids, statuses)
+    }
+    missing_job_ids = [job_id for job_id in job_ids if job_id not in outcomes]
+    if missing_job_ids:
+        for job_id in _ARCHIVE.get_archived_job_ids(missing_job_ids):
+            outcomes[job_id] = False
+    unfinished_job_ids = [
+        job_id for job_id, is_unfinished in outcomes.items() if is_unfinished
+    ]
+    if not unfinished_job_ids:
+        return outcomes
+
+    _stop_rq_jobs(
+        [
+            rq_job_id
+            for job_id in unfinished_job_ids
+            for rq_job_id in _get_rq_job_ids(job_id, rq_job_id_map[job_id])
+        ]
+    )
+
+    timestamp = now()
+    fields = _flatten(timestamp, "status", "cancelled", "time")
+    fields.update(_flatten(reason, "status", "cancelled", "reason"))
+    with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+        for job_id in unfinished_job_ids:
+            keys, args = _get_patch_entry_params(
+                job_id, fields, states=["cancelled"], timestamp=timestamp
+            )
+            _patch_entry_script(keys=keys, args=args, client=pipe)
+        previous_locations = pipe.execute()
+
+    for job_id, previous_location in zip(unfinished_job_ids, previous_locations):
+        if previous_location is None:
+            # removed in the meantime
+            del outcomes[job_id]
+        elif reason:
+            log(f"Job {job_id} cancelled due to {reason}")
+        else:
+            log(f"Job {job_id} cancelled.")
+
+    return outcomes
+
+
 def save_result(job_id: str, result: Dict[str, Any]):
     """Upload result to redis.
 
@@ -243,21 +662,143 @@ def save_result(job_id: str, result: Dict[str, Any]):
         job_id: the ID of the job
         result: the result dict to be set on the 'result' property of the job
     """
-    update_job_entry(job_id, now(), "status", "finished")
-    update_job_entry(job_id, result, "result")
+    transition_job(job_id, result=result)
 
     log(f"Job {job_id} finished with result")
 
 
-def inform_location(job_id: str, location: Location) -> None:
-    """Update job location."""
-    update_job_entry(job_id, location, "status", "location")
-    _update_location_timestamp(job_id, location)
+def inform_location(job_id: str, location: Location, **kwargs) -> None:
+    """Update job location.
+
+    Args:
+        job_id: the ID of the job
+        location: the new location of the job
+        kwargs: other changes to apply in the same transition. See `transition_job`
+    """
+    transition_job(job_id, location, **kwargs)
 
     # log updated job position
     log(f"{job_id} arrived at {STR_LOC[location]}")
 
 
+def get_rq_job_id(job_id: str, location: Location) -> str:
+    """Returns the id of the rq job that carries the job from the given queue location
+
+    Args:
+        job_id: the id of the job
+        location: the queue location e.g. Location.EXEC_Q
+
+    Returns:
+        the id of the rq job enqueued at that location
+    """
+    return f"{job_id}_{location.name}"
+
+
+def is_job_cancelled(job_id: str) -> bool:
+    """Checks whether the job has been cancelled, or deleted
+
+    It is cheap enough to be called by workers between the steps of a job.
+
+    Args:
+        job_id: the id of the job
+
+    Returns:
+        True if the job has been cancelled or no longer exists, else False
+    """
+    location, cancelled_at = settings.REDIS_CONNECTION.hmget(
+        _get_job_key(job_id), ["status.location", "status.cancelled.time"]
+    )
+    if location is None:
+        return True
+    return json.loads(cancelled_at or "null") is not None
+
+
+def fetch_priority(job_id: str, stage: str) -> int:
+    """Fetches the priority of the job in the queue of the given stage
+
+    Args:
+        job_id: the ID of the job
+        stage: 'registration', 'pre_processing', 'execution' or 'post_processing'
+
+    Returns:
+        the global priority of the job plus its local priority for that stage
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    priorities = JobPriorities.model_validate(fetch_job(job_id, "priorities"))
+    return priorities.for_stage(stage)
+
+
+def set_priorities(job_id: str, priorities: JobPriorities) -> Location:
+    """Sets the global and local priorities of the job
+
+    The queues are not touched; the caller moves the job in the queue it waits in.
+    A job waiting in the registration queue has no entry yet, so its priorities are
+    set on the items its registration task creates the entry with.
+
+    Args:
+        job_id: the ID of the job
+        priorities: the new priorities of the job
+
+    Returns:
+        the current location of the job
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    value = priorities.model_dump(by_alias=True)
+    fields = _flatten(value, "priorities")
+    try:
+        location = _patch_entry(job_id, fields)
+    except JobNotFound:
+        if _set_registration_items(job_id, priorities=value):
+            location = Location.REG_Q
+        else:
+            # the registration has started in the meantime, creating the entry
+            location = _patch_entry(job_id, fields)
+
+    log(f"Set the priorities of job {job_id}")
+    return location
+
+
+def _set_registration_items(job_id: str, **items: Any) -> bool:
+    """Updates the items passed to the registration task of a job waiting for it
+
+    Args:
+        job_id: the ID of the job
+        items: the items of the job to update
+
+    Returns:
+        True if the task was updated, False if it has started in the meantime
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    rq_job_id = get_rq_job_id(job_id, Location.REG_Q)
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        try:
+            # a worker starting the task in the meantime aborts the transaction
+            pipe.watch(Job.key_for(rq_job_id))
+            try:
+                rq_job = Job.fetch(rq_job_id, connection=settings.REDIS_CONNECTION)
+            except NoSuchJobError:
+                raise JobNotFound(job_id)
+
+            if rq_job.get_status(refresh=False) != JobStatus.QUEUED:
+                return False
+
+            job_file, job_items = rq_job.args
+            rq_job.args = (job_file, {**(job_items or {}), **items})
+            pipe.multi()
+            rq_job.save(pipeline=pipe)
+            pipe.execute()
+        except WatchError:
+            return False
+
+    return True
+
+
 def update_final_location_timestamp(
     job_id: str,
     status: Literal["started", "finished"],
@@ -278,15 +819,6 @@ def update_final_location_timestamp(
     update_job_entry(job_id, value, "timestamps", _FINAL_STAGE, status)
 
 
-def _update_location_timestamp(job_id: str, location: Location):
-    """Updates the timestamps of the job given the current location"""
-    try:
-        keys = _LOCATION_TIMESTAMP_MAP[location]
-        update_job_entry(job_id, now(), *keys)
-    except KeyError:
-        pass
-
-
 def inform_failure(job_id: str, reason: str = None) -> None:
     """Inform job supervisor that a job has failed
 
@@ -294,10 +826,7 @@ def inform_failure(job_id: str, reason: str = None) -> None:
         job_id (str): Identifier of the job that failed.
         reason (str, optional): Reason for failure. Defaults to None.
     """
-    entry: Entry = fetch_redis_entry(job_id)
-    update_job_entry(job_id, {"time": now(), "reason": reason}, "status", "failed")
-
-    location = entry["status"]["location"]
+    location = transition_job(job_id, failed=True, reason=reason)
 
     if reason:
         log_message: str = (
@@ -309,29 +838,101 @@ def inform_failure(job_id: str, reason: str = None) -> None:
     log(log_message, level=LogLevel.ERROR)
 
 
-def _load_json(json_str: str) -> Entry:
-    """Loads json string into an entry.
+def fetch_all_jobs() -> Dict[str, Any]:
+    """Fetches all jobs from redis
+
+    Returns:
+        The dict of job entries.
+    """
+    job_ids = [
+        to_str(v)
+        for v in settings.REDIS_CONNECTION.zrange(_REGISTERED_INDEX_KEY, 0, -1)
+    ]
+    return _fetch_many(job_ids)
+
+
+def list_jobs(
+    location: Optional[Location] = None,
+    state: Optional[JobState] = None,
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[Dict[str, Entry], Optional[str]]:
+    """Lists a page of jobs, oldest first, using the indexes of jobs
+
+    The archived jobs are merged into the page as if they were still in redis.
+    If a location is passed, the jobs are ordered by the time they arrived at
+    that location. Otherwise, if a state is passed, they are ordered by the time
+    they got to that state, else by the time they were registered.
 
     Args:
-        json_str (str): The json string to load.
+        location: only list the jobs currently at this location
+        state: only list the jobs that have 'finished', 'failed' or been 'cancelled'
+        since: only list the jobs that got to the location or state,
+            or were registered, at or after this time
+        cursor: the cursor returned with the previous page
+        limit: the maximum number of jobs in the page
 
     Returns:
-        Entry: The loaded entry.
+        tuple of the dict of job entries in the page and the cursor of the next page,
+        or None if this is the last page
+
+    Raises:
+        ValueError: invalid cursor '{cursor}'
     """
-    entry: Entry = json.loads(json_str)
-    location = entry["status"]["location"]
-    entry["status"]["location"] = Location(location)
-    return entry
+    query = _JobPageQuery(
+        location=location, state=state, since=since, cursor=cursor, limit=limit
+    )
+    while not query.is_complete:
+        batch = settings.REDIS_CONNECTION.zrangebyscore(**query.next_batch_args())
+        query.add_batch(batch)
+    query.add_archived(_ARCHIVE.list_jobs(**query.archive_list_args()))
 
+    job_ids, next_cursor = query.get_page()
+    entries = query.filter(_fetch_many(job_ids))
+    return entries, next_cursor
 
-def fetch_all_jobs() -> Dict[str, Any]:
-    """Fetches all jobs from redis
+
+async def list_jobs_async(
+    redis_db: AsyncRedis,
+    location: Optional[Location] = None,
+    state: Optional[JobState] = None,
+    since: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[Dict[str, Entry], Optional[str]]:
+    """Lists a page of jobs, oldest first, without blocking the event loop
+
+    See `list_jobs`
+
+    Args:
+        redis_db: the async redis connection
+        location: only list the jobs currently at this location
+        state: only list the jobs that have 'finished', 'failed' or been 'cancelled'
+        since: only list the jobs that got to the location or state,
+            or were registered, at or after this time
+        cursor: the cursor returned with the previous page
+        limit: the maximum number of jobs in the page
 
     Returns:
-        The dict of job entries.
+        tuple of the dict of job entries in the page and the cursor of the next page,
+        or None if this is the last page
+
+    Raises:
+        ValueError: invalid cursor '{cursor}'
     """
-    entries = settings.REDIS_CONNECTION.hgetall(_SUPERVISOR_HASH_KEY)
-    return {k: _load_json(v) for k, v in entries.items()}
+    query = _JobPageQuery(
+        location=location, state=state, since=since, cursor=cursor, limit=limit
+    )
+    while not query.is_complete:
+        batch = await redis_db.zrangebyscore(**query.next_batch_args())
+        query.add_batch(batch)
+    archived = await asyncio.to_thread(_ARCHIVE.list_jobs, **query.archive_list_args())
+    query.add_archived(archived)
+
+    job_ids, next_cursor = query.get_page()
+    entries = query.filter(await _fetch_many_async(redis_db, job_ids))
+    return entries, next_cursor
 
 
 def fetch_job(
@@ -339,30 +940,1049 @@ def fetch_job(
 ) -> Union[Entry, Result]:
     """Fetch specific job from redis
 
+    If a key is passed, only the fields under that key are read from redis.
+
     Args:
         job_id (str): Identifier of job to fetch
         key (str, optional): Only fetch this key. Defaults to None.
         format (bool, optional): Formats location value. Defaults to False.
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+        KeyError: key is not in the entry of the job
     """
-    entry = fetch_redis_entry(job_id)
+    if key is None:
+        return fetch_redis_entry(job_id)
 
-    if format and key == "status":
-        entry[key]["location"] = STR_LOC[entry[key]["location"]]
+    fields = _ENTRY_FIELDS_BY_KEY.get(key, [key])
+    with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+        pipe.exists(_get_job_key(job_id))
+        pipe.hmget(_get_job_key(job_id), fields)
+        exists, values = pipe.execute()
+
+    if not exists:
+        archived_fields = _fetch_archived_fields([job_id]).get(job_id)
+        if archived_fields is not None:
+            exists = True
+            values = [archived_fields.get(field) for field in fields]
+
+    return _load_entry_key(job_id, key, dict(zip(fields, values)), exists, format)
+
+
+async def fetch_job_async(
+    redis_db: AsyncRedis, job_id: str, key: str = None, format: bool = False
+) -> Union[Entry, Result]:
+    """Fetch specific job from redis without blocking the event loop
+
+    If a key is passed, only the fields under that key are read from redis.
+
+    Args:
+        redis_db: the async redis connection
+        job_id: Identifier of job to fetch
+        key: Only fetch this key. Defaults to None.
+        format: Formats location value. Defaults to False.
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+        KeyError: key is not in the entry of the job
+    """
+    if key is None:
+        fields = await redis_db.hgetall(_get_job_key(job_id))
+        if not fields:
+            archived = await asyncio.to_thread(_fetch_archived_fields, [job_id])
+            fields = archived.get(job_id)
+        if not fields:
+            log(f"Job {job_id} not found", level=LogLevel.ERROR)
+            raise JobNotFound(job_id)
+        return _load_entry(fields)
+
+    fields = _ENTRY_FIELDS_BY_KEY.get(key, [key])
+    async with redis_db.pipeline(transaction=False) as pipe:
+        pipe.exists(_get_job_key(job_id))
+        pipe.hmget(_get_job_key(job_id), fields)
+        exists, values = await pipe.execute()
+
+    if not exists:
+        archived = await asyncio.to_thread(_fetch_archived_fields, [job_id])
+        if job_id in archived:
+            exists = True
+            values = [archived[job_id].get(field) for field in fields]
+
+    return _load_entry_key(job_id, key, dict(zip(fields, values)), exists, format)
+
+
+async def fetch_result_memory_async(
+    redis_db: AsyncRedis, job_id: str
+) -> Optional[List[np.ndarray]]:
+    """Fetches the memory of the result of the job as arrays of outcomes
+
+    The outcomes are never converted to hex strings.
+
+    Args:
+        redis_db: the async redis connection
+        job_id: Identifier of the job
+
+    Returns:
+        the array of outcomes of each experiment or None if the job has not finished
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    async with redis_db.pipeline(transaction=False) as pipe:
+        pipe.exists(_get_job_key(job_id))
+        pipe.hmget(_get_job_key(job_id), ["status.finished", _RESULT_FIELD])
+        exists, (finished, result) = await pipe.execute()
+
+    if not exists:
+        archived = await asyncio.to_thread(_fetch_archived_fields, [job_id])
+        if job_id in archived:
+            exists = True
+            finished = archived[job_id].get("status.finished")
+            result = archived[job_id].get(_RESULT_FIELD)
+
+    if not exists:
+        log(f"Job {job_id} not found", level=LogLevel.ERROR)
+        raise JobNotFound(job_id)
+
+    if finished is None or not json.loads(finished) or result is None:
+        return None
+
+    if not results_lib.is_packed(result):
+        result = json.loads(result) or {}
+    return results_lib.get_memory_arrays(result)
+
+
+async def does_job_exist_async(redis_db: AsyncRedis, job_id: str) -> bool:
+    """Checks whether a given job already exists without blocking the event loop
+
+    Both redis and the archive are checked.
+
+    Args:
+        redis_db: the async redis connection
+        job_id: the id of the job
+
+    Returns:
+        True if the job exists else False
+    """
+    if await redis_db.exists(_get_job_key(job_id)) > 0:
+        return True
+    archived_job_ids = await asyncio.to_thread(_ARCHIVE.get_archived_job_ids, [job_id])
+    return len(archived_job_ids) > 0
+
+
+async def fetch_jobs_async(
+    redis_db: AsyncRedis, job_ids: List[str], keys: Iterable[str], format: bool = False
+) -> Dict[str, Entry]:
+    """Fetches the given keys of the entries of many jobs in a single round trip to redis
+
+    Args:
+        redis_db: the async redis connection
+        job_ids: the ids of the jobs
+        keys: the keys or dot-separated field paths of the entries to fetch
+            e.g. 'status', 'status.finished', 'result'
+        format: Formats the location value of the status. Defaults to False.
+
+    Returns:
+        dict of job id and the entry with only the given keys, for the jobs that exist
+            in redis or in the archive
+    """
+    fields = [field for key in keys for field in _ENTRY_FIELDS_BY_KEY.get(key, [key])]
+    async with redis_db.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.exists(_get_job_key(job_id))
+            pipe.hmget(_get_job_key(job_id), fields)
+        responses = await pipe.execute()
+
+    missing_job_ids = [
+        job_id for job_id, exists in zip(job_ids, responses[::2]) if not exists
+    ]
+    archived = {}
+    if missing_job_ids:
+        archived = await asyncio.to_thread(_fetch_archived_fields, missing_job_ids)
+
+    entries: Dict[str, Entry] = {}
+    for job_id, exists, values in zip(job_ids, responses[::2], responses[1::2]):
+        if not exists and job_id in archived:
+            exists = True
+            values = [archived[job_id].get(field) for field in fields]
+        if not exists:
+            continue
+
+        entry = _load_entry(
+            {field: value for field, value in zip(fields, values) if value is not None}
+        )
+        status = entry.get("status", {})
+        if format and "location" in status:
+            status["location"] = STR_LOC[status["location"]]
+        entries[job_id] = entry
 
-    return entry[key] if key else entry
+    return entries
 
 
 def remove_job(job_id: str) -> None:
-    """Remove job entry from redis
+    """Remove job entry from redis and the archive
 
     Args:
         job_id (str): Identifier of the job to be deleted
     """
     cancel_job(job_id, f"Job ID {job_id} was deleted")
-    settings.REDIS_CONNECTION.hdel(_SUPERVISOR_HASH_KEY, job_id)
+
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        pipe.delete(_get_job_key(job_id))
+        for index_key in _INDEX_KEYS:
+            pipe.zrem(index_key, job_id)
+        pipe.execute()
+    _ARCHIVE.delete_jobs([job_id])
+
     log(f"Job {job_id} was deleted")
 
 
+def remove_jobs(job_ids: List[str]) -> List[str]:
+    """Removes many job entries from redis and the archive, cancelling the jobs first
+
+    Args:
+        job_ids: the ids of the jobs to be deleted
+
+    Returns:
+        the ids of the jobs that existed and were deleted
+    """
+    removed_job_ids = [
+        job_id for job_id in cancel_jobs(job_ids, reason="Job was deleted")
+    ]
+    if not removed_job_ids:
+        return []
+
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        for job_id in removed_job_ids:
+            pipe.delete(_get_job_key(job_id))
+            for index_key in _INDEX_KEYS:
+                pipe.zrem(index_key, job_id)
+        pipe.execute()
+    _ARCHIVE.delete_jobs(removed_job_ids)
+
+    for job_id in removed_job_ids:
+        log(f"Job {job_id} was deleted")
+    return removed_job_ids
+
+
+def _stop_rq_jobs(rq_job_ids: List[str]):
+    """Stops or cancels the given rq jobs
+
+    The rq jobs are fetched in a single round trip to redis and the stop commands
+    and cancellations are sent in another.
+    Executions in progress are not stopped here but by the executor itself,
+    at its next checkpoint, so that the instruments are left in a clean state.
+
+    Args:
+        rq_job_ids: the ids of the rq jobs
+    """
+    rq_jobs = Job.fetch_many(rq_job_ids, settings.REDIS_CONNECTION)
+    execution_suffix = f"_{Location.EXEC_Q.name}"
+
+    with settings.REDIS_CONNECTION.pipeline() as pipe:
+        for job in filter(None, rq_jobs):
+            # Depending on whether job is in a worker or queue, call appropriate cancel method
+            if job.worker_name:
+                if not job.id.endswith(execution_suffix):
+                    send_command(pipe, job.worker_name, "stop-job", job_id=job.id)
+            elif job.get_status(refresh=False) != JobStatus.CANCELED:
+                job.cancel(pipeline=pipe)
+        pipe.execute()
+
+
+def _get_rq_job_ids(job_id: str, rq_job_id: Optional[Union[str, bytes]]) -> List[str]:
+    """Returns the ids of the rq jobs that may be running the given job
+
+    Args:
+        job_id: the id of the job
+        rq_job_id: the raw 'rq_job_id' field of the job's entry if any
+
+    Returns:
+        the rq job id recorded in the entry, or for entries without it,
+        the rq job ids of the job at every location
+    """
+    if rq_job_id is not None:
+        return [json.loads(rq_job_id)]
+    return [get_rq_job_id(job_id, location) for location in Location]
+
+
+def _new_entry(job_id: str) -> Entry:
+    """Creates a new job entry skeleton
+
+    Args:
+        job_id: the id of the job
+
+    Returns:
+        the job entry skeleton for a job that has just been registered
+    """
+    return {
+        "id": job_id,
+        # the job is being registered by the rq job of the registration queue
+        "rq_job_id": get_rq_job_id(job_id, Location.REG_Q),
+        "priorities": {
+            "global": 0,
+            "local": {"pre_processing": 0, "execution": 0, "post_processing": 0},
+        },
+        "status": {
+            "location": Location.REG_W,
+            "started": now(),
+            "finished": None,
+            "cancelled": {"time": None, "reason": None},
+            "failed": {"time": None, "reason": None},
+        },
+        "timestamps": {
+            _REGISTRATION_STAGE: {"started": now(), "finished": None},
+            _PRE_PROCESSING_STAGE: {"started": None, "finished": None},
+            _EXECUTION_STAGE: {"started": None, "finished": None},
+            _POST_PROCESSING_STAGE: {"started": None, "finished": None},
+            _FINAL_STAGE: {"started": None, "finished": None},
+        },
+        "result": None,
+    }
+
+
+def get_job_events_channel(job_id: str) -> str:
+    """Returns the redis pub/sub channel on which the events of the given job are published
+
+    Args:
+        job_id: the id of the job
+    """
+    return f"{JOB_EVENTS_CHANNEL_PREFIX}{job_id}"
+
+
+def _get_event_message(
+    job_id: str,
+    location: Optional[Location],
+    states: Iterable[JobState],
+    timestamp: str,
+) -> str:
+    """Returns the message published when a job changes location or state
+
+    Args:
+        job_id: the id of the job
+        location: the new location of the job if it has changed
+        states: the states i.e. 'finished', 'failed', 'cancelled' the job has got to
+        timestamp: the time of the change
+
+    Returns:
+        the JSON string of the event
+    """
+    return json.dumps(
+        {
+            "job_id": job_id,
+            "location": None if location is None else location.name,
+            "states": list(states),
+            "timestamp": timestamp,
+        }
+    )
+
+
+def _get_job_key(job_id: str) -> str:
+    """Returns the redis key of the hash of the given job
+
+    Args:
+        job_id: the id of the job
+    """
+    return f"{_JOB_KEY_PREFIX}{job_id}"
+
+
+def _flatten(value: Any, *keys: str) -> Dict[str, Union[str, bytes]]:
+    """Flattens the value at the given nested keys into fields of the job's hash
+
+    Dicts found at the paths in _NESTED_FIELDS are split into a field per leaf.
+    Results are packed with their memory as arrays of integers where possible.
+    All other values are stored as JSON strings.
+
+    Args:
+        value: the value to flatten
+        keys: the nested keys at which the value is found in the entry
+
+    Returns:
+        dict of the dot-separated field paths and their JSON string or packed values
+    """
+    path = _FIELD_SEPARATOR.join(keys)
+    is_nested = len(keys) == 0 or path in _NESTED_FIELDS
+
+    if is_nested and isinstance(value, dict):
+        fields = {}
+        for key, item in value.items():
+            fields.update(_flatten(item, *keys, key))
+        return fields
+
+    if path == _RESULT_FIELD and isinstance(value, dict):
+        packed_result = results_lib.pack_result(value)
+        if packed_result is not None:
+            return {path: packed_result}
+
+    return {path: json.dumps(value, cls=EnumEncoder)}
+
+
+def _load_entry(fields: Dict[Union[str, bytes], Union[str, bytes]]) -> Entry:
+    """Loads the fields of a job's hash into an entry.
+
+    Args:
+        fields: the dict of dot-separated field paths and their JSON string values
+
+    Returns:
+        Entry: The loaded entry.
+    """
+    entry: Entry = {}
+    for field, value in fields.items():
+        field = to_str(field)
+        if field == _LOCATED_TS_FIELD:
+            continue
+        *parents, leaf = _split_field(field)
+        node = entry
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = _load_value(value)
+
+    status = entry.get("status", {})
+    if "location" in status:
+        status["location"] = Location(status["location"])
+    return entry
+
+
+def _load_value(value: Union[str, bytes]) -> Any:
+    """Loads the value of a field of a job's hash
+
+    Args:
+        value: the JSON string or packed result
+
+    Returns:
+        the loaded value
+    """
+    if results_lib.is_packed(value):
+        return results_lib.unpack_result(value)
+    return json.loads(value)
+
+
+def _split_field(field: str) -> List[str]:
+    """Splits a field path into the nested keys of the entry
+
+    Only the separators that follow paths in _NESTED_FIELDS are split at,
+    so that other keys can contain the separator.
+
+    Args:
+        field: the dot-separated path of the field
+
+    Returns:
+        the list of nested keys
+    """
+    keys: List[str] = []
+    parts = field.split(_FIELD_SEPARATOR)
+    while len(parts) > 1 and _FIELD_SEPARATOR.join([*keys, parts[0]]) in _NESTED_FIELDS:
+        keys.append(parts.pop(0))
+
+    keys.append(_FIELD_SEPARATOR.join(parts))
+    return keys
+
+
+# The fields in the job's hash under each nested key of the entry
+_ENTRY_FIELDS_BY_KEY: Dict[str, List[str]] = {
+    key: [
+        field
+        for field in _flatten(_new_entry(""))
+        if field.startswith(f"{key}{_FIELD_SEPARATOR}")
+    ]
+    for key in _NESTED_FIELDS
+}
+
+
+def _get_location_index_key(location: Location) -> str:
+    """Returns the redis key of the index of the jobs at the given location
+
+    Args:
+        location: the location of the jobs
+    """
+    return f"{_JOB_INDEX_PREFIX}location:{location.name}"
+
+
+def _get_state_index_key(state: JobState) -> str:
+    """Returns the redis key of the index of the jobs in the given state
+
+    Args:
+        state: 'finished', 'failed' or 'cancelled'
+    """
+    return f"{_JOB_INDEX_PREFIX}{state}"
+
+
+# All the indexes in the order expected by _patch_entry_script
+_INDEX_KEYS: List[str] = [
+    _REGISTERED_INDEX_KEY,
+    *(_get_location_index_key(loc) for loc in sorted(Location, key=lambda v: v.value)),
+    *(_get_state_index_key(state) for state in _JOB_STATES),
+]
+
+
+def _to_epoch(timestamp: Optional[str]) -> float:
+    """Converts an ISO 8601 UTC Z timestamp to seconds since the epoch
+
+    Args:
+        timestamp: the timestamp as returned by now()
+
+    Returns:
+        the seconds since the epoch or 0 if timestamp is not a valid timestamp
+    """
+    try:
+        parsed = datetime.fromisoformat(timestamp.rstrip("Z"))
+        return parsed.replace(tzinfo=timezone.utc).timestamp()
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+def _to_epoch_ns(timestamp: Optional[str]) -> int:
+    """Converts an ISO 8601 UTC Z timestamp to nanoseconds since the epoch
+
+    The timestamps of now() have microsecond precision, so the result is always
+    a multiple of 1000. It matches the timestamps in the entry of the job,
+    from which the time spent at each location is computed.
+
+    Args:
+        timestamp: the timestamp as returned by now()
+
+    Returns:
+        the nanoseconds since the epoch, with microsecond precision,
+        or 0 if timestamp is not a valid timestamp
+    """
+    try:
+        parsed = datetime.fromisoformat(timestamp.rstrip("Z"))
+        elapsed = parsed.replace(tzinfo=timezone.utc) - _EPOCH
+        return (elapsed // timedelta(microseconds=1)) * 1000
+    except (AttributeError, ValueError):
+        return 0
+
+
+def _is_in_state(entry: Entry, state: JobState) -> bool:
+    """Whether the job entry is in the given state
+
+    Args:
+        entry: the job entry
+        state: 'finished', 'failed' or 'cancelled'
+    """
+    status = entry.get("status", {})
+    if state == "finished":
+        return bool(status.get("finished"))
+    return bool((status.get(state) or {}).get("time"))
+
+
+def _add_to_indexes(pipe: Pipeline, job_id: str, entry: Entry):
+    """Adds the commands that index the given job entry to the pipeline
+
+    Args:
+        pipe: the redis pipeline
+        job_id: the id of the job
+        entry: the job entry
+    """
+    registered_at, location, located_at, state_times = _get_index_scores(entry)
+    pipe.zadd(_REGISTERED_INDEX_KEY, {job_id: registered_at})
+
+    if location is not None:
+        pipe.zadd(_get_location_index_key(location), {job_id: located_at})
+
+    for state, state_time in state_times.items():
+        pipe.zadd(_get_state_index_key(state), {job_id: state_time})
+
+
+def _get_index_scores(
+    entry: Entry,
+) -> Tuple[float, Optional[Location], float, Dict[JobState, float]]:
+    """Returns the scores of the job entry in the indexes of jobs
+
+    Args:
+        entry: the job entry
+
+    Returns:
+        tuple of the time the job was registered, its location if any,
+        the time it arrived at that location, and the time it got to each
+        of the states it is in
+    """
+    status = entry.get("status", {})
+    registered_at = _to_epoch(status.get("started"))
+
+    location = status.get("location")
+    located_at = registered_at
+    if location is not None:
+        location = Location(location)
+        keys = _LOCATION_TIMESTAMP_MAP.get(location, ())
+        arrived_at = functools.reduce(
+            lambda node, key: (node or {}).get(key), keys, entry
+        )
+        if keys and arrived_at:
+            located_at = _to_epoch(arrived_at)
+
+    state_times: Dict[JobState, float] = {}
+    for state in _JOB_STATES:
+        if _is_in_state(entry, state):
+            state_time = (
+                status["finished"] if state == "finished" else status[state]["time"]
+            )
+            state_times[state] = (
+                _to_epoch(state_time) if isinstance(state_time, str) else registered_at
+            )
+
+    return registered_at, location, located_at, state_times
+
+
+def _fetch_many(job_ids: List[str]) -> Dict[str, Entry]:
+    """Fetches the entries of the given jobs in a single round trip to redis
+
+    The jobs not in redis are read from the archive.
+
+    Args:
+        job_ids: the ids of the jobs
+
+    Returns:
+        dict of job id and job entry for the jobs that exist, in the order of job_ids
+    """
+    with settings.REDIS_CONNECTION.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(_get_job_key(job_id))
+        entries = pipe.execute()
+
+    missing_job_ids = [job_id for job_id, fields in zip(job_ids, entries) if not fields]
+    archived = _fetch_archived_fields(missing_job_ids) if missing_job_ids else {}
+    return {
+        job_id: _load_entry(fields or archived[job_id])
+        for job_id, fields in zip(job_ids, entries)
+        if fields or job_id in archived
+    }
+
+
+def _fetch_archived_fields(
+    job_ids: List[str],
+) -> Dict[str, Dict[str, Union[str, bytes]]]:
+    """Fetches the fields of the archived jobs among the given jobs
+
+    Args:
+        job_ids: the ids of the jobs
+
+    Returns:
+        dict of job id and the fields the job's hash had in redis, for the archived jobs
+    """
+    return _ARCHIVE.get_job_fields(job_ids, result_field=_RESULT_FIELD)
+
+
+async def _fetch_many_async(
+    redis_db: AsyncRedis, job_ids: List[str]
+) -> Dict[str, Entry]:
+    """Fetches the entries of the given jobs in a single round trip to redis
+
+    The jobs not in redis are read from the archive.
+
+    Args:
+        redis_db: the async redis connection
+        job_ids: the ids of the jobs
+
+    Returns:
+        dict of job id and job entry for the jobs that exist, in the order of job_ids
+    """
+    async with redis_db.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(_get_job_key(job_id))
+        entries = await pipe.execute()
+
+    missing_job_ids = [job_id for job_id, fields in zip(job_ids, entries) if not fields]
+    archived = {}
+    if missing_job_ids:
+        archived = await asyncio.to_thread(_fetch_archived_fields, missing_job_ids)
+    return {
+        job_id: _load_entry(fields or archived[job_id])
+        for job_id, fields in zip(job_ids, entries)
+        if fields or job_id in archived
+    }
+
+
+def _load_entry_key(
+    job_id: str,
+    key: str,
+    fields: Dict[str, Optional[bytes]],
+    exists: bool,
+    format: bool = False,
+) -> Union[Entry, Result]:
+    """Loads the value of the given key of the job entry from the fields read from redis
+
+    Args:
+        job_id: identifier of the job
+        key: the key of the entry
+        fields: the fields under the key and their values, None if they are not set
+        exists: whether the job exists
+        format: Formats location value. Defaults to False.
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+        KeyError: key is not in the entry of the job
+    """
+    if not exists:
+        log(f"Job {job_id} not found", level=LogLevel.ERROR)
+        raise JobNotFound(job_id)
+
+    entry = _load_entry(
+        {field: value for field, value in fields.items() if value is not None}
+    )
+
+    if format and key == "status":
+        entry[key]["location"] = STR_LOC[entry[key]["location"]]
+
+    return entry[key]
+
+
+class _JobPageQuery:
+    """The query of a page of jobs from the indexes of jobs
+
+    The index is read in batches until the page has one more job than the limit,
+    which shows that there is a next page.
+    Members with equal scores are ordered by job id, so at the cursor's score,
+    the members up to the cursor's job id are skipped.
+    """
+
+    def __init__(
+        self,
+        location: Optional[Location],
+        state: Optional[JobState],
+        since: Optional[datetime],
+        cursor: Optional[str],
+        limit: int,
+    ):
+        """
+        Args:
+            location: only list the jobs currently at this location
+            state: only list the jobs that have 'finished', 'failed' or been 'cancelled'
+            since: only list the jobs that got to the location or state,
+                or were registered, at or after this time
+            cursor: the cursor returned with the previous page
+            limit: the maximum number of jobs in the page
+
+        Raises:
+            ValueError: invalid cursor '{cursor}'
+        """
+        if location is not None:
+            self.index_key = _get_location_index_key(location)
+            self.order_by = "location"
+        elif state is not None:
+            self.index_key = _get_state_index_key(state)
+            self.order_by = state
+        else:
+            self.index_key = _REGISTERED_INDEX_KEY
+            self.order_by = "registered"
+
+        self.location = location
+        self.state = state
+        self.limit = limit
+        self.min_score = 0.0
+        if since is not None:
+            self.min_score = since.replace(
+                tzinfo=since.tzinfo or timezone.utc
+            ).timestamp()
+
+        self.cursor_score: Optional[float] = None
+        self.cursor_job_id: Optional[str] = None
+        if cursor:
+            try:
+                raw_score, self.cursor_job_id = cursor.split(":", 1)
+                self.cursor_score = float(raw_score)
+            except ValueError:
+                raise ValueError(f"invalid cursor '{cursor}'")
+            self.min_score = max(self.min_score, self.cursor_score)
+
+        self.is_complete = False
+        self._page: List[Tuple[str, float]] = []
+        self._offset = 0
+
+    def next_batch_args(self) -> Dict[str, Any]:
+        """Returns the arguments of the ZRANGEBYSCORE call for the next batch"""
+        return dict(
+            name=self.index_key,
+            min=self.min_score,
+            max="+inf",
+            start=self._offset,
+            num=self.limit + 1,
+            withscores=True,
+        )
+
+    def add_batch(self, batch: List[Tuple[bytes, float]]):
+        """Adds the batch of job ids and scores read from the index to the page
+
+        Args:
+            batch: the job ids and their scores as returned by ZRANGEBYSCORE
+        """
+        for raw_job_id, score in batch:
+            job_id = to_str(raw_job_id)
+            if not self._is_before_cursor(job_id, score):
+                self._page.append((job_id, score))
+
+        self._offset += len(batch)
+        self.is_complete = len(batch) <= self.limit or len(self._page) > self.limit
+
+    def archive_list_args(self) -> Dict[str, Any]:
+        """Returns the arguments of `Archive.list_jobs` for the archived jobs of the page"""
+        cursor = None
+        if self.cursor_job_id is not None:
+            cursor = (self.cursor_score, self.cursor_job_id)
+
+        return dict(
+            order_by=self.order_by,
+            location=None if self.location is None else self.location.value,
+            min_score=self.min_score,
+            cursor=cursor,
+            limit=self.limit + 1,
+        )
+
+    def add_archived(self, jobs: List[Tuple[str, float]]):
+        """Merges the archived jobs into the page, once all batches have been added
+
+        The jobs still in redis take precedence over their archived copies.
+
+        Args:
+            jobs: the job ids and their scores as returned by `Archive.list_jobs`
+        """
+        page_job_ids = {job_id for job_id, _ in self._page}
+        self._page.extend(item for item in jobs if item[0] not in page_job_ids)
+        self._page.sort(key=lambda item: (item[1], item[0]))
+
+    def get_page(self) -> Tuple[List[str], Optional[str]]:
+        """Returns the job ids in the page and the cursor of the next page if any"""
+        page = self._page[: self.limit]
+        next_cursor = None
+        if len(self._page) > self.limit:
+            last_job_id, last_score = page[-1]
+            next_cursor = f"{last_score!r}:{last_job_id}"
+
+        return [job_id for job_id, _ in page], next_cursor
+
+    def filter(self, entries: Dict[str, Entry]) -> Dict[str, Entry]:
+        """Filters out the entries not in the state, if both location and state are queried
+
+        Args:
+            entries: the entries of the jobs in the page
+        """
+        if self.location is None or self.state is None:
+            return entries
+
+        return {
+            job_id: entry
+            for job_id, entry in entries.items()
+            if _is_in_state(entry, self.state)
+        }
+
+    def _is_before_cursor(self, job_id: str, score: float) -> bool:
+        """Whether the job was on the previous pages"""
+        return (
+            self.cursor_job_id is not None
+            and score == self.cursor_score
+            and job_id <= self.cursor_job_id
+        )
+
+
+def _patch_entry(
+    job_id: str,
+    fields: Dict[str, Union[str, bytes]],
+    location: Optional[Location] = None,
+    states: Iterable[JobState] = (),
+    timestamp: Optional[str] = None,
+) -> Location:
+    """Sets the given fields on the job's hash in a single atomic call to redis
+
+    The indexes of jobs are updated in that same call and, if the location
+    or state of the job has changed, an event is published on the job's channel.
+
+    Args:
+        job_id: identifier of the job
+        fields: the dot-separated field paths and their JSON string or packed values
+        location: the new location of the job if it has changed
+        states: the states i.e. 'finished', 'failed', 'cancelled' the job has got to
+        timestamp: the time of the change, to score the job with in the indexes
+            it is added to
+
+    Returns:
+        the location of the job before the fields were set
+
+    Raises:
+        JobNotFound: Job {job_id} not found
+    """
+    keys, args = _get_patch_entry_params(
+        job_id, fields, location=location, states=states, timestamp=timestamp
+    )
+    previous_location = _patch_entry_script(
+        keys=keys, args=args, client=settings.REDIS_CONNECTION
+    )
+
+    if previous_location is None:
+        log(f"Job {job_id} not found", level=LogLevel.ERROR)
+        raise JobNotFound(job_id)
+
+    return Location(json.loads(previous_location))
+
+
+def _get_patch_entry_params(
+    job_id: str,
+    fields: Dict[str, Union[str, bytes]],
+    location: Optional[Location] = None,
+    states: Iterable[JobState] = (),
+    timestamp: Optional[str] = None,
+) -> Tuple[List[str], List[Union[str, bytes, float]]]:
+    """Returns the keys and args of the script that patches the job's entry
+
+    Args:
+        job_id: identifier of the job
+        fields: the dot-separated field paths and their JSON string or packed values
+        location: the new location of the job if it has changed
+        states: the states i.e. 'finished', 'failed', 'cancelled' the job has got to
+        timestamp: the time of the change, to score the job with in the indexes
+            it is added to
+
+    Returns:
+        tuple of the keys and the args of `_patch_entry_script`
+    """
+    states = list(states)
+    event = ""
+    if location is not None or states:
+        event = _get_event_message(job_id, location, states, timestamp or now())
+
+    args = [
+        job_id,
+        _to_epoch(timestamp),
+        "" if location is None else location.value,
+        *("1" if state in states else "" for state in _JOB_STATES),
+        get_job_events_channel(job_id),
+        event,
+        _to_epoch_ns(timestamp),
+        settings.JOB_TRANSITIONS_MAXLEN,
+        ",".join(states),
+        *(item for field_value in fields.items() for item in field_value),
+    ]
+    keys = [
+        _get_job_key(job_id),
+        *_INDEX_KEYS,
+        _LOCATION_DURATIONS_KEY,
+        JOB_TRANSITIONS_STREAM_KEY,
+    ]
+    return keys, args
+
+
+def fetch_location_durations() -> Dict[Location, Tuple[List[int], float]]:
+    """Fetches the histograms of the seconds jobs spent at each location
+
+    The durations are accumulated as jobs leave their locations, so this is
+    a single read of redis however many jobs there have been.
+
+    Returns:
+        dict of the locations that jobs have left, to tuples of the counts
+        of durations in each of `LOCATION_DURATION_BUCKETS` and +Inf,
+        not cumulated, and the sum of the durations
+    """
+    fields = settings.REDIS_CONNECTION.hgetall(_LOCATION_DURATIONS_KEY)
+    histograms: Dict[Location, Tuple[List[int], float]] = {}
+
+    for field, value in fields.items():
+        location_value, _, item = to_str(field).partition(":")
+        location = Location(int(location_value))
+        counts, total = histograms.get(
+            location, ([0] * (len(LOCATION_DURATION_BUCKETS) + 1), 0.0)
+        )
+        if item == "sum":
+            total = float(value)
+        else:
+            counts[int(item)] = int(value)
+        histograms[location] = (counts, total)
+
+    return histograms
+
+
+# Sets the given fields on the job's hash, updates the indexes of jobs
+# and publishes the event of the change, only if the job exists.
+# When the job changes location, the seconds it spent at its previous location,
+# i.e. the difference of its scores in the two location indexes, are added
+# to the histogram of that location.
+# The change is also appended to the transitions stream along with the epoch
+# nanoseconds at which the job had arrived at its previous location, if known,
+# as kept in the job's hash since that arrival.
+# Returns the location of the job before the update, or nil if the job does not exist
+# KEYS[1]: the key of the job's hash,
+# KEYS[2..]: the index keys in the order of _INDEX_KEYS i.e. registered,
+#   the locations ordered by their values, then finished, failed and cancelled
+# KEYS[#KEYS - 1]: the key of the hash of the histograms of location durations
+# KEYS[#KEYS]: the key of the transitions stream
+# ARGV[1]: the job id, ARGV[2]: the score, ARGV[3]: the new location value or '',
+# ARGV[4..6]: '1' if the job has finished, failed or been cancelled respectively else ''
+# ARGV[7]: the events channel of the job, ARGV[8]: the event to publish or ''
+# ARGV[9]: the epoch nanoseconds of the change, ARGV[10]: the maximum length of
+# the transitions stream, ARGV[11]: the comma-separated states the job got to
+# ARGV[12..]: field1, value1, field2, value2, ...
+_patch_entry_script = settings.REDIS_CONNECTION.register_script(
+    """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return nil
+end
+local job_id = ARGV[1]
+local score = ARGV[2]
+local location = redis.call("HGET", KEYS[1], "status.location")
+local located_ts = redis.call("HGET", KEYS[1], "%(located_ts_field)s")
+local arrived_ts = nil
+if #ARGV > 11 then
+    redis.call("HSET", KEYS[1], unpack(ARGV, 12))
+end
+if ARGV[3] ~= "" then
+    if location then
+        local location_key = KEYS[3 + tonumber(location)]
+        local arrived_at = redis.call("ZSCORE", location_key, job_id)
+        redis.call("ZREM", location_key, job_id)
+        local is_timed = arrived_at and tonumber(arrived_at) > 0 and tonumber(score) > 0
+        if is_timed and location ~= ARGV[3] then
+            arrived_ts = located_ts
+            if not arrived_ts then
+                -- the job arrived before the arrival timestamps were kept
+                arrived_ts = string.format("%%.0f", tonumber(arrived_at) * 1e6) .. "000"
+            end
+            local duration = math.max(tonumber(score) - tonumber(arrived_at), 0)
+            local buckets = {%(buckets)s}
+            local bucket = #buckets
+            for idx = 1, #buckets do
+                if duration <= buckets[idx] then
+                    bucket = idx - 1
+                    break
+                end
+            end
+            redis.call("HINCRBY", KEYS[#KEYS - 1], location .. ":" .. bucket, 1)
+            redis.call("HINCRBYFLOAT", KEYS[#KEYS - 1], location .. ":sum", duration)
+        end
+    end
+    redis.call("ZADD", KEYS[3 + tonumber(ARGV[3])], score, job_id)
+    if ARGV[9] ~= "0" then
+        redis.call("HSET", KEYS[1], "%(located_ts_field)s", ARGV[9])
+    else
+        redis.call("HDEL", KEYS[1], "%(located_ts_field)s")
+    end
+end
+for idx = 4, 6 do
+    if ARGV[idx] == "1" then
+        redis.call("ZADD", KEYS[#KEYS - 8 + idx], score, job_id)
+    end
+end
+if ARGV[8] ~= "" then
+    redis.call("PUBLISH", ARGV[7], ARGV[8])
+    local transition = {
+        "job_id", job_id,
+        "location", ARGV[3] ~= "" and ARGV[3] or (location or ""),
+        "previous_location", location or "",
+        "states", ARGV[11],
+        "ts", ARGV[9],
+    }
+    if arrived_ts then
+        table.insert(transition, "arrived_ts")
+        table.insert(transition, arrived_ts)
+    end
+    redis.call("XADD", KEYS[#KEYS], "MAXLEN", "~", ARGV[10], "*", unpack(transition))
+end
+return location
+"""
+    % {
+        "buckets": ", ".join(str(bound) for bound in LOCATION_DURATION_BUCKETS),
+        "located_ts_field": _LOCATED_TS_FIELD,
+    }
+)
+
+
 @unique
 class LogLevel(Enum):
     """Log level of job supervisor log messages"""
@@ -375,25 +1995,59 @@ class LogLevel(Enum):
 def log(message: str, level: LogLevel = LogLevel.INFO) -> None:
     """Save message to job supervisor log file.
 
+    The message is buffered and written to the file in batches by a background thread.
+
     Args:
         message (str): message to log
         level (LogLevel, optional): log level of the message. Defaults to LogLevel.INFO.
     """
-    color: Tuple[str, str, str] = (
-        "\033[0m",  # color end
-        "\033[0;33m",  # yellow
-        "\033[0;31m",  # red
-    )
-
     formatted_time = now()
 
-    logstring: str = (
-        f"{color[level.value]}[{formatted_time}] {level.name}: {message}{color[0]}\n"
-    )
+    if JOB_SUPERVISOR_LOG_FORMAT == "json":
+        logstring: str = (
+            json.dumps(
+                {"time": formatted_time, "level": level.name, "message": message}
+            )
+            + "\n"
+        )
+    else:
+        color: Tuple[str, str, str] = (
+            "\033[0m",  # color end
+            "\033[0;33m",  # yellow
+            "\033[0;31m",  # red
+        )
+        logstring: str = f"{color[level.value]}[{formatted_time}] {level.name}: {message}{color[0]}\n"
+
+    _LOG_WRITER.write(logstring)
+
+
+def flushes_log(func: Callable) -> Callable:
+    """Decorator that flushes the job supervisor log after the function is called
+
+    rq runs each task in a forked work horse that exits with os._exit,
+    skipping the atexit handlers. Tasks that log should thus be decorated with this.
+
+    Args:
+        func: the function to decorate
+
+    Returns:
+        the decorated function
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _LOG_WRITER.flush()
+
+    return wrapper
 
-    file_path = Path(STORAGE_ROOT) / STORAGE_PREFIX_DIRNAME
-    file_path.mkdir(parents=True, exist_ok=True)
-    store_file = file_path / JOB_SUPERVISOR_LOG
 
-    with store_file.open("a") as destination:
-        destination.write(logstring)
+_LOG_WRITER = BufferedLogWriter(
+    Path(STORAGE_ROOT) / STORAGE_PREFIX_DIRNAME / JOB_SUPERVISOR_LOG,
+    max_batch_size=settings.JOB_SUPERVISOR_LOG_BATCH_SIZE,
+    flush_interval=settings.JOB_SUPERVISOR_LOG_FLUSH_INTERVAL,
+    max_bytes=settings.JOB_SUPERVISOR_LOG_MAX_BYTES,
+    backup_count=settings.JOB_SUPERVISOR_LOG_BACKUP_COUNT,
+)
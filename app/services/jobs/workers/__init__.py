@@ -0,0 +1,25 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""The workers that run the different stages of a job in BCC
+
+The tasks of each stage are enqueued by their dotted paths instead of by reference
+so that enqueueing a stage does not import the module of the worker that runs it.
+For instance, the API and the registration worker never import the execution worker
+and thus never construct a QuantumExecutor.
+"""
+
+JOB_REGISTER_TASK = "app.services.jobs.workers.registration.job_register"
+JOB_PREPROCESS_TASK = "app.services.jobs.workers.preprocessing.job_preprocess"
+JOB_EXECUTE_TASK = "app.services.jobs.workers.execution.job_execute"
+LOGFILE_POSTPROCESS_TASK = (
+    "app.services.jobs.workers.postprocessing.logfile_postprocess"
+)
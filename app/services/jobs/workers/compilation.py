@@ -0,0 +1,123 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""The compilation of jobs ahead of their execution
+
+Jobs are compiled by the worker that pre-processes them so that the execution worker
+only has to load the compiled programs and run them on the hardware.
+"""
+import dataclasses
+from typing import Optional
+
+from qiskit.qobj import PulseQobj
+
+import settings
+from app.libs.properties import get_backend_config, get_calibration_version
+from app.libs.quantum_executor.base.compiler import CompiledQobj, QuantumCompiler
+from app.libs.quantum_executor.qiskit.compiler import QiskitDynamicsCompiler
+from app.libs.quantum_executor.quantify.compiler import QuantifyCompiler
+from app.libs.quantum_executor.utils.cache import DiskCache
+
+# Compiler
+# --------
+# It is constructed on the first call in the worker because loading the
+# hardware configuration of the executor is not free
+_COMPILER: Optional[QuantumCompiler] = None
+
+
+def get_compiler(
+    executor_type: str = settings.EXECUTOR_TYPE,
+    quantify_config_file: str = settings.QUANTIFY_CONFIG_FILE,
+    cache_dir: str = settings.COMPILED_SCHEDULE_CACHE_DIR,
+    cache_max_bytes: int = settings.COMPILED_SCHEDULE_CACHE_MAX_BYTES,
+) -> QuantumCompiler:
+    """Gets the compiler of the jobs for the executor of the given type
+
+    Unlike the executor, the compiler does not connect to the hardware
+    so it can be constructed in any worker.
+
+    Args:
+        executor_type: the executor type whose compiler to return
+        quantify_config_file: the path to the configuration file of the executor
+        cache_dir: the directory of the cache of the compiled quantify schedules
+        cache_max_bytes: the maximum size of that cache; 0 disables it
+
+    Returns:
+        the compiler of the jobs
+
+    Raises:
+        ValueError: unknown executor type
+    """
+    if executor_type == "quantify":
+        cache = None
+        if cache_max_bytes > 0:
+            cache = DiskCache(cache_dir, max_bytes=cache_max_bytes)
+
+        return QuantifyCompiler(
+            quantify_config_file=quantify_config_file,
+            backend_config=get_backend_config(),
+            cache=cache,
+        )
+
+    if executor_type in ("qiskit_pulse_1q", "qiskit_pulse_2q"):
+        return QiskitDynamicsCompiler()
+
+    raise ValueError(f"unknown executor type: {executor_type}")
+
+
+def get_initialized_compiler() -> QuantumCompiler:
+    """Returns the compiler of this process, constructing it on first call
+
+    Returns:
+        the QuantumCompiler of the executor type in the settings
+    """
+    global _COMPILER
+    if _COMPILER is None:
+        _COMPILER = get_compiler()
+    return _COMPILER
+
+
+def compile_qobj(qobj: PulseQobj) -> CompiledQobj:
+    """Compiles the qobj with the compiler of this process
+
+    The compiled qobj records the calibration version it was compiled at.
+
+    Args:
+        qobj: the qobj to compile
+
+    Returns:
+        the compiled qobj
+    """
+    # read before compiling so that a calibration made meanwhile is detected later
+    calibration_version = get_calibration_version()
+    compiled_qobj = get_initialized_compiler().compile(qobj)
+    return dataclasses.replace(compiled_qobj, calibration_version=calibration_version)
+
+
+def recompile_if_outdated(compiled_qobj: CompiledQobj) -> CompiledQobj:
+    """Compiles the qobj again if the calibration has changed since it was compiled
+
+    Args:
+        compiled_qobj: the compiled qobj
+
+    Returns:
+        the given compiled qobj if it is up-to-date, else the newly compiled qobj
+    """
+    calibration_version = get_calibration_version()
+    if compiled_qobj.calibration_version == calibration_version:
+        return compiled_qobj
+
+    print(
+        f"The calibration has changed since compilation "
+        f"({compiled_qobj.calibration_version} -> {calibration_version}), recompiling"
+    )
+    compiled_qobj = get_initialized_compiler().recompile(compiled_qobj)
+    return dataclasses.replace(compiled_qobj, calibration_version=calibration_version)
@@ -1,5 +1,13 @@
-from .worker import job_execute
+from .worker import (
+    get_initialized_executor,
+    job_execute,
+    keep_executor_between_jobs,
+    reset_executor,
+)
 
 __all__ = [
     job_execute,
+    get_initialized_executor,
+    keep_executor_between_jobs,
+    reset_executor,
 ]
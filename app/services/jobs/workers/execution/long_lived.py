@@ -0,0 +1,128 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""The long-lived execution worker
+
+A default rq worker forks a work horse per job, so the executor, its instrument
+coordinator and compiler, and any other state built while running the job
+are thrown away with the work horse. This worker runs the jobs in its own process
+instead and keeps that state warm from one job to the next.
+
+Start it with::
+
+    rq worker -w app.services.jobs.workers.execution.long_lived.LongLivedWorker ...
+"""
+import gc
+import os
+import resource
+import sys
+from typing import Optional
+
+from rq import SimpleWorker
+
+import settings
+
+from .worker import (
+    get_initialized_executor,
+    keep_executor_between_jobs,
+    reset_executor,
+)
+
+
+class LongLivedWorker(SimpleWorker):
+    """An rq worker that runs the jobs in-process, keeping the executor between jobs
+
+    The executor is constructed before the first job is dequeued. After each job,
+    the executor is checked and replaced if it is no longer healthy, and the worker
+    stops once its memory has grown by more than the allowed number of bytes
+    since the executor was constructed, to be restarted by its supervisor.
+
+    Attributes:
+        max_memory_growth: the bytes the resident memory may grow by before
+            the worker stops, or None if unlimited
+        baseline_memory: the resident memory in bytes once the executor was constructed
+    """
+
+    def __init__(
+        self,
+        *args,
+        max_memory_growth: Optional[int] = settings.EXECUTION_WORKER_MAX_MEMORY_GROWTH,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        keep_executor_between_jobs()
+        self.max_memory_growth = max_memory_growth or None
+        self.baseline_memory: int = 0
+
+    def work(self, *args, **kwargs) -> bool:
+        self.warm_up()
+        return super().work(*args, **kwargs)
+
+    def warm_up(self):
+        """Constructs the executor and records the memory used thereafter
+
+        A failure to construct it is only logged: it is constructed again
+        by the first job, which then fails as it would in a forking worker.
+        """
+        try:
+            get_initialized_executor()
+        except Exception as exp:
+            self.log.error(f"Warming up the executor failed. exp: {exp}")
+        gc.collect()
+        self.baseline_memory = get_resident_memory()
+
+    def execute_job(self, job, queue):
+        super().execute_job(job, queue)
+        self.check_health()
+        self.check_memory()
+
+    def check_health(self):
+        """Replaces the executor if it can no longer run jobs"""
+        try:
+            is_healthy = get_initialized_executor().is_healthy()
+        except Exception as exp:
+            self.log.error(f"Checking the executor failed. exp: {exp}")
+            is_healthy = False
+
+        if not is_healthy:
+            self.log.warning("Executor is unhealthy, constructing a new one")
+            reset_executor()
+            self.warm_up()
+
+    def check_memory(self):
+        """Requests the worker to stop if its memory has grown beyond the limit"""
+        if self.max_memory_growth is None:
+            return
+
+        gc.collect()
+        growth = get_resident_memory() - self.baseline_memory
+        if growth > self.max_memory_growth:
+            self.log.warning(
+                f"Memory grew by {growth} bytes, over {self.max_memory_growth} bytes. "
+                "Stopping the worker"
+            )
+            self._stop_requested = True
+
+
+def get_resident_memory() -> int:
+    """Returns the resident memory of this process in bytes
+
+    Where /proc is not available, e.g. on macOS, the peak resident memory
+    is returned instead.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
@@ -12,10 +12,19 @@
 # that they have been altered from the originals.
 
 """Simple utility functions for the execution worker"""
+import os
 from typing import Optional
 
 import settings
-from app.libs.properties import get_backend_config, initialize_backend
+from app.libs.properties import (
+    get_backend_config,
+    get_calibration_version,
+    get_discriminators_version,
+    send_backend_info_to_mss,
+    set_discriminators_version,
+    set_simulator_discriminators,
+)
+from app.libs.properties.dtos import BackendConfig
 from app.libs.quantum_executor.base.executor import QuantumExecutor
 from app.libs.quantum_executor.qiskit.executor import QiskitDynamicsExecutor
 from app.libs.quantum_executor.quantify.executor import QuantifyExecutor
@@ -27,26 +36,32 @@ def get_executor(
     quantify_config_file: str = settings.QUANTIFY_CONFIG_FILE,
     quantify_metadata_file: str = settings.QUANTIFY_METADATA_FILE,
     mss_url: str = settings.MSS_MACHINE_ROOT_URL,
+    simulator_pool_size: int = settings.SIMULATOR_POOL_SIZE,
+    simulator_batch_size: int = settings.SIMULATOR_BATCH_SIZE,
+    is_standalone: bool = settings.IS_STANDALONE,
 ) -> QuantumExecutor:
     """Gets the executor for running jobs
 
-    It also initializes the backend before returning the executor
+    The calibration data is seeded on the startup of the API, not here. For
+    simulators, the discriminators are trained if they have not been trained
+    at the current calibration yet.
 
     Args:
         executor_type: the executor type to return
         quantify_config_file: the path to the configuration file of the executor
         quantify_metadata_file: the path to the metadata file of the executor
         mss_url: the URL to MSS
+        simulator_pool_size: the number of processes simulating the experiments
+            of a job on simulators; 0 shares the cores among the execution workers
+        simulator_batch_size: the maximum number of experiments simulated in one
+            run of the simulator backend; 0 runs all the experiments of a job at once
+        is_standalone: whether this backend is standalone or is connected to an MSS
 
     Returns:
         An initialized quantum executor
     """
     executor: Optional[QuantumExecutor] = None
     backend_config = get_backend_config()
-    qubit_config = None
-    resonator_config = None
-    discriminator_config = None
-    coupler_config = None
 
     if executor_type == "quantify":
         executor = QuantifyExecutor(
@@ -55,26 +70,64 @@ def get_executor(
             backend_config=backend_config,
         )
 
+    if simulator_pool_size <= 0:
+        simulator_pool_size = max(
+            1, (os.cpu_count() or 1) // max(1, settings.SIMULATOR_EXECUTION_WORKERS)
+        )
+
     if executor_type == "qiskit_pulse_1q":
         executor: QiskitDynamicsExecutor = QiskitDynamicsExecutor.new_one_qubit(
-            backend_config=backend_config
+            backend_config=backend_config,
+            pool_size=simulator_pool_size,
+            batch_size=simulator_batch_size,
         )
-        discriminator_config = executor.backend.train_discriminator()
 
     if executor_type == "qiskit_pulse_2q":
         executor: QiskitDynamicsExecutor = QiskitDynamicsExecutor.new_two_qubit(
-            backend_config=backend_config
+            backend_config=backend_config,
+            pool_size=simulator_pool_size,
+            batch_size=simulator_batch_size,
+        )
+
+    if isinstance(executor, QiskitDynamicsExecutor):
+        _train_discriminators_if_outdated(
+            executor,
+            backend_config=backend_config,
+            mss_url=mss_url,
+            is_standalone=is_standalone,
         )
-        discriminator_config = executor.backend.train_discriminator()
-
-    initialize_backend(
-        mss_client=get_mss_client(),
-        mss_url=mss_url,
-        backend_config=backend_config,
-        qubit_config=qubit_config,
-        resonator_config=resonator_config,
-        discriminator_config=discriminator_config,
-        coupler_config=coupler_config,
-    )
 
     return executor
+
+
+def _train_discriminators_if_outdated(
+    executor: QiskitDynamicsExecutor,
+    backend_config: BackendConfig,
+    mss_url: str,
+    is_standalone: bool,
+):
+    """Trains the discriminators of the simulator unless they were trained at the current calibration
+
+    The execution worker may construct an executor per job, and storing newly
+    trained discriminators changes the calibration, which would recompile every job.
+
+    Args:
+        executor: the executor of the simulator
+        backend_config: the configuration of the backend
+        mss_url: the URL to MSS
+        is_standalone: whether this backend is standalone or is connected to an MSS
+    """
+    if get_discriminators_version() == get_calibration_version():
+        return
+
+    discriminator_config = executor.backend.train_discriminator()
+    set_simulator_discriminators(backend_config, discriminator_config)
+    set_discriminators_version(get_calibration_version())
+
+    if not is_standalone:
+        # update MSS of the newly trained discriminators
+        send_backend_info_to_mss(
+            backend_config=backend_config,
+            mss_client=get_mss_client(),
+            mss_url=mss_url,
+        )
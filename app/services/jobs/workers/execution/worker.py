@@ -15,22 +15,31 @@
 # that they have been altered from the originals.
 
 
-import json
+import functools
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict
-
-from qiskit.qobj import PulseQobj
-from qiskit_ibm_provider.utils import json_decoder
+from typing import Optional
 
 import settings
+from app.libs.quantum_executor.base.compiler import load_compiled_qobj
+from app.libs.quantum_executor.base.exc import JobCancelledError
+from app.libs.quantum_executor.base.executor import QuantumExecutor
 from app.libs.quantum_executor.utils.connections import get_executor_lock
-from app.libs.quantum_executor.utils.serialization import iqx_rld
 from app.utils.queues import QueuePool
 
-from ...service import Location, fetch_job, inform_failure, inform_location
+from ...service import (
+    Location,
+    fetch_job,
+    fetch_priority,
+    flushes_log,
+    get_rq_job_id,
+    inform_failure,
+    inform_location,
+    is_job_cancelled,
+)
+from .. import LOGFILE_POSTPROCESS_TASK
+from ..compilation import recompile_if_outdated
 from ..postprocessing import (
-    logfile_postprocess,
     postprocessing_failure_callback,
     postprocessing_success_callback,
 )
@@ -45,40 +54,121 @@ DEFAULT_PREFIX = settings.DEFAULT_PREFIX
 
 # Redis connection
 # ----------------
-rq_queues = QueuePool(prefix=DEFAULT_PREFIX, connection=settings.REDIS_CONNECTION)
-executor = get_executor()
+rq_queues = QueuePool(
+    prefix=DEFAULT_PREFIX,
+    connection=settings.REDIS_CONNECTION,
+    priority_stages=settings.PRIORITY_QUEUES,
+    aging_interval=settings.QUEUE_AGING_INTERVAL,
+)
+
+# Executor
+# --------
+# It is constructed on the first job_execute call in the execution worker
+# because constructing it is expensive e.g. resetting clusters or training discriminators
+_EXECUTOR: Optional[QuantumExecutor] = None
+# Whether the executor is kept from one job to the next, as in the long-lived worker.
+# Otherwise, it is closed after each job so that nothing it started, e.g. the pool
+# of a simulator, outlives the work horse forked for the job.
+_KEEPS_EXECUTOR = False
+
+
+def get_initialized_executor() -> QuantumExecutor:
+    """Returns the executor of this process, constructing it on first call
+
+    Only an executor kept between jobs simulates in a pool of several processes,
+    since the pool would otherwise be started again for every job.
+
+    Returns:
+        the initialized QuantumExecutor
+    """
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        if _KEEPS_EXECUTOR:
+            _EXECUTOR = get_executor()
+        else:
+            _EXECUTOR = get_executor(simulator_pool_size=1)
+    return _EXECUTOR
+
+
+def keep_executor_between_jobs():
+    """Keeps the executor of this process from one job to the next"""
+    global _KEEPS_EXECUTOR
+    _KEEPS_EXECUTOR = True
+
+
+def reset_executor():
+    """Closes the executor of this process so that the next call constructs a new one"""
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        executor, _EXECUTOR = _EXECUTOR, None
+        try:
+            executor.close()
+        except Exception as exp:
+            print(f"Closing the executor failed. exp: {exp}")
 
 
+@flushes_log
 def job_execute(job_file: Path):
+    """Runs the job compiled in the pre-processing worker on the executor
+
+    Args:
+        job_file: the path to the file of the compiled job
+    """
     print(f"Executing file {str(job_file)}")
 
-    with job_file.open() as f:
-        job_dict = json.load(f)
+    job_id = job_file.stem
+    # Inform supervisor
+    inform_location(job_id, Location.EXEC_W)
 
-    job_id = ""
     try:
-        job_id = job_dict["job_id"]
+        return _run_compiled_job(job_file, job_id=job_id)
+    finally:
+        # clean up, whether the job has run, failed or been cancelled
+        job_file.unlink(missing_ok=True)
+        if not _KEEPS_EXECUTOR:
+            reset_executor()
+
+
+def _run_compiled_job(job_file: Path, job_id: str) -> dict:
+    """Runs the compiled job on the executor and enqueues its results for postprocessing
 
-        # Inform supervisor
-        inform_location(job_id, Location.EXEC_W)
-        qobj = _decompress_qobj(job_dict["params"]["qobj"])
+    Args:
+        job_file: the path to the file of the compiled job
+        job_id: the id of the job
 
-    except KeyError as exp:
+    Returns:
+        the message of the outcome of the execution
+    """
+    try:
+        compiled_qobj = load_compiled_qobj(job_file)
+    except Exception as exp:
         print("Invalid job")
-        print(f"Job execution failed. Key error: {exp}")
+        print(f"Job execution failed. exp: {exp}")
         inform_failure(job_id, reason="malformed job")
         return {"message": "malformed job"}
 
+    try:
+        # the calibration may have changed while the job was waiting
+        compiled_qobj = recompile_if_outdated(compiled_qobj)
+    except Exception as exp:
+        print(f"Job recompilation failed. exp: {exp}")
+        inform_failure(job_id, reason="compilation failed")
+        return {"message": "failed"}
+
     # Just a locking mechanism to ensure jobs don't interfere with each other
     with get_executor_lock():
         try:
-            # --- In-place decode complex values
-            # [[a,b],[c,d],...] -> [a + ib,c + id,...]
-            json_decoder.decode_pulse_qobj(qobj)
-
             print(datetime.now(), "IN REST API CALLING RUN_EXPERIMENTS")
 
-            results_file = executor.run(PulseQobj.from_dict(qobj), job_id=job_id)
+            executor = get_initialized_executor()
+            results_file = executor.run_compiled(
+                compiled_qobj,
+                job_id=job_id,
+                is_cancelled=functools.partial(is_job_cancelled, job_id),
+            )
+        except JobCancelledError:
+            print("Job cancelled, execution halted")
+            return {"message": "cancelled"}
         except Exception as exp:
             print("Job failed")
             print(f"Job execution failed. exp: {exp}")
@@ -93,40 +183,17 @@ def job_execute(job_file: Path):
             # FIXME: Probably provide an error message to the client also
             return {"message": "cancelled"}
 
-        rq_queues.logfile_postprocessing_queue.enqueue(
-            logfile_postprocess,
+        rq_queues.logfile_postprocessing_queue.enqueue_with_priority(
+            fetch_priority(job_id, "post_processing"),
+            LOGFILE_POSTPROCESS_TASK,
             on_success=postprocessing_success_callback,
             on_failure=postprocessing_failure_callback,
-            job_id=f"{job_id}_{Location.PST_PROC_Q.name}",
+            job_id=get_rq_job_id(job_id, Location.PST_PROC_Q),
             args=(results_file,),
         )
 
         # inform supervisor
         inform_location(job_id, Location.PST_PROC_Q)
 
-    # clean up
-    job_file.unlink(missing_ok=True)
     print("Job executed successfully")
     return {"message": "ok"}
-
-
-def _decompress_qobj(qobj_dict: Dict[str, Any]) -> Dict[str, Any]:
-    """Reverses the compression done on the qobj at the SDK level
-
-    Before submission, the qobj dict was compressed to ease
-    transportation. This compression is reversed here.
-
-    Note that this decompression is done in-place
-
-    Args:
-        qobj_dict: the dict of the PulseQobj to decompress
-
-    Returns:
-        A QObject dict that is decompressed
-    """
-    # --- In-place RLD pulse library
-    # [([a,b], 2),...] -> [[a,b],[a,b],...]
-    for pulse in qobj_dict["config"]["pulse_library"]:
-        pulse["samples"] = iqx_rld(pulse["samples"])
-
-    return qobj_dict
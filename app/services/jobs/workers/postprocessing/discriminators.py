@@ -0,0 +1,164 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""In-process cache of the linear discriminators used in postprocessing
+
+The discriminators are read from the local properties store (redis), where
+`set_discriminator_data` writes them, rather than from MSS. They are kept
+in arrays until the calibration version changes.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from app.libs.properties import (
+    get_backend_config,
+    get_calibration_version,
+    get_inner_value,
+    read_discriminator_data,
+)
+from app.libs.properties.dtos import BackendConfig
+
+# the parameters of the linear discriminant analysis of each qubit
+_LDA_PARAMS = ("coef_0", "coef_1", "intercept")
+
+_CACHED: Optional["LinearDiscriminator"] = None
+
+
+@dataclass(frozen=True)
+class LinearDiscriminator:
+    """The linear discriminators of all the qubits of the device
+
+    The state of an IQ point of a qubit is 1 if `coef_0 * I + coef_1 * Q + intercept`
+    is positive, else 0. The parameters of qubits without a discriminator are NaN.
+
+    Attributes:
+        version: the calibration version the discriminators were read at
+        coefficients: the (n_qubits, 2) matrix of the coefficients of I and Q
+        intercepts: the (n_qubits,) vector of the intercepts
+        rows: the row of the qubit of each acquisition channel, channel i
+            being measured on qubit 'q{i}'
+    """
+
+    version: int
+    coefficients: npt.NDArray[np.float64]
+    intercepts: npt.NDArray[np.float64]
+    rows: Dict[int, int]
+
+    def __call__(
+        self, qubit_idx: int, iq_points: npt.NDArray[np.complex128]
+    ) -> npt.NDArray[np.int_]:
+        """Discriminates the IQ points of the given acquisition channel
+
+        Args:
+            qubit_idx: the index of the acquisition channel
+            iq_points: the IQ points measured on that channel
+
+        Returns:
+            the discriminated 0 and 1 states as numpy array
+
+        Raises:
+            KeyError: there is no discriminator for the qubit of the channel
+        """
+        iq_points = np.asarray(iq_points)[np.newaxis]
+        return self.discriminate_channels([qubit_idx], iq_points)[0].astype(np.int_)
+
+    def discriminate_channels(
+        self,
+        channels: Sequence[int],
+        iq_points: npt.NDArray[np.complex128],
+    ) -> npt.NDArray[np.bool_]:
+        """Discriminates the IQ points of several acquisition channels at once
+
+        The complex IQ points are viewed as (I, Q) pairs without copy, and the scores
+        of all the channels are computed in one stacked matrix product.
+
+        Args:
+            channels: the indices of the acquisition channels
+            iq_points: the (n_channels, n_shots) matrix of their IQ points
+
+        Returns:
+            the (n_channels, n_shots) matrix of the states, True being 1
+
+        Raises:
+            KeyError: there is no discriminator for the qubit of one of the channels
+        """
+        rows = [self.rows[idx] for idx in channels]
+        coefficients = self.coefficients[rows]
+        intercepts = self.intercepts[rows]
+        is_missing = np.isnan(coefficients).any(axis=1) | np.isnan(intercepts)
+        if is_missing.any():
+            qubits = [f"q{idx}" for idx, miss in zip(channels, is_missing) if miss]
+            raise KeyError(f"no lda discriminator for qubit {', '.join(qubits)}")
+
+        iq_points = np.ascontiguousarray(iq_points, dtype=np.complex128)
+        iq_pairs = iq_points.view(np.float64).reshape(*iq_points.shape, 2)
+        scores = np.matmul(iq_pairs, coefficients[:, :, np.newaxis])[..., 0]
+        return scores > -intercepts[:, np.newaxis]
+
+
+def get_linear_discriminator(
+    backend_config: Optional[BackendConfig] = None,
+) -> LinearDiscriminator:
+    """Returns the linear discriminators of the current calibration
+
+    They are read from the store only if the calibration version has changed
+    since they were last read in this process.
+
+    Args:
+        backend_config: the configuration of the backend, that of the settings if None
+
+    Returns:
+        the linear discriminators of all the qubits of the device
+    """
+    global _CACHED
+    # read before the data so that a concurrent write makes the next call reload
+    version = get_calibration_version()
+    cached = _CACHED
+    if cached is None or cached.version != version:
+        cached = _load_linear_discriminator(version, backend_config=backend_config)
+        _CACHED = cached
+    return cached
+
+
+def _load_linear_discriminator(
+    version: int, backend_config: Optional[BackendConfig] = None
+) -> LinearDiscriminator:
+    """Reads the linear discriminators of all the qubits from the store
+
+    Args:
+        version: the current calibration version
+        backend_config: the configuration of the backend, that of the settings if None
+
+    Returns:
+        the linear discriminators of all the qubits of the device
+    """
+    if backend_config is None:
+        backend_config = get_backend_config()
+
+    qubit_ids = backend_config.device_config.qubit_ids
+    data = read_discriminator_data(qubit_ids=qubit_ids, params=list(_LDA_PARAMS))
+
+    params = np.full((len(qubit_ids), len(_LDA_PARAMS)), np.nan)
+    for row, qubit_id in enumerate(qubit_ids):
+        for col, param in enumerate(_LDA_PARAMS):
+            value = get_inner_value(data[qubit_id][param])
+            if value is not None:
+                params[row, col] = value
+
+    return LinearDiscriminator(
+        version=version,
+        coefficients=params[:, :2].copy(),
+        intercepts=params[:, 2].copy(),
+        rows={int(qubit_id.strip("q")): row for row, qubit_id in enumerate(qubit_ids)},
+    )
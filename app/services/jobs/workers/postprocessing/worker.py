@@ -15,19 +15,16 @@
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
 
-import functools
 import logging
 import shutil
 from pathlib import Path
-from typing import Any, Tuple, Type
+from typing import Any, List, Tuple, Type
 
 import numpy as np
-import numpy.typing as npt
 import redis
 import requests
 import rq.job
 from requests import Response
-from sklearn.utils.extmath import safe_sparse_dot
 
 import settings
 from app.libs.properties.utils import date_time
@@ -35,6 +32,7 @@ from app.libs.quantum_executor.base.quantum_job import (
     MeasLvl,
     QuantumJob,
     discriminate_results,
+    outcomes_to_hex,
     read_job_from_hdf5,
 )
 from app.services.jobs.workers.postprocessing.exc import PostProcessingError
@@ -44,10 +42,11 @@ from ...service import (
     Location,
     fetch_job,
     fetch_redis_entry,
+    flushes_log,
     inform_location,
     save_result,
-    update_final_location_timestamp,
 )
+from .discriminators import get_linear_discriminator
 
 # Storage settings
 
@@ -81,6 +80,7 @@ JobID = str
 # =========================================================================
 
 
+@flushes_log
 def logfile_postprocess(logfile: Path) -> JobID:
     print(f"Postprocessing logfile {str(logfile)}")
 
@@ -112,60 +112,13 @@ def logfile_postprocess(logfile: Path) -> JobID:
 # =========================================================================
 
 
-def _apply_linear_discriminator(
-    backend: dict, qubit_idx: int, iq_points: npt.NDArray[np.complex128]
-) -> npt.NDArray[np.int_]:
-    """
-    Fetches the linear discriminator from the backend definition
-
-    Args:
-        backend: Backend definition as dictionary
-        qubit_idx: ID of the qubit to discriminate
-        iq_points: IQ points from the measurement
-
-    Returns:
-        Discriminated 0 and 1 states as numpy array
-
-    """
-    discriminator_ = backend["discriminators"]["lda"]
-    # TODO: We are having two "qubit_id" (e.g. q12 = 0, q13 = 1) and we should have some more meaningful representation
-    qubit_id_ = f"q{qubit_idx}"
-
-    coefficients = np.array(
-        [
-            discriminator_[qubit_id_]["coef_0"],
-            discriminator_[qubit_id_]["coef_1"],
-        ]
-    )
-    intercept = np.array(discriminator_[qubit_id_]["intercept"])
-
-    data = np.zeros((iq_points.shape[0], 2))
-    data[:, 0] = iq_points.real
-    data[:, 1] = iq_points.imag
-
-    scores = safe_sparse_dot(data, coefficients.T, dense_output=True) + intercept
-
-    return (scores.ravel() > 0).astype(np.int_)
-
-
-def postprocess_storage_file(
-    job: QuantumJob, backend_name: str = settings.DEFAULT_PREFIX
-) -> JobID:
+def postprocess_storage_file(job: QuantumJob) -> JobID:
     try:
         with get_mss_client() as mss_client:
             if job.meas_level == MeasLvl.DISCRIMINATED:
-                # This would fetch the discriminator from the MSS
-                backend_definition: str = f'{str(MSS_MACHINE_ROOT_URL)}{REST_API_MAP["backends"]}/{backend_name}'
-                response = mss_client.get(backend_definition)
-
-                if response.status_code == 200:
-                    discriminator_fn = functools.partial(
-                        _apply_linear_discriminator, response.json()
-                    )
-                else:
-                    print(f"Response error {response}")
-
                 try:
+                    # read from the local store, only when the calibration has changed
+                    discriminator_fn = get_linear_discriminator()
                     memory = discriminate_results(job, discriminator=discriminator_fn)
 
                     save_result_in_mss_and_bcc(
@@ -197,13 +150,13 @@ def postprocess_storage_file(
 # =========================================================================
 
 
+@flushes_log
 def postprocessing_success_callback(
     _rq_job, _rq_connection, result: JobID, *args, **kwargs
 ):
     # From logfile_postprocess:
     job_id = result
-    inform_location(job_id, Location.FINAL_Q)
-    update_final_location_timestamp(job_id, status="started")
+    inform_location(job_id, Location.FINAL_Q, final_timestamp="started")
 
     script_name, post_processing = get_metainfo(job_id)
 
@@ -223,12 +176,12 @@ def postprocessing_success_callback(
                 f"Results post-processed by '{post_processing}' available by job_id in Redis."
             )
 
-        update_final_location_timestamp(job_id, status="finished")
+        inform_location(job_id, Location.FINAL_W, final_timestamp="finished")
         _update_location_timestamps_in_mss(mss_client=mss_client, job_id=job_id)
-        inform_location(job_id, Location.FINAL_W)
 
 
 # job, connection, type, value, traceback
+@flushes_log
 def postprocessing_failure_callback(
     _rq_job: rq.job.Job,
     _rq_connection: redis.Redis,
@@ -256,16 +209,22 @@ def get_metainfo(job_id: str) -> Tuple[str, str]:
 # =========================================================================
 
 
-def save_result_in_mss_and_bcc(mss_client: requests.Session, memory, job_id: JobID):
+def save_result_in_mss_and_bcc(
+    mss_client: requests.Session, memory: List[np.ndarray], job_id: JobID
+):
     """Updates both MSS and BCC with the memory part of the result
 
+    The outcomes are formatted as hex strings only for MSS. BCC stores them packed
+    as they are, unless they are wider than 64 bits.
+
     Args:
         mss_client: the requests.Session that can query MSS
-        memory: the memory part of the result, usually saved as {'result': {'memory': [...]}}
+        memory: the packed outcomes of each experiment as returned by `discriminate_results`
         job_id: the ID of the job
     """
-    _debug_job_memory_list(memory)
-    result = {"memory": memory}
+    hex_memory = [outcomes_to_hex(outcomes) for outcomes in memory]
+    _debug_job_memory_list(hex_memory)
+    result = {"memory": hex_memory}
     payload = {
         "result": result,
         "status": "DONE",
@@ -274,7 +233,10 @@ def save_result_in_mss_and_bcc(mss_client: requests.Session, memory, job_id: Job
     }
 
     # update BCC's redis database
-    save_result(job_id, result)
+    if all(outcomes.ndim == 1 for outcomes in memory):
+        save_result(job_id, {"memory": memory})
+    else:
+        save_result(job_id, result)
 
     # update MSS
     response = _update_job_in_mss(mss_client=mss_client, job_id=job_id, payload=payload)
@@ -289,9 +251,9 @@ def _update_location_timestamps_in_mss(mss_client: requests.Session, job_id: Job
         mss_client: the requests.Session that can query MSS
         job_id: the ID of the job
     """
-    entry = fetch_redis_entry(job_id)
+    timestamps = fetch_job(job_id, "timestamps")
     try:
-        payload = {"timestamps": entry["timestamps"]}
+        payload = {"timestamps": timestamps}
         response = _update_job_in_mss(
             mss_client=mss_client, job_id=job_id, payload=payload
         )
@@ -9,13 +9,21 @@
 # Any modifications or derivative works of this code must retain this
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
+import json
 from pathlib import Path
 
 import settings
 from app.utils.queues import QueuePool
 
-from ..service import Location, inform_location
-from .execution import job_execute
+from ..service import (
+    Location,
+    fetch_priority,
+    flushes_log,
+    get_rq_job_id,
+    inform_failure,
+    inform_location,
+)
+from . import JOB_EXECUTE_TASK
 
 # settings
 DEFAULT_PREFIX = settings.DEFAULT_PREFIX
@@ -24,15 +32,65 @@ STORAGE_PREFIX_DIRNAME = settings.STORAGE_PREFIX_DIRNAME
 JOB_EXECUTION_POOL_DIRNAME = settings.JOB_EXECUTION_POOL_DIRNAME
 
 
-rq_queues = QueuePool(prefix=DEFAULT_PREFIX, connection=settings.REDIS_CONNECTION)
+rq_queues = QueuePool(
+    prefix=DEFAULT_PREFIX,
+    connection=settings.REDIS_CONNECTION,
+    priority_stages=settings.PRIORITY_QUEUES,
+    aging_interval=settings.QUEUE_AGING_INTERVAL,
+)
 
 
+@flushes_log
 def job_preprocess(job_file: Path):
     job_id = job_file.stem
 
     # Inform supervisor about job being in pre-processing worker
     inform_location(job_id, Location.PRE_PROC_W)
 
+    preprocess(job_file, priority=fetch_priority(job_id, "execution"))
+
+
+def preprocess(job_file: Path, priority: int):
+    """Compiles the job into the execution pool and enqueues it for execution
+
+    The qobj of the job is decoded and compiled for the executor here,
+    outside the executor lock, so the execution worker only loads and runs it.
+    The job is expected to be at the pre-processing worker already.
+
+    Args:
+        job_file: the path to the job file
+        priority: the priority of the job in the execution queue
+    """
+    # the executor's libraries are imported only when compiling so that starting
+    # this worker, and the registration worker that imports it, stays cheap
+    from app.libs.quantum_executor.base.compiler import (
+        decode_qobj,
+        save_compiled_qobj,
+    )
+
+    from .compilation import compile_qobj
+
+    job_id = job_file.stem
+
+    try:
+        with job_file.open() as f:
+            job_dict = json.load(f)
+        qobj = decode_qobj(job_dict["params"]["qobj"])
+    except Exception as exp:
+        print("Invalid job")
+        print(f"Job pre-processing failed. exp: {exp}")
+        inform_failure(job_id, reason="malformed job")
+        job_file.unlink(missing_ok=True)
+        return
+
+    try:
+        compiled_qobj = compile_qobj(qobj)
+    except Exception as exp:
+        print(f"Job compilation failed. exp: {exp}")
+        inform_failure(job_id, reason="compilation failed")
+        job_file.unlink(missing_ok=True)
+        return
+
     new_file_name = job_file.stem
     storage_location = Path(STORAGE_ROOT) / STORAGE_PREFIX_DIRNAME
 
@@ -40,15 +98,17 @@ def job_preprocess(job_file: Path):
     new_file_path.mkdir(exist_ok=True)
     new_file = new_file_path / new_file_name
 
-    job_file.replace(new_file)
+    save_compiled_qobj(compiled_qobj, new_file)
+    job_file.unlink(missing_ok=True)
 
-    rq_queues.job_execution_queue.enqueue(
-        job_execute,
+    rq_queues.job_execution_queue.enqueue_with_priority(
+        priority,
+        JOB_EXECUTE_TASK,
         new_file,
-        job_id=job_id + f"_{Location.EXEC_Q.name}",
+        job_id=get_rq_job_id(job_id, Location.EXEC_Q),
     )
 
     # Inform supervisor about job moved to execution queue
     inform_location(job_id, Location.EXEC_Q)
 
-    print(f"Moved the job file to {str(new_file)}")
+    print(f"Saved the compiled job to {str(new_file)}")
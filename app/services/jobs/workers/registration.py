@@ -11,13 +11,23 @@
 # copyright notice, and modified files need to carry a notice indicating
 # that they have been altered from the originals.
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 import settings
 
 from ....utils.json import get_items_from_json
 from ....utils.queues import QueuePool
-from ..service import Location, inform_location, register_job, update_job_entry
-from .preprocessing import job_preprocess
+from ..dtos import JobPriorities
+from ..service import (
+    Location,
+    fetch_priority,
+    flushes_log,
+    get_rq_job_id,
+    inform_location,
+    register_job,
+)
+from . import JOB_PREPROCESS_TASK
+from .preprocessing import preprocess
 
 # settings
 DEFAULT_PREFIX = settings.DEFAULT_PREFIX
@@ -28,16 +38,54 @@ JOB_PRE_PROC_POOL_DIRNAME = settings.JOB_PRE_PROC_POOL_DIRNAME
 
 
 # preprocessing queue
-rq_queues = QueuePool(prefix=DEFAULT_PREFIX, connection=settings.REDIS_CONNECTION)
+rq_queues = QueuePool(
+    prefix=DEFAULT_PREFIX,
+    connection=settings.REDIS_CONNECTION,
+    priority_stages=settings.PRIORITY_QUEUES,
+    aging_interval=settings.QUEUE_AGING_INTERVAL,
+)
 
 
-def job_register(job_file: Path) -> None:
-    """Registers job in job supervisor"""
+@flushes_log
+def job_register(job_file: Path, items: Optional[Dict[str, Any]] = None) -> None:
+    """Registers job in job supervisor
+
+    If settings.FUSED_PREPROCESSING is set, the job is also pre-processed
+    in this task and enqueued for execution right away.
+
+    Args:
+        job_file: the path to the uploaded job file
+        items: the items of the job to put in its job supervisor entry.
+            If None, they are read from the job file.
+    """
     job_id = job_file.stem
+    # some of this job's items to put in job_supervisor's Redis entry
+    if items is None:
+        keys = [
+            "name",
+            "is_calibration_supervisor_job",
+            "post_processing",
+            "priorities",
+        ]
+        items = get_items_from_json(job_file, keys)
+    priorities = JobPriorities.model_validate(items.get("priorities") or {})
+    items = {key: value for key, value in items.items() if key != "priorities"}
+
     # inform job supervisor about job registration
     print(f"Registering job file {str(job_file)}")
-    register_job(job_id)
-    # store the received file in the job upload pool
+    # the entry has the priorities from the start, and the priorities of the next
+    # stages are read from it so that changes made in the meantime are kept
+    register_job(job_id, priorities=priorities.model_dump(by_alias=True))
+
+    if settings.FUSED_PREPROCESSING:
+        # pre-process the job right here instead of through the pre-processing queue,
+        # going through the same locations to keep the same timestamps
+        inform_location(job_id, Location.PRE_PROC_Q, items=items)
+        inform_location(job_id, Location.PRE_PROC_W)
+        preprocess(job_file, priority=fetch_priority(job_id, "execution"))
+        return
+
+    # store the received file in the job pre-processing pool
     new_file_name = job_file.stem
     new_file_path = (
         Path(STORAGE_ROOT) / STORAGE_PREFIX_DIRNAME / JOB_PRE_PROC_POOL_DIRNAME
@@ -46,15 +94,10 @@ def job_register(job_file: Path) -> None:
     new_file = new_file_path / new_file_name
     job_file.replace(new_file)
     # add job to pre-processing queue and notify job supervisor
-    rq_queues.job_preprocessing_queue.enqueue(
-        job_preprocess,
+    rq_queues.job_preprocessing_queue.enqueue_with_priority(
+        fetch_priority(job_id, "pre_processing"),
+        JOB_PREPROCESS_TASK,
         new_file,
-        job_id=job_id + f"_{Location.PRE_PROC_Q.name}",
+        job_id=get_rq_job_id(job_id, Location.PRE_PROC_Q),
     )
-    inform_location(job_id, Location.PRE_PROC_Q)
-
-    # put some of this job's items in job_supervisor's Redis entry
-    keys = ["name", "is_calibration_supervisor_job", "post_processing"]
-    dict_partial = get_items_from_json(new_file, keys)
-    for key, value in dict_partial.items():
-        update_job_entry(job_id, value, key)
+    inform_location(job_id, Location.PRE_PROC_Q, items=items)
@@ -57,7 +57,11 @@ _real_redis = redis.Redis(
 )
 _fake_redis = FakeStrictRedis()
 _async_queue_pool = QueuePool(
-    prefix=TEST_DEFAULT_PREFIX, connection=_real_redis, is_async=True
+    prefix=TEST_DEFAULT_PREFIX,
+    connection=_real_redis,
+    is_async=True,
+    priority_stages=["execution"],
+    aging_interval=60.0,
 )
 _sync_queue_pool = QueuePool(
     prefix=TEST_DEFAULT_PREFIX, connection=_fake_redis, is_async=False
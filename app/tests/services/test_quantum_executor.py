@@ -11,18 +11,43 @@
 # that they have been altered from the originals.
 
 """Tests specific to the quantum executor service"""
+import copy
 import socket
+import sys
+from contextlib import nullcontext
 
 import pytest
+from filelock import FileLock
 
 from ...libs.properties.dtos import BackendConfig
+from ...libs.quantum_executor.base.compiler import decode_qobj
+from ...libs.quantum_executor.base.quantum_job import get_experiment_name
+from ...libs.quantum_executor.qiskit.executor import QiskitDynamicsExecutor
 from ...libs.quantum_executor.quantify.executor import QuantifyExecutor
-from ..utils.fixtures import get_fixture_path
+from ...libs.quantum_executor.utils.connections import get_executor_lock
+from ..utils.env import TEST_QISKIT_1Q_SEED_FILE, TEST_SIMQ1_BACKEND_SETTINGS_FILE
+from ..utils.fixtures import get_fixture_path, load_fixture
 
 _REAL_HARDWARE_QUANTIFY_CONFIG_FILE = get_fixture_path("generic-quantify-config.json")
 _REAL_HARDWARE_QUANTIFY_METADATA_FILE = get_fixture_path("real-quantify-config.yml")
 _BACKEND_CONFIG_PATH = get_fixture_path("backend_config.toml")
 _CALIBRATION_SEED_FILE = get_fixture_path("quantify.seed.toml")
+_SIMULATOR_JOB = load_fixture("jobs_to_upload_simulator.json")[0]
+# the modules whose objects the simulation pool pickles, as imported by these tests
+_EXECUTOR_MODULES = {
+    name: module for name, module in sys.modules.items() if name.startswith("app.libs")
+}
+
+
+@pytest.fixture
+def collected_modules(monkeypatch):
+    """Has the simulation pool pickle the objects of the modules of these tests
+
+    and not look them up in those imported again after other tests removed them
+    """
+    for name, module in _EXECUTOR_MODULES.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    yield
 
 
 def test_attempts_to_connect_to_real_hardware():
@@ -38,3 +63,101 @@ def test_attempts_to_connect_to_real_hardware():
             quantify_metadata_file=_REAL_HARDWARE_QUANTIFY_METADATA_FILE,
             backend_config=backend_config,
         )
+
+
+@pytest.mark.parametrize(
+    "executor_type, lock_type",
+    [
+        ("quantify", FileLock),
+        ("qiskit_pulse_1q", nullcontext),
+        ("qiskit_pulse_2q", nullcontext),
+    ],
+)
+def test_executor_lock_only_for_hardware(executor_type, lock_type):
+    """Only the executors of real hardware are locked"""
+    assert isinstance(get_executor_lock(executor_type), lock_type)
+
+
+def _new_simulator_qobj_dict(no_of_copies: int) -> dict:
+    """Creates the qobj of the simulator job with its experiments copied and renamed
+
+    Args:
+        no_of_copies: the number of copies of each experiment
+
+    Returns:
+        the qobj as a dict, with experiments named 'copy-{index}' in order
+    """
+    qobj_dict = copy.deepcopy(_SIMULATOR_JOB["params"]["qobj"])
+    experiments = [
+        copy.deepcopy(expt)
+        for expt in qobj_dict["experiments"]
+        for _ in range(no_of_copies)
+    ]
+    for idx, expt in enumerate(experiments):
+        expt["header"]["name"] = f"copy-{idx}"
+    qobj_dict["experiments"] = experiments
+    return qobj_dict
+
+
+@pytest.mark.parametrize("pool_size, batch_size", [(1, 0), (1, 2), (2, 0)])
+def test_simulator_runs_experiments_in_order(collected_modules, pool_size, batch_size):
+    """The simulator returns the results of all experiments in their order
+
+    whether they are run in one batch, several batches or in the simulation pool
+    """
+    backend_config = BackendConfig.from_toml(
+        TEST_SIMQ1_BACKEND_SETTINGS_FILE, seed_file=TEST_QISKIT_1Q_SEED_FILE
+    )
+    qobj_dict = _new_simulator_qobj_dict(no_of_copies=3)
+    expected_names = [
+        get_experiment_name(expt["header"]["name"], idx + 1)
+        for idx, expt in enumerate(qobj_dict["experiments"])
+    ]
+    shots = qobj_dict["config"]["shots"]
+
+    with QiskitDynamicsExecutor.new_one_qubit(
+        backend_config=backend_config, pool_size=pool_size, batch_size=batch_size
+    ) as executor:
+        compiled_qobj = executor.compiler.compile(decode_qobj(qobj_dict))
+        results = executor._run_experiments(
+            compiled_qobj.experiments,
+            native_config=compiled_qobj.native_config,
+            logger=None,
+        )
+
+    assert [expt.name for expt in compiled_qobj.experiments] == expected_names
+    assert list(results) == expected_names
+    for result in results.values():
+        assert result["0"].shape == (shots, 1)
+
+
+def test_simulation_pool_started_by_first_job_of_several_batches(collected_modules):
+    """The simulation pool is only started once a job has several batches to run"""
+    backend_config = BackendConfig.from_toml(
+        TEST_SIMQ1_BACKEND_SETTINGS_FILE, seed_file=TEST_QISKIT_1Q_SEED_FILE
+    )
+
+    def run_job(executor: QiskitDynamicsExecutor, no_of_experiments: int):
+        qobj_dict = _new_simulator_qobj_dict(no_of_copies=no_of_experiments)
+        compiled_qobj = executor.compiler.compile(decode_qobj(qobj_dict))
+        executor._run_experiments(
+            compiled_qobj.experiments,
+            native_config=compiled_qobj.native_config,
+            logger=None,
+        )
+
+    with QiskitDynamicsExecutor.new_one_qubit(
+        backend_config=backend_config, pool_size=2
+    ) as executor:
+        is_healthy_before_start = executor.is_healthy()
+        run_job(executor, no_of_experiments=1)
+        pool_after_one_batch = executor._pool
+        run_job(executor, no_of_experiments=3)
+        pool_after_several_batches = executor._pool
+        is_healthy_after_start = executor.is_healthy()
+
+    assert is_healthy_before_start
+    assert pool_after_one_batch is None
+    assert pool_after_several_batches is not None
+    assert is_healthy_after_start
+    assert executor._pool is None
@@ -1,14 +1,21 @@
 import copy
+import gzip
+import io
 import json
+import threading
 from itertools import zip_longest
 from os import path
 from pathlib import Path
 from typing import Any, Dict, List
 
+import numpy as np
 import pytest
 import redis
+import zstandard
+from freezegun import freeze_time
 from rq import Worker
 
+import settings
 from app.tests.conftest import (
     BLACKLISTED_CLIENT_AND_RQ_WORKER_TUPLES,
     BLACKLISTED_CLIENTS,
@@ -21,7 +28,11 @@ from app.tests.conftest import (
 )
 from app.tests.utils.fixtures import load_fixture
 from app.tests.utils.http import get_headers
-from app.tests.utils.redis import insert_in_hash, register_app_token_job_id
+from app.tests.utils.redis import (
+    get_job_entry,
+    insert_in_hash,
+    register_app_token_job_id,
+)
 
 _PARENT_FOLDER = path.dirname(path.abspath(__file__))
 _JOBS_LIST = load_fixture("job_list.json")
@@ -156,6 +167,255 @@ def test_fetch_all_jobs(redis_client, client):
         assert got == expected
 
 
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_fetch_jobs_paginated(redis_client, client):
+    """Get to /jobs returns a page of jobs and the cursor of the next page"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        got = {}
+        cursor = None
+        page_sizes = []
+        while True:
+            params = {"limit": 5} if cursor is None else {"limit": 5, "cursor": cursor}
+            response = client.get("/jobs", params=params)
+            assert response.status_code == 200
+
+            page = response.json()
+            page_sizes.append(len(page))
+            got.update(page)
+
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        expected = {item[_JOB_ID_FIELD]: item for item in _JOBS_LIST}
+
+        assert got == expected
+        assert page_sizes == [5, 5, 3]
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_fetch_jobs_by_location(redis_client, client):
+    """Get to /jobs?location=... returns only the jobs at that location"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.get("/jobs", params={"location": "REG_W"})
+        got = response.json()
+        expected = {
+            item[_JOB_ID_FIELD]: item
+            for item in _JOBS_LIST
+            if item["status"]["location"] == 1
+        }
+
+        assert response.status_code == 200
+        assert got == expected
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_archive_auth_logs_invalidates_cached_auth_logs(redis_client, client):
+    """The auth logs moved to the archive are announced to the auth caches"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    job_ids = [item[_JOB_ID_FIELD] for item in _JOBS_LIST]
+    for job_id in job_ids:
+        register_app_token_job_id(
+            client=redis_client,
+            hash_name=_AUTH_HASH_NAME,
+            job_id=job_id,
+            app_token=TEST_APP_TOKEN_STRING,
+        )
+    auth_keys = [f"{TEST_APP_TOKEN_STRING}@@@{job_id}" for job_id in job_ids]
+
+    # using context manager to ensure on_startup runs
+    with client:
+        from app.services import auth as auth_service
+        from app.services.auth.cache import AUTH_INVALIDATIONS_CHANNEL
+        from app.services.jobs import service as jobs_service
+
+        pubsub = redis_client.pubsub()
+        pubsub.subscribe(AUTH_INVALIDATIONS_CHANNEL)
+        # the confirmation of the subscription
+        pubsub.get_message(timeout=1)
+        try:
+            jobs_service.archive_jobs(older_than=0)
+            archived_count = auth_service.archive_auth_logs(redis_client)
+            invalidated_keys = []
+            message = pubsub.get_message(timeout=1)
+            while message is not None:
+                invalidated_keys.append(message["data"].decode("utf-8"))
+                message = pubsub.get_message(timeout=1)
+        finally:
+            pubsub.close()
+            jobs_service.remove_jobs(job_ids)
+
+    archived_keys = [
+        key for key in auth_keys if not redis_client.hexists(_AUTH_HASH_NAME, key)
+    ]
+    assert archived_count > 0
+    assert sorted(invalidated_keys) == sorted(archived_keys)
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_fetch_archived_jobs(redis_client, client, app_token_header):
+    """Get to /jobs and /jobs/{job_id} return the jobs moved to the archive as before"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    job_ids = [item[_JOB_ID_FIELD] for item in _JOBS_LIST]
+    for job_id in job_ids:
+        register_app_token_job_id(
+            client=redis_client,
+            hash_name=_AUTH_HASH_NAME,
+            job_id=job_id,
+            app_token=TEST_APP_TOKEN_STRING,
+        )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        from app.services import auth as auth_service
+        from app.services.jobs import service as jobs_service
+
+        try:
+            archived_count = jobs_service.archive_jobs(older_than=0)
+            auth_service.archive_auth_logs(redis_client)
+            remaining_job_ids = [
+                job_id for job_id in job_ids if jobs_service.does_job_exist(job_id)
+            ]
+
+            response = client.get("/jobs")
+            got = response.json()
+            expected = {item[_JOB_ID_FIELD]: item for item in _JOBS_LIST}
+            archived_job = next(
+                item
+                for item in _JOBS_LIST
+                if redis_client.exists(f"job_supervisor:jobs:{item[_JOB_ID_FIELD]}")
+                == 0
+            )
+            job_response = client.get(
+                f"/jobs/{archived_job[_JOB_ID_FIELD]}", headers=app_token_header
+            )
+
+            assert archived_count > 0
+            assert remaining_job_ids == job_ids
+            assert response.status_code == 200
+            assert got == expected
+            assert job_response.status_code == 200
+            assert job_response.json() == {"message": archived_job}
+        finally:
+            jobs_service.remove_jobs(job_ids)
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_archive_jobs_changed_while_archived(redis_client, client, monkeypatch):
+    """Jobs changed while being archived are archived on the next attempt"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    job_ids = [item[_JOB_ID_FIELD] for item in _JOBS_LIST]
+
+    # using context manager to ensure on_startup runs
+    with client:
+        from app.services.jobs import service as jobs_service
+
+        archive = jobs_service._ARCHIVE
+        save_jobs = archive.save_jobs
+        changed_job_ids = []
+
+        def save_and_change_jobs(jobs, result_field):
+            save_jobs(jobs, result_field=result_field)
+            if not changed_job_ids:
+                changed_job_ids.append(jobs[0].job_id)
+                redis_client.hset(
+                    f"job_supervisor:jobs:{jobs[0].job_id}",
+                    "name",
+                    json.dumps("changed"),
+                )
+
+        monkeypatch.setattr(archive, "save_jobs", save_and_change_jobs)
+        try:
+            archived_count = jobs_service.archive_jobs(older_than=0)
+            archived_job_ids = archive.get_archived_job_ids(job_ids)
+            changed_job = jobs_service.fetch_job(changed_job_ids[0])
+        finally:
+            jobs_service.remove_jobs(job_ids)
+
+    assert archived_count > 0
+    assert len(archived_job_ids) == archived_count
+    assert changed_job_ids[0] in archived_job_ids
+    assert changed_job["name"] == "changed"
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_archive_jobs_skips_jobs_always_changed(redis_client, client, monkeypatch):
+    """Jobs changed on every attempt to archive them are left in redis only"""
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    job_ids = [item[_JOB_ID_FIELD] for item in _JOBS_LIST]
+
+    # using context manager to ensure on_startup runs
+    with client:
+        from app.services.jobs import service as jobs_service
+
+        archive = jobs_service._ARCHIVE
+        save_jobs = archive.save_jobs
+        changed_job_ids = []
+
+        def save_and_change_jobs(jobs, result_field):
+            save_jobs(jobs, result_field=result_field)
+            if not changed_job_ids:
+                changed_job_ids.append(jobs[0].job_id)
+            for job in jobs:
+                if job.job_id == changed_job_ids[0]:
+                    redis_client.hset(
+                        f"job_supervisor:jobs:{job.job_id}",
+                        "name",
+                        json.dumps("changed"),
+                    )
+
+        monkeypatch.setattr(archive, "save_jobs", save_and_change_jobs)
+        try:
+            archived_count = jobs_service.archive_jobs(older_than=0, batch_size=1)
+            archived_job_ids = archive.get_archived_job_ids(job_ids)
+            is_changed_job_in_redis = redis_client.exists(
+                f"job_supervisor:jobs:{changed_job_ids[0]}"
+            )
+        finally:
+            jobs_service.remove_jobs(job_ids)
+
+    assert archived_count > 0
+    assert len(archived_job_ids) == archived_count
+    assert changed_job_ids[0] not in archived_job_ids
+    assert is_changed_job_in_redis
+
+
 @pytest.mark.parametrize("client, redis_client", BLACKLISTED_CLIENTS)
 def test_blacklisted_fetch_all_jobs(redis_client, client):
     """Get to /jobs returns 404 and no content"""
@@ -201,6 +461,43 @@ def test_fetch_job(redis_client, client, job_id: str, app_token_header):
         assert got == expected
 
 
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_push_job_events(redis_client, client, app_token_header):
+    """GET to /jobs/{job_id}/events streams the job status on each change then its result"""
+    from app.services.jobs import service as jobs_service
+
+    job_id = "8b32a1d4-1a2d-4ce9-9bb5-7e3c5ba3d0e4"
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        jobs_service.register_job(job_id)
+        finisher = threading.Timer(
+            0.5, jobs_service.save_result, args=(job_id, {"memory": [["0x1"]]})
+        )
+        finisher.start()
+        response = client.get(f"/jobs/{job_id}/events", headers=app_token_header)
+        finisher.join()
+
+    events = [
+        (event.split("\n")[0], json.loads(event.split("\n")[1][len("data: ") :]))
+        for event in response.text.strip().split("\n\n")
+    ]
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert events[0][0] == "event: status"
+    assert events[0][1]["finished"] is None
+    assert events[-2][0] == "event: status"
+    assert events[-2][1]["finished"] == MOCK_NOW.replace("+00:00", "Z")
+    assert events[-1] == ("event: result", {"memory": [["0x1"]]})
+
+
 @pytest.mark.parametrize(
     "client, redis_client, job_id, headers, app_token", _UNAUTHORIZED_FETCH_JOB_PARAMS
 )
@@ -258,9 +555,68 @@ def test_fetch_job_result(redis_client, client, job_id: str, app_token_header):
             expected = {"message": "job has not finished"}
 
         assert response.status_code == 200
+        assert response.headers["vary"] == "Accept"
         assert got == expected
 
 
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_fetch_job_result_as_npy(redis_client, client, app_token_header):
+    """Get to /jobs/{job_id}/result with 'Accept: application/x-npy' returns the memory as a NumPy array"""
+    job_id = "2df4ad77-4a36-4837-b3ce-0b9acd9493eb"
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    headers = {**app_token_header, "Accept": "application/x-npy"}
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.get(f"/jobs/{job_id}/result", headers=headers)
+
+    expected_job = list(filter(lambda x: x["job_id"] == job_id, _JOBS_LIST))[0]
+    expected = [
+        [int(value, 16) for value in experiment]
+        for experiment in expected_job["result"]["memory"]
+    ]
+    got = np.load(io.BytesIO(response.content))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-npy"
+    assert got.tolist() == expected
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+@pytest.mark.parametrize("media_type", ["application/x-npy", "application/x-npz"])
+def test_fetch_unknown_job_result_as_numpy(
+    redis_client, client, media_type, app_token_header
+):
+    """Get to /jobs/{job_id}/result of an unknown job in NumPy formats answers as JSON"""
+    job_id = "9f5de3ad-6d5c-4b5d-8a0f-3c1f7c4b2e11"
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    headers = {**app_token_header, "Accept": media_type}
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.get(f"/jobs/{job_id}/result", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["vary"] == "Accept"
+    assert response.json() == {"message": f"job {job_id} not found"}
+
+
 @pytest.mark.parametrize(
     "client, redis_client, job_id, headers, app_token", _UNAUTHORIZED_FETCH_JOB_PARAMS
 )
@@ -330,6 +686,92 @@ def test_fetch_job_status(redis_client, client, job_id: str, app_token_header):
         assert got == expected
 
 
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_bulk_fetch_job_status(redis_client, client, app_token_header):
+    """POST to /jobs/bulk/status returns the status of each of the jobs the client owns"""
+    from app.services.jobs.service import STR_LOC, Location
+
+    insert_in_hash(
+        client=redis_client,
+        hash_name=_JOBS_HASH_NAME,
+        data=_JOBS_LIST,
+        id_field=_JOB_ID_FIELD,
+    )
+    owned_job_ids = _JOB_IDS[:-1]
+    for job_id in owned_job_ids:
+        register_app_token_job_id(
+            client=redis_client,
+            hash_name=_AUTH_HASH_NAME,
+            job_id=job_id,
+            app_token=TEST_APP_TOKEN_STRING,
+        )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.post(
+            "/jobs/bulk/status", json={"job_ids": _JOB_IDS}, headers=app_token_header
+        )
+        got = response.json()
+
+    expected = {}
+    for job in copy.deepcopy(_JOBS_LIST):
+        job_id = job[_JOB_ID_FIELD]
+        if job_id not in owned_job_ids:
+            expected[job_id] = {
+                "detail": f"job {job_id} does not exist for current user"
+            }
+        else:
+            status = job["status"]
+            status["location"] = STR_LOC[Location(status["location"])]
+            expected[job_id] = {"message": status}
+
+    assert response.status_code == 200
+    assert got == expected
+    assert list(got) == _JOB_IDS
+
+
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_bulk_cancel_jobs(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
+):
+    """POST to /jobs/bulk/cancel cancels the jobs, skipping those not found"""
+    job_id = job[_JOB_ID_FIELD]
+    missing_job_id = "c2f4a1ad-0b0b-4b7e-9d8f-6f0e1cb1c0de"
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=job)
+    for item in (job_id, missing_job_id):
+        register_app_token_job_id(
+            client=redis_client,
+            hash_name=_AUTH_HASH_NAME,
+            job_id=item,
+            app_token=TEST_APP_TOKEN_STRING,
+        )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            client.post("/jobs", files={"upload_file": file}, headers=app_token_header)
+
+        # start the job registration but stop there
+        rq_worker.work(burst=True, max_jobs=1)
+        response = client.post(
+            "/jobs/bulk/cancel",
+            json={"job_ids": [job_id, missing_job_id], "reason": "just testing"},
+            headers=app_token_header,
+        )
+        # run the rest of the tasks
+        rq_worker.work(burst=True)
+
+    job_in_redis = get_job_entry(redis_client, job_id)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        job_id: {"message": "job cancelled"},
+        missing_job_id: {"message": f"job {missing_job_id} not found"},
+    }
+    assert job_in_redis["status"]["cancelled"]["reason"] == "just testing"
+    assert job_in_redis["status"]["finished"] is None
+
+
 @pytest.mark.parametrize(
     "client, redis_client, job_id, headers, app_token", _UNAUTHORIZED_FETCH_JOB_PARAMS
 )
@@ -393,6 +835,7 @@ def test_upload_job(
         expected = {"message": job_id}
         expected_job_in_redis = {
             "id": job_id,
+            "rq_job_id": f"{job_id}_PST_PROC_Q",
             "priorities": {
                 "global": 0,
                 "local": {"pre_processing": 0, "execution": 0, "post_processing": 0},
@@ -418,8 +861,7 @@ def test_upload_job(
         }
 
         rq_worker.work(burst=True)
-        raw_job_in_redis = redis_client.hget(_JOBS_HASH_NAME, job_id)
-        job_in_redis = json.loads(raw_job_in_redis)
+        job_in_redis = get_job_entry(redis_client, job_id)
 
         assert response.status_code == 200
         assert got == expected
@@ -461,7 +903,7 @@ def test_unauthenticated_upload_job(
             )
 
         rq_worker.work(burst=True)
-        raw_job_in_redis = redis_client.hget(_JOBS_HASH_NAME, job_id)
+        raw_job_in_redis = get_job_entry(redis_client, job_id)
         got = response.json()
         detail = (
             "Unauthorized"
@@ -506,6 +948,77 @@ def test_duplicate_job_upload(
     assert second_response.status_code == 409
 
 
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_upload_compressed_job(
+    client, redis_client, rq_worker, job, encoding, app_token_header
+):
+    """POST to '/jobs' with a compressed job file as body uploads a new job"""
+    job_id = job[_JOB_ID_FIELD]
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    body = json.dumps(job).encode("utf-8")
+    if encoding == "gzip":
+        body = gzip.compress(body)
+    else:
+        body = zstandard.ZstdCompressor().compress(body)
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.post(
+            "/jobs",
+            content=body,
+            headers={**app_token_header, "Content-Encoding": encoding},
+        )
+        # run the registration task only
+        rq_worker.work(burst=True, max_jobs=1)
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+    assert response.status_code == 200
+    assert response.json() == {"message": job_id}
+    assert job_in_redis["name"] == job["name"]
+    assert job_in_redis["post_processing"] == job["post_processing"]
+
+
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_upload_compressed_job_too_large(
+    client, redis_client, rq_worker, job, app_token_header, mocker
+):
+    """POST to '/jobs' with a body decompressing beyond JOB_UPLOAD_MAX_BYTES returns 413"""
+    job_id = job[_JOB_ID_FIELD]
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    mocker.patch("settings.JOB_UPLOAD_MAX_BYTES", 4 * 1024)
+    # a body decompressing to ten times the limit
+    body = gzip.compress(json.dumps({**job, "padding": " " * 40 * 1024}).encode())
+    upload_pool = (
+        Path(settings.STORAGE_ROOT)
+        / settings.STORAGE_PREFIX_DIRNAME
+        / settings.JOB_UPLOAD_POOL_DIRNAME
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        response = client.post(
+            "/jobs",
+            content=body,
+            headers={**app_token_header, "Content-Encoding": "gzip"},
+        )
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+    assert response.status_code == 413
+    assert job_in_redis is None
+    assert list(upload_pool.glob("*.part")) == []
+
+
 @pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
 def test_remove_job(
     client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
@@ -535,7 +1048,7 @@ def test_remove_job(
         # run the rest of the tasks
         rq_worker.work(burst=True)
 
-        job_in_redis = redis_client.hget(_JOBS_HASH_NAME, job_id)
+        job_in_redis = get_job_entry(redis_client, job_id)
         assert deletion_response.status_code == 200
         assert job_in_redis is None
 
@@ -587,7 +1100,7 @@ def test_unauthenticated_remove_job(
         )
         expected = {"detail": detail}
 
-        job_in_redis = redis_client.hget(_JOBS_HASH_NAME, job_id)
+        job_in_redis = get_job_entry(redis_client, job_id)
         assert deletion_response.status_code == 401
         assert got == expected
         assert job_in_redis is not None
@@ -630,6 +1143,7 @@ def test_cancel_job(
 
         expected_job_in_redis = {
             "id": job_id,
+            "rq_job_id": f"{job_id}_PRE_PROC_Q",
             "priorities": {
                 "global": 0,
                 "local": {"pre_processing": 0, "execution": 0, "post_processing": 0},
@@ -654,13 +1168,176 @@ def test_cancel_job(
             "is_calibration_supervisor_job": job["is_calibration_supervisor_job"],
         }
 
-        raw_job_in_redis = redis_client.hget(_JOBS_HASH_NAME, job_id)
-        job_in_redis = json.loads(raw_job_in_redis)
+        job_in_redis = get_job_entry(redis_client, job_id)
 
         assert cancellation_response.status_code == 200
         assert job_in_redis == expected_job_in_redis
 
 
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_upload_job_fused_preprocessing(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header, mocker
+):
+    """With FUSED_PREPROCESSING, the registration task enqueues the job for execution"""
+    mocker.patch("settings.FUSED_PREPROCESSING", True)
+    job_id = job[_JOB_ID_FIELD]
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=job)
+    timestamp = MOCK_NOW.replace("+00:00", "Z")
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            response = client.post(
+                "/jobs", files={"upload_file": file}, headers=app_token_header
+            )
+            assert response.status_code == 200
+
+        # run only the registration task
+        rq_worker.work(burst=True, max_jobs=1)
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+        assert job_in_redis["status"]["location"] == 4
+        assert job_in_redis["rq_job_id"] == f"{job_id}_EXEC_Q"
+        assert job_in_redis["timestamps"][_REGISTRATION_STAGE] == {
+            "started": timestamp,
+            "finished": timestamp,
+        }
+        assert job_in_redis["timestamps"][_PRE_PROCESSING_STAGE] == {
+            "started": timestamp,
+            "finished": timestamp,
+        }
+
+
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_upload_malformed_job(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
+):
+    """A job whose qobj cannot be decoded fails in pre-processing, before execution"""
+    job_id = job[_JOB_ID_FIELD]
+    malformed_job = {k: v for k, v in job.items() if k != "params"}
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=malformed_job)
+    timestamp = MOCK_NOW.replace("+00:00", "Z")
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            response = client.post(
+                "/jobs", files={"upload_file": file}, headers=app_token_header
+            )
+            assert response.status_code == 200
+
+        rq_worker.work(burst=True)
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+        assert job_in_redis["status"]["location"] == 3
+        assert job_in_redis["status"]["failed"] == {
+            "time": timestamp,
+            "reason": "malformed job",
+        }
+        assert job_in_redis["timestamps"][_EXECUTION_STAGE] == {
+            "started": None,
+            "finished": None,
+        }
+
+
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_update_job_priorities(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
+):
+    """PUT to '/jobs/{job_id}/priorities' sets the priorities of the given job"""
+    job_id = job[_JOB_ID_FIELD]
+    job = {**job, "priorities": {"global": 2, "local": {"execution": 3}}}
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=job)
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    new_priorities = {"global": 1, "local": {"post_processing": 4}}
+    expected_priorities = {
+        "global": 1,
+        "local": {"pre_processing": 0, "execution": 0, "post_processing": 4},
+    }
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            response = client.post(
+                "/jobs", files={"upload_file": file}, headers=app_token_header
+            )
+            assert response.status_code == 200
+
+        # start the job registration but stop there
+        rq_worker.work(burst=True, max_jobs=1)
+        uploaded_priorities = get_job_entry(redis_client, job_id)["priorities"]
+
+        response = client.put(
+            f"/jobs/{job_id}/priorities", json=new_priorities, headers=app_token_header
+        )
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+        assert uploaded_priorities == {
+            "global": 2,
+            "local": {"pre_processing": 0, "execution": 3, "post_processing": 0},
+        }
+        assert response.status_code == 200
+        assert response.json() == {"message": expected_priorities}
+        assert job_in_redis["priorities"] == expected_priorities
+
+
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_update_job_priorities_before_registration(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
+):
+    """PUT to '/jobs/{job_id}/priorities' on a job in the registration queue sets them"""
+    job_id = job[_JOB_ID_FIELD]
+    job = {**job, "priorities": {"global": 2, "local": {"execution": 3}}}
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=job)
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    new_priorities = {"global": 1, "local": {"post_processing": 4}}
+    expected_priorities = {
+        "global": 1,
+        "local": {"pre_processing": 0, "execution": 0, "post_processing": 4},
+    }
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            response = client.post(
+                "/jobs", files={"upload_file": file}, headers=app_token_header
+            )
+            assert response.status_code == 200
+
+        response = client.put(
+            f"/jobs/{job_id}/priorities", json=new_priorities, headers=app_token_header
+        )
+        # run the job registration only
+        rq_worker.work(burst=True, max_jobs=1)
+        job_in_redis = get_job_entry(redis_client, job_id)
+
+        assert response.status_code == 200
+        assert response.json() == {"message": expected_priorities}
+        assert job_in_redis["priorities"] == expected_priorities
+
+
 @pytest.mark.parametrize(
     "client, redis_client, rq_worker, job, headers, app_token",
     _UNAUTHENTICATED_UPLOAD_JOB_PARAMS,
@@ -713,7 +1390,7 @@ def test_unauthenticated_cancel_job(
         )
         expected = {"detail": detail}
 
-        job_in_redis = json.loads(redis_client.hget(_JOBS_HASH_NAME, job_id))
+        job_in_redis = get_job_entry(redis_client, job_id)
         assert cancellation_response.status_code == 401
         assert got == expected
         assert job_in_redis["status"]["cancelled"] == {"time": None, "reason": None}
@@ -773,6 +1450,75 @@ def test_unauthenticated_download_logfile(
         assert got == expected
 
 
+@pytest.mark.parametrize("client, redis_client, rq_worker, job", _UPLOAD_JOB_PARAMS)
+def test_fetch_stage_analytics(
+    client, redis_client, client_jobs_folder, rq_worker, job, app_token_header
+):
+    """GET to '/analytics/stages' computes the percentiles of the times of each stage"""
+    job_id = job[_JOB_ID_FIELD]
+    job_file_path = _save_job_file(folder=client_jobs_folder, job=job)
+    register_app_token_job_id(
+        client=redis_client,
+        hash_name=_AUTH_HASH_NAME,
+        job_id=job_id,
+        app_token=TEST_APP_TOKEN_STRING,
+    )
+    # the time is frozen so every stage takes no time
+    expected_summary = {"count": 1, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+
+    # using context manager to ensure on_startup runs
+    with client as client:
+        with open(job_file_path, "rb") as file:
+            client.post("/jobs", files={"upload_file": file}, headers=app_token_header)
+        rq_worker.work(burst=True)
+
+        response = client.get("/analytics/stages", params={"window": 60})
+        got = response.json()
+
+        assert response.status_code == 200
+        assert got["finished"] == 1
+        assert got["stages"]["registration"] == {"processing": expected_summary}
+        for stage in ("pre_processing", "execution", "post_processing"):
+            assert got["stages"][stage] == {
+                "queue_wait": expected_summary,
+                "processing": expected_summary,
+            }
+
+
+@pytest.mark.parametrize("client, redis_client", CLIENTS)
+def test_transitions_keep_exact_arrival_time(redis_client, client):
+    """Each transition has the exact epoch nanoseconds of the arrival at the previous location"""
+    job_id = "exact-arrival-job"
+
+    # using context manager to ensure on_startup runs
+    with client:
+        from app.services.jobs import service as jobs_service
+        from app.services.jobs.service import JOB_TRANSITIONS_STREAM_KEY, Location
+
+        try:
+            with freeze_time("2025-03-01T12:00:00.123457Z"):
+                jobs_service.register_job(job_id)
+            with freeze_time("2025-03-01T12:00:01.000001Z"):
+                jobs_service.transition_job(job_id, Location.PRE_PROC_Q)
+            with freeze_time("2025-03-01T12:00:02.654321Z"):
+                jobs_service.transition_job(job_id, Location.PRE_PROC_W)
+            entry = jobs_service.fetch_job(job_id)
+            transitions = [
+                fields
+                for _, fields in redis_client.xrange(JOB_TRANSITIONS_STREAM_KEY)
+                if fields[b"job_id"] == job_id.encode("utf-8")
+            ]
+        finally:
+            jobs_service.remove_jobs([job_id])
+
+    assert [fields.get(b"arrived_ts") for fields in transitions] == [
+        None,
+        b"1740830400123457000",
+        b"1740830401000001000",
+    ]
+    assert "located_ts" not in entry
+
+
 @pytest.mark.parametrize("client, redis_client, rq_worker", CLIENT_AND_RQ_WORKER_TUPLES)
 def test_get_rq_info(client, redis_client, rq_worker):
     """GET to '/rq-info' retrieves information about the running rq workers"""
@@ -803,11 +1549,42 @@ def test_blacklisted_get_rq_info(client, redis_client, rq_worker):
         assert response.content == b""
 
 
+@pytest.mark.parametrize("client, redis_client, rq_worker", CLIENT_AND_RQ_WORKER_TUPLES)
+def test_get_metrics(client, redis_client, rq_worker):
+    """GET to '/metrics' retrieves the queue, worker and stage metrics in Prometheus format"""
+    job_id = "metrics-job"
+    # using context manager to ensure on_startup runs
+    with client as client:
+        from app.services.jobs import service as jobs_service
+
+        rq_worker.register_birth()
+        jobs_service.register_job(job_id)
+        jobs_service.transition_job(job_id, jobs_service.Location.PRE_PROC_Q)
+        jobs_service.transition_job(job_id, jobs_service.Location.PRE_PROC_W)
+
+        response = client.get("/metrics")
+        lines = response.text.splitlines()
+        wait_labels = 'stage="pre_processing"'
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert any(
+            line.startswith("bcc_queue_depth{")
+            and line.endswith('_job_registration"} 0')
+            for line in lines
+        )
+        assert f'bcc_worker_busy{{worker="{rq_worker.name}",' in response.text
+        assert f"bcc_job_queue_wait_seconds_count{{{wait_labels}}} 1" in lines
+        assert 'bcc_job_processing_seconds_count{stage="registration"} 1' in lines
+        assert f"bcc_job_processing_seconds_count{{{wait_labels}}} 0" in lines
+
+
 @pytest.mark.parametrize("client, expected", _BACKEND_PROPERTIES_PARAMS)
 def test_get_backend_properties(client, expected):
     """Get to '/backend_properties' retrieves the current snapshot of the backend properties"""
     # using context manager to ensure on_startup runs
     with client as client:
+        _start_execution_worker()
         response = client.get("/backend_properties")
         got = response.json()
         assert response.status_code == 200
@@ -830,12 +1607,41 @@ def test_get_dynamic_properties_v2(client, expected):
     """Get to '/v2/dynamic-properties' retrieves the calibrated device parameters in version 2 form"""
     # using context manager to ensure on_startup runs
     with client as client:
+        _start_execution_worker()
         response = client.get("/v2/dynamic-properties")
         got = response.json()
         assert response.status_code == 200
         assert _remove_dates(got) == expected
 
 
+@pytest.mark.parametrize("client", FASTAPI_CLIENTS)
+def test_get_dynamic_properties_v2_if_none_match(client):
+    """Get to '/v2/dynamic-properties' returns 304 until the calibration data changes"""
+    # using context manager to ensure on_startup runs
+    with client as client:
+        from app.libs import properties as props_lib
+
+        response = client.get("/v2/dynamic-properties")
+        etag = response.headers["etag"]
+        qubit_id = response.json()["qubits"][0]["id"]
+        assert response.status_code == 200
+
+        response = client.get("/v2/dynamic-properties", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+        props_lib.set_qubit_calibration_data(
+            [{"id": {"value": qubit_id}, "frequency": {"value": 4.2e9, "unit": "Hz"}}]
+        )
+
+        response = client.get("/v2/dynamic-properties", headers={"If-None-Match": etag})
+        got = response.json()
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert got["qubits"][0]["frequency"]["value"] == 4.2e9
+
+
 @pytest.mark.parametrize("client", BLACKLISTED_FASTAPI_CLIENTS)
 def test_blacklisted_get_backend_properties(client):
     """Blacklisted Get to '/backend_properties' returns 404 with no content"""
@@ -910,6 +1716,18 @@ def test_blacklisted_web_config(client, redis_client: redis.Redis):
         assert response.content == b""
 
 
+def _start_execution_worker():
+    """Constructs the executor as the execution worker does on its first job
+
+    Simulators only publish their trained discriminators once their executor
+    has been constructed.
+    """
+    # importing this here so that patching of redis.Redis does not get messed up
+    from app.services.jobs.workers.execution import get_initialized_executor
+
+    get_initialized_executor()
+
+
 def _save_job_file(folder: Path, job: Dict[str, Any], ext: str = ".json") -> Path:
     """Saves the given job to a file and returns the Path
 
@@ -0,0 +1,152 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the disk cache of the compiled schedules"""
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from quantify_scheduler import Schedule
+from quantify_scheduler.operations.gate_library import Measure, X, Y
+
+from app.libs.properties.dtos import BackendConfig
+from app.libs.properties.utils.storage import bump_calibration_version
+from app.libs.quantum_executor.quantify.compiler import (
+    QuantifyCompiler,
+    _get_schedule_fingerprint,
+)
+from app.libs.quantum_executor.utils.cache import DiskCache
+from app.tests.utils.env import (
+    TEST_BACKEND_SETTINGS_FILE,
+    TEST_QUANTIFY_CONFIG_FILE,
+    TEST_QUANTIFY_SEED_FILE,
+)
+
+_BACKEND_CONFIG = BackendConfig.from_toml(
+    TEST_BACKEND_SETTINGS_FILE, seed_file=TEST_QUANTIFY_SEED_FILE
+)
+
+
+def test_disk_cache_hits_and_misses(tmp_path):
+    """DiskCache returns the stored objects and counts the hits and misses"""
+    cache = DiskCache(tmp_path, max_bytes=1024 * 1024)
+    cache.put("foo", {"bar": [1, 2, 3]})
+
+    assert cache.get("foo") == {"bar": [1, 2, 3]}
+    assert cache.get("baz") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # the cache is shared through the directory
+    other_cache = DiskCache(tmp_path, max_bytes=1024 * 1024)
+    assert other_cache.get("foo") == {"bar": [1, 2, 3]}
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """DiskCache deletes the least recently used objects once they exceed max_bytes"""
+    value = b"x" * 1000
+    cache = DiskCache(tmp_path, max_bytes=2500)
+    for idx, key in enumerate(["first", "second"]):
+        cache.put(key, value)
+        os.utime(tmp_path / f"{key}.pickle", (idx, idx))
+
+    # using 'first' makes 'second' the least recently used
+    assert cache.get("first") == value
+    cache.put("third", value)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == value
+    assert cache.get("third") == value
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "first.pickle",
+        "third.pickle",
+    ]
+
+
+def _new_schedule(name: str, gate=X) -> Schedule:
+    """Creates a schedule of a gate followed by a measurement, with random labels"""
+    schedule = Schedule(name)
+    schedule.add(gate("q0"))
+    schedule.add(Measure("q0"))
+    return schedule
+
+
+@pytest.fixture
+def compiler(tmp_path):
+    """A quantify compiler with a cache in a temporary directory"""
+    yield QuantifyCompiler(
+        quantify_config_file=TEST_QUANTIFY_CONFIG_FILE,
+        backend_config=_BACKEND_CONFIG,
+        cache=DiskCache(tmp_path / "cache", max_bytes=1024 * 1024),
+    )
+
+
+def test_schedule_fingerprint_ignores_random_ids():
+    """Equal schedules with different labels and names have the same fingerprint"""
+    schedule = _new_schedule("first")
+    same_schedule = _new_schedule("second")
+    other_schedule = _new_schedule("third", gate=Y)
+
+    assert set(schedule.schedulables) != set(same_schedule.schedulables)
+    assert _get_schedule_fingerprint(schedule) == _get_schedule_fingerprint(
+        same_schedule
+    )
+    assert _get_schedule_fingerprint(schedule) != _get_schedule_fingerprint(
+        other_schedule
+    )
+
+
+def test_cache_key_changes_with_calibration_and_config(
+    real_redis_client, compiler, tmp_path
+):
+    """The cache key of a schedule changes with the calibration and the config"""
+    key = compiler._get_cache_key(_new_schedule("first"))
+    same_key = compiler._get_cache_key(_new_schedule("second"))
+
+    config_file = tmp_path / "quantify-config.json"
+    config_file.write_text(f"{Path(TEST_QUANTIFY_CONFIG_FILE).read_text()}\n")
+    other_compiler = QuantifyCompiler(
+        quantify_config_file=config_file, backend_config=_BACKEND_CONFIG
+    )
+    other_config_key = other_compiler._get_cache_key(_new_schedule("first"))
+
+    bump_calibration_version()
+    new_calibration_key = compiler._get_cache_key(_new_schedule("first"))
+
+    assert key == same_key
+    assert other_config_key != key
+    assert new_calibration_key != key
+
+
+def test_compile_native_uses_cache(real_redis_client, compiler, monkeypatch):
+    """Schedules are compiled only on cache misses, which a calibration causes"""
+    compiled_names = []
+
+    def compile_schedule(schedule):
+        compiled_names.append(schedule.name)
+        return {"name": schedule.name, "compiled": True}
+
+    monkeypatch.setattr(compiler, "_compile_schedule", compile_schedule)
+
+    def compile_native(name: str):
+        experiment = SimpleNamespace(schedule=_new_schedule(name))
+        return compiler._compile_native(experiment, native_config=None)
+
+    first = compile_native("first")
+    second = compile_native("second")
+    bump_calibration_version()
+    third = compile_native("third")
+
+    assert compiled_names == ["first", "third"]
+    assert (compiler.cache.hits, compiler.cache.misses) == (1, 2)
+    assert second == {"name": "second", "compiled": True}
+    assert [first["name"], third["name"]] == ["first", "third"]
@@ -0,0 +1,68 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the compilation of jobs ahead of their execution"""
+import copy
+import uuid
+
+import pytest
+
+from app.libs.properties import get_calibration_version
+from app.libs.properties.utils.storage import bump_calibration_version
+from app.libs.quantum_executor.base.compiler import decode_qobj
+from app.libs.quantum_executor.qiskit.compiler import QiskitDynamicsCompiler
+from app.services.jobs.service import fetch_job, register_job
+from app.services.jobs.workers import compilation
+from app.services.jobs.workers.compilation import compile_qobj, recompile_if_outdated
+from app.services.jobs.workers.preprocessing import preprocess
+from app.tests.utils.fixtures import load_fixture
+
+_SIMULATOR_JOB = load_fixture("jobs_to_upload_simulator.json")[0]
+
+
+@pytest.fixture
+def simulator_compiler(monkeypatch):
+    """Uses the compiler of the simulators as the compiler of this process"""
+    monkeypatch.setattr(compilation, "_COMPILER", QiskitDynamicsCompiler())
+    yield
+
+
+def test_recompiles_when_calibration_changes(real_redis_client, simulator_compiler):
+    """The compiled qobj is compiled again only if the calibration has changed"""
+    qobj = decode_qobj(copy.deepcopy(_SIMULATOR_JOB["params"]["qobj"]))
+
+    compiled_qobj = compile_qobj(qobj)
+    up_to_date_qobj = recompile_if_outdated(compiled_qobj)
+    bump_calibration_version()
+    recompiled_qobj = recompile_if_outdated(compiled_qobj)
+
+    assert up_to_date_qobj is compiled_qobj
+    assert recompiled_qobj is not compiled_qobj
+    assert recompiled_qobj.calibration_version == get_calibration_version()
+    assert recompiled_qobj.calibration_version > compiled_qobj.calibration_version
+    assert [expt.name for expt in recompiled_qobj.experiments] == [
+        expt.name for expt in compiled_qobj.experiments
+    ]
+
+
+@pytest.mark.parametrize("content", ["{not json", '{"params": {"qobj": 42}}'])
+def test_preprocess_fails_malformed_job(real_redis_client, tmp_path, content):
+    """Jobs that cannot be decoded are marked as failed and their file is deleted"""
+    job_id = f"{uuid.uuid4()}"
+    register_job(job_id)
+    job_file = tmp_path / job_id
+    job_file.write_text(content)
+
+    preprocess(job_file, priority=0)
+
+    assert fetch_job(job_id, "status")["failed"]["reason"] == "malformed job"
+    assert not job_file.exists()
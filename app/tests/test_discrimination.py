@@ -0,0 +1,162 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the discrimination of the results of quantum jobs into packed outcomes"""
+from typing import List
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from app.libs.quantum_executor.base.quantum_job import (
+    discriminate_results,
+    outcomes_to_hex,
+)
+from app.libs.quantum_executor.base.quantum_job.dtos import (
+    ByteOrder,
+    MeasLvl,
+    MeasRet,
+    QuantumJob,
+)
+from app.services.jobs.workers.postprocessing.discriminators import (
+    LinearDiscriminator,
+)
+
+_SHOTS = 50
+
+
+def _new_job(channels: List[int], seed: int = 0) -> QuantumJob:
+    """Creates a job with two experiments of random IQ points on the given channels"""
+    rng = np.random.default_rng(seed)
+    raw_results = {}
+    for expt in ("expt_0", "expt_1"):
+        dataset = xr.Dataset()
+        for ch in channels:
+            iq_points = rng.normal(size=(_SHOTS, 1)) + 1j * rng.normal(size=(_SHOTS, 1))
+            dataset[f"{ch}"] = (["repetition", f"acq_index_{ch}"], iq_points)
+        raw_results[expt] = dataset
+
+    return QuantumJob(
+        tuid="test",
+        meas_return=MeasRet.APPENDED,
+        meas_level=MeasLvl.DISCRIMINATED,
+        meas_return_cols=1,
+        raw_results=raw_results,
+    )
+
+
+def _new_linear_discriminator(no_of_channels: int, seed: int = 1):
+    """Creates random linear discriminators for the given number of channels"""
+    rng = np.random.default_rng(seed)
+    return LinearDiscriminator(
+        version=0,
+        coefficients=rng.normal(size=(no_of_channels, 2)),
+        intercepts=rng.normal(size=no_of_channels),
+        rows={idx: idx for idx in range(no_of_channels)},
+    )
+
+
+def _expected_hex(
+    job: QuantumJob, discriminator, base: int, byteorder: ByteOrder
+) -> List[List[str]]:
+    """Computes the hex outcomes of the job one shot at a time with python integers"""
+    expected = []
+    for dataset in job.raw_results.values():
+        channels = [int(ch) for ch in dataset.keys()]
+        width = max(channels) + 1
+        states = {ch: discriminator(ch, dataset[f"{ch}"].data[:, 0]) for ch in channels}
+        outcomes = []
+        for shot in range(_SHOTS):
+            value = 0
+            for ch in channels:
+                slot = ch if byteorder == ByteOrder.LITTLE_ENDIAN else width - 1 - ch
+                value += int(states[ch][shot]) * base**slot
+            outcomes.append(hex(value))
+        expected.append(outcomes)
+    return expected
+
+
+@pytest.mark.parametrize("byteorder", [ByteOrder.LITTLE_ENDIAN, ByteOrder.BIG_ENDIAN])
+@pytest.mark.parametrize("channels", [[0], [0, 1, 2], [3, 0, 5], list(range(20))])
+def test_discriminate_results(channels, byteorder):
+    """All the channels are discriminated at once and packed in uint64 per shot"""
+    job = _new_job(channels)
+    discriminator = _new_linear_discriminator(max(channels) + 1)
+    expected = _expected_hex(job, discriminator, base=2, byteorder=byteorder)
+
+    memory = discriminate_results(job, discriminator=discriminator, byteorder=byteorder)
+
+    assert [outcomes.dtype for outcomes in memory] == [np.uint64] * 2
+    assert [outcomes.shape for outcomes in memory] == [(_SHOTS,)] * 2
+    assert [outcomes_to_hex(outcomes) for outcomes in memory] == expected
+
+
+def test_discriminate_results_per_channel():
+    """Discriminators without `discriminate_channels` are called on each channel"""
+    channels = [0, 2, 3]
+    job = _new_job(channels)
+    linear_discriminator = _new_linear_discriminator(4)
+    calls = []
+
+    def discriminator(idx, iq_points):
+        calls.append(idx)
+        return linear_discriminator(idx, iq_points)
+
+    memory = discriminate_results(job, discriminator=discriminator)
+    batched_memory = discriminate_results(job, discriminator=linear_discriminator)
+
+    assert calls == channels * 2
+    for outcomes, batched_outcomes in zip(memory, batched_memory):
+        np.testing.assert_array_equal(outcomes, batched_outcomes)
+
+
+@pytest.mark.parametrize("byteorder", [ByteOrder.LITTLE_ENDIAN, ByteOrder.BIG_ENDIAN])
+def test_discriminate_results_three_states(byteorder):
+    """Outcomes of three-state discriminators are packed in base 3"""
+    channels = [0, 1, 4]
+    job = _new_job(channels)
+
+    def discriminator(idx, iq_points):
+        return (np.angle(iq_points) // (2 * np.pi / 3)).astype(int) % 3
+
+    expected = _expected_hex(job, discriminator, base=3, byteorder=byteorder)
+
+    memory = discriminate_results(
+        job, discriminator=discriminator, num_of_states=3, byteorder=byteorder
+    )
+
+    assert [outcomes_to_hex(outcomes) for outcomes in memory] == expected
+
+
+@pytest.mark.parametrize("byteorder", [ByteOrder.LITTLE_ENDIAN, ByteOrder.BIG_ENDIAN])
+def test_discriminate_results_wider_than_64_bits(byteorder):
+    """Registers wider than 64 bits are packed in several words of 64 bits"""
+    channels = list(range(0, 130, 3))
+    job = _new_job(channels)
+    discriminator = _new_linear_discriminator(max(channels) + 1)
+    expected = _expected_hex(job, discriminator, base=2, byteorder=byteorder)
+
+    memory = discriminate_results(job, discriminator=discriminator, byteorder=byteorder)
+
+    assert [outcomes.shape for outcomes in memory] == [(_SHOTS, 3)] * 2
+    assert [outcomes_to_hex(outcomes) for outcomes in memory] == expected
+
+
+def test_discriminate_results_three_states_too_wide():
+    """Registers of non-binary states must fit in 64 bits"""
+    job = _new_job([0, 40])
+
+    def discriminator(idx, iq_points):
+        return np.zeros(len(iq_points), dtype=int)
+
+    with pytest.raises(ValueError):
+        discriminate_results(job, discriminator=discriminator, num_of_states=3)
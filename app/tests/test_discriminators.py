@@ -0,0 +1,103 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the cache of the discriminators used in postprocessing"""
+import numpy as np
+import pytest
+
+from app.libs.properties import set_discriminator_data
+from app.libs.properties.dtos import BackendConfig
+from app.services.jobs.workers.postprocessing import discriminators
+from app.services.jobs.workers.postprocessing.discriminators import (
+    get_linear_discriminator,
+)
+from app.tests.utils.env import (
+    TEST_QISKIT_2Q_SEED_FILE,
+    TEST_SIMQ2_BACKEND_SETTINGS_FILE,
+)
+
+_BACKEND_CONFIG = BackendConfig.from_toml(
+    TEST_SIMQ2_BACKEND_SETTINGS_FILE, seed_file=TEST_QISKIT_2Q_SEED_FILE
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Empties the in-process cache of the discriminators"""
+    monkeypatch.setattr(discriminators, "_CACHED", None)
+    yield
+
+
+def _set_lda(qubit_id: str, coef_0: float, coef_1: float, intercept: float):
+    """Sets the lda discriminator of the given qubit in the store"""
+    params = {"coef_0": coef_0, "coef_1": coef_1, "intercept": intercept}
+    set_discriminator_data(
+        {qubit_id: {k: {"value": v, "unit": ""} for k, v in params.items()}}
+    )
+
+
+def test_reads_discriminators_from_store(real_redis_client):
+    """get_linear_discriminator builds the coefficient matrix from the local store"""
+    _set_lda("q0", coef_0=1.0, coef_1=2.0, intercept=-1.0)
+    _set_lda("q1", coef_0=-1.0, coef_1=0.5, intercept=0.25)
+
+    discriminator = get_linear_discriminator(_BACKEND_CONFIG)
+
+    np.testing.assert_array_equal(
+        discriminator.coefficients, np.array([[1.0, 2.0], [-1.0, 0.5]])
+    )
+    np.testing.assert_array_equal(discriminator.intercepts, np.array([-1.0, 0.25]))
+    iq_points = np.array([1 + 1j, 0 + 0j, -1 + 0j])
+    assert discriminator(0, iq_points).tolist() == [1, 0, 0]
+    assert discriminator(1, iq_points).tolist() == [0, 1, 1]
+
+
+def test_caches_discriminators_per_calibration_version(real_redis_client):
+    """get_linear_discriminator rereads the store only when the calibration changes"""
+    _set_lda("q0", coef_0=1.0, coef_1=2.0, intercept=-1.0)
+    _set_lda("q1", coef_0=-1.0, coef_1=0.5, intercept=0.25)
+
+    discriminator = get_linear_discriminator(_BACKEND_CONFIG)
+    assert get_linear_discriminator(_BACKEND_CONFIG) is discriminator
+
+    _set_lda("q1", coef_0=3.0, coef_1=4.0, intercept=5.0)
+    new_discriminator = get_linear_discriminator(_BACKEND_CONFIG)
+
+    assert new_discriminator is not discriminator
+    assert new_discriminator.version > discriminator.version
+    np.testing.assert_array_equal(new_discriminator.coefficients[1], [3.0, 4.0])
+
+
+def test_missing_discriminator(real_redis_client):
+    """The qubits without a discriminator in the store cannot be discriminated"""
+    _set_lda("q0", coef_0=1.0, coef_1=2.0, intercept=-1.0)
+
+    discriminator = get_linear_discriminator(_BACKEND_CONFIG)
+
+    assert discriminator(0, np.array([1 + 1j])).tolist() == [1]
+    with pytest.raises(KeyError):
+        discriminator(1, np.array([1 + 1j]))
+
+
+def test_discriminate_channels(real_redis_client):
+    """discriminate_channels discriminates several channels as the per-channel call"""
+    _set_lda("q0", coef_0=1.0, coef_1=2.0, intercept=-1.0)
+    _set_lda("q1", coef_0=-1.0, coef_1=0.5, intercept=0.25)
+
+    discriminator = get_linear_discriminator(_BACKEND_CONFIG)
+    iq_points = np.array([[1 + 1j, 0 + 0j, -1 + 0j], [1 + 1j, 0 + 0j, -1 + 0j]])
+
+    states = discriminator.discriminate_channels([1, 0], iq_points)
+
+    assert states.astype(int).tolist() == [[0, 1, 1], [1, 0, 0]]
+    with pytest.raises(KeyError):
+        discriminator.discriminate_channels([0, 2], iq_points)
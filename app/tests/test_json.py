@@ -0,0 +1,69 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests for the JSON utilities"""
+import json
+
+import pytest
+
+from app.utils.json import JsonItemsScanner, get_items_from_json
+
+_DOCUMENT = {
+    "params": {
+        "qobj": {"samples": [[0.1, -0.2], [0.3, 0.4]], "tricky": '"}]{[\\'},
+        "job_id": "nested",
+    },
+    "job_id": 'abc"d',
+    "name": {"value": [1, [2, {}]]},
+    "post_processing": None,
+    "flags": [True, False],
+    "other": 1,
+}
+_KEYS = ["job_id", "name", "post_processing", "flags", "missing"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1000])
+def test_scanner_extracts_top_level_items(chunk_size):
+    """Only the top-level values of the keys are extracted, whatever the chunk size"""
+    raw = json.dumps(_DOCUMENT).encode("utf-8")
+    scanner = JsonItemsScanner(_KEYS)
+
+    for idx in range(0, len(raw), chunk_size):
+        scanner.feed(raw[idx : idx + chunk_size])
+
+    assert scanner.is_done
+    assert scanner.items == {
+        "job_id": 'abc"d',
+        "name": {"value": [1, [2, {}]]},
+        "post_processing": None,
+        "flags": [True, False],
+    }
+
+
+def test_scanner_stops_when_all_keys_found():
+    """The rest of the document is ignored once all the keys are found"""
+    scanner = JsonItemsScanner(["job_id"])
+
+    scanner.feed(b'{"job_id": "1", "params": {"qobj": ')
+    scanner.feed(b"not json at all")
+
+    assert scanner.is_done
+    assert scanner.items == {"job_id": "1"}
+
+
+def test_get_items_from_json(tmp_path):
+    """The items of the given keys are read from the JSON file"""
+    file_path = tmp_path / "job.json"
+    file_path.write_text(json.dumps(_DOCUMENT))
+
+    got = get_items_from_json(file_path, ["post_processing", "job_id", "missing"])
+    assert got == {"post_processing": None, "job_id": 'abc"d'}
@@ -0,0 +1,105 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests for the buffered log writer"""
+import multiprocessing
+import time
+
+from app.utils.logs import BufferedLogWriter
+
+
+def test_write_is_buffered(tmp_path):
+    """Lines are only written to the file when flushed"""
+    path = tmp_path / "test.log"
+    writer = BufferedLogWriter(path, max_batch_size=100, flush_interval=60)
+
+    writer.write("first\n")
+    writer.write("second\n")
+    assert not path.exists()
+
+    writer.flush()
+    assert path.read_text() == "first\nsecond\n"
+
+
+def test_full_batch_is_flushed(tmp_path):
+    """A full batch is written to the file by the background thread"""
+    path = tmp_path / "test.log"
+    writer = BufferedLogWriter(path, max_batch_size=3, flush_interval=60)
+
+    for idx in range(3):
+        writer.write(f"line {idx}\n")
+
+    _wait_for(lambda: path.exists() and len(path.read_text().splitlines()) == 3)
+    assert path.read_text() == "line 0\nline 1\nline 2\n"
+
+
+def test_flush_interval(tmp_path):
+    """Lines are written to the file after the flush interval"""
+    path = tmp_path / "test.log"
+    writer = BufferedLogWriter(path, max_batch_size=100, flush_interval=0.05)
+
+    writer.write("line\n")
+
+    _wait_for(lambda: path.exists())
+    assert path.read_text() == "line\n"
+
+
+def test_rotation(tmp_path):
+    """The file is rotated when it would exceed max_bytes"""
+    path = tmp_path / "test.log"
+    writer = BufferedLogWriter(
+        path, max_batch_size=100, flush_interval=60, max_bytes=10, backup_count=2
+    )
+
+    for idx in range(4):
+        writer.write(f"batch {idx}\n")
+        writer.flush()
+
+    assert path.read_text() == "batch 3\n"
+    assert (tmp_path / "test.log.1").read_text() == "batch 2\n"
+    assert (tmp_path / "test.log.2").read_text() == "batch 1\n"
+    assert not (tmp_path / "test.log.3").exists()
+
+
+def test_several_processes(tmp_path):
+    """Several processes can append to the same file without interleaving lines"""
+    path = tmp_path / "test.log"
+    processes = [
+        multiprocessing.Process(target=_write_lines, args=(path, f"p{idx}", 500))
+        for idx in range(4)
+    ]
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2000
+    for idx in range(4):
+        own_lines = [line for line in lines if line.startswith(f"p{idx} ")]
+        assert own_lines == [f"p{idx} {count:04d}" for count in range(500)]
+
+
+def _write_lines(path, prefix: str, count: int):
+    """Writes the given number of lines to the log file at the path"""
+    writer = BufferedLogWriter(path, max_batch_size=7, flush_interval=0.01)
+    for idx in range(count):
+        writer.write(f"{prefix} {idx:04d}\n")
+    writer.flush()
+
+
+def _wait_for(condition, timeout: float = 5):
+    """Waits until the condition is true or the timeout elapses"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
@@ -0,0 +1,245 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the execution worker, long-lived or not"""
+import copy
+import functools
+import os
+import sys
+import uuid
+
+import pytest
+from fakeredis import FakeStrictRedis
+from rq import Queue, Worker
+
+from app.libs.properties import get_calibration_version, initialize_backend
+from app.libs.properties.dtos import BackendConfig
+from app.libs.quantum_executor.base.compiler import decode_qobj, save_compiled_qobj
+from app.libs.quantum_executor.base.exc import JobCancelledError
+from app.libs.quantum_executor.qiskit.compiler import QiskitDynamicsCompiler
+from app.libs.quantum_executor.qiskit.executor import QiskitDynamicsExecutor
+from app.services.jobs.service import register_job
+from app.services.jobs.workers import compilation
+from app.services.jobs.workers.execution import (
+    long_lived,
+    reset_executor,
+    utils,
+    worker,
+)
+from app.services.jobs.workers.execution.long_lived import LongLivedWorker
+from app.tests.utils.env import (
+    TEST_QISKIT_1Q_SEED_FILE,
+    TEST_SIMQ1_BACKEND_SETTINGS_FILE,
+)
+from app.tests.utils.fixtures import load_fixture
+
+_SIMULATOR_JOB = load_fixture("jobs_to_upload_simulator.json")[0]
+_SIMQ1_BACKEND_CONFIG = BackendConfig.from_toml(
+    TEST_SIMQ1_BACKEND_SETTINGS_FILE, seed_file=TEST_QISKIT_1Q_SEED_FILE
+)
+# the modules of the job functions and of the objects they pickle, as imported here
+_APP_MODULES = {
+    name: module for name, module in sys.modules.items() if name.startswith("app.")
+}
+
+
+class _FakeExecutor:
+    """An executor that counts its constructions"""
+
+    constructions = 0
+
+    def __init__(self, is_healthy: bool = True, **kwargs):
+        _FakeExecutor.constructions += 1
+        self.healthy = is_healthy
+        self.closed = False
+        self.kwargs = kwargs
+
+    def is_healthy(self) -> bool:
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+
+def _get_executor_pid() -> int:
+    """Returns the id of the process running the job, constructing the executor"""
+    worker.get_initialized_executor()
+    return os.getpid()
+
+
+@pytest.fixture(autouse=True)
+def collected_modules(monkeypatch):
+    """Has rq import the job functions from the modules of these tests
+
+    and not from those imported again after other tests removed them
+    """
+    for name, module in _APP_MODULES.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    yield
+
+
+@pytest.fixture
+def fake_executor(monkeypatch):
+    """Constructs a _FakeExecutor as the executor of the execution worker"""
+    _FakeExecutor.constructions = 0
+    reset_executor()
+    monkeypatch.setattr(worker, "get_executor", _FakeExecutor)
+    monkeypatch.setattr(worker, "_KEEPS_EXECUTOR", False)
+    yield
+    reset_executor()
+
+
+@pytest.fixture
+def queue():
+    """The queue of the long-lived worker"""
+    yield Queue("test_execution", connection=FakeStrictRedis())
+
+
+def test_keeps_executor_between_jobs(fake_executor, queue):
+    """LongLivedWorker runs the jobs in its process with the executor it warmed up"""
+    jobs = [queue.enqueue(_get_executor_pid) for _ in range(3)]
+
+    rq_worker = LongLivedWorker([queue], connection=queue.connection)
+    rq_worker.work(burst=True)
+
+    assert [job.result for job in jobs] == [os.getpid()] * 3
+    assert _FakeExecutor.constructions == 1
+    assert worker.get_initialized_executor().kwargs == {}
+
+
+def test_replaces_unhealthy_executor(fake_executor, queue):
+    """LongLivedWorker constructs a new executor when the current one is unhealthy"""
+    queue.enqueue(_get_executor_pid)
+
+    rq_worker = LongLivedWorker([queue], connection=queue.connection)
+    rq_worker.warm_up()
+    unhealthy_executor = worker.get_initialized_executor()
+    unhealthy_executor.healthy = False
+    rq_worker.work(burst=True)
+
+    assert unhealthy_executor.closed
+    assert worker.get_initialized_executor() is not unhealthy_executor
+    assert _FakeExecutor.constructions == 2
+
+
+def test_stops_on_memory_growth(fake_executor, queue, monkeypatch):
+    """LongLivedWorker stops once its memory has grown beyond the limit"""
+    memory_readings = iter(range(0, 1000, 100))
+    monkeypatch.setattr(
+        long_lived, "get_resident_memory", lambda: next(memory_readings)
+    )
+    jobs = [queue.enqueue(_get_executor_pid) for _ in range(3)]
+
+    rq_worker = LongLivedWorker(
+        [queue], connection=queue.connection, max_memory_growth=150
+    )
+    rq_worker.work(burst=True)
+
+    assert [job.get_status() for job in jobs] == ["finished", "finished", "queued"]
+
+
+def test_removes_compiled_job_when_cancelled(real_redis_client, tmp_path, monkeypatch):
+    """job_execute deletes the compiled job even when its execution is cancelled"""
+
+    class _CancellingExecutor:
+        def run_compiled(self, *args, **kwargs):
+            raise JobCancelledError("cancelled")
+
+    job_id = f"{uuid.uuid4()}"
+    register_job(job_id)
+    job_file = tmp_path / job_id
+    job_file.write_bytes(b"compiled job")
+    monkeypatch.setattr(worker, "load_compiled_qobj", lambda path: object())
+    monkeypatch.setattr(worker, "recompile_if_outdated", lambda qobj: qobj)
+    monkeypatch.setattr(worker, "get_initialized_executor", _CancellingExecutor)
+
+    assert worker.job_execute(job_file) == {"message": "cancelled"}
+    assert not job_file.exists()
+
+
+def test_closes_executor_after_each_job(
+    real_redis_client, fake_executor, tmp_path, monkeypatch
+):
+    """Outside the long-lived worker, the executor of each job is closed after it
+
+    and it simulates in a single process, since its pool would not be reused
+    """
+    executors = []
+
+    class _CancellingExecutor(_FakeExecutor):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            executors.append(self)
+
+        def run_compiled(self, *args, **kwargs):
+            raise JobCancelledError("cancelled")
+
+    monkeypatch.setattr(worker, "get_executor", _CancellingExecutor)
+    monkeypatch.setattr(worker, "load_compiled_qobj", lambda path: object())
+    monkeypatch.setattr(worker, "recompile_if_outdated", lambda qobj: qobj)
+
+    for _ in range(2):
+        job_id = f"{uuid.uuid4()}"
+        register_job(job_id)
+        job_file = tmp_path / job_id
+        job_file.write_bytes(b"compiled job")
+        worker.job_execute(job_file)
+
+    assert [executor.closed for executor in executors] == [True, True]
+    assert [executor.kwargs for executor in executors] == [
+        {"simulator_pool_size": 1}
+    ] * 2
+
+
+def test_forking_worker_does_not_recompile(real_redis_client, tmp_path, monkeypatch):
+    """The executor constructed for each job leaves the calibration as it is
+
+    so the jobs compiled before they were queued are run without recompilation
+    """
+
+    def _fail_recompilation(self, compiled_qobj):
+        raise AssertionError("recompiled")
+
+    monkeypatch.setattr(utils, "get_backend_config", lambda: _SIMQ1_BACKEND_CONFIG)
+    monkeypatch.setattr(
+        worker,
+        "get_executor",
+        functools.partial(
+            utils.get_executor, executor_type="qiskit_pulse_1q", is_standalone=True
+        ),
+    )
+    monkeypatch.setattr(worker, "_KEEPS_EXECUTOR", False)
+    monkeypatch.setattr(compilation, "_COMPILER", QiskitDynamicsCompiler())
+    monkeypatch.setattr(QiskitDynamicsCompiler, "recompile", _fail_recompilation)
+    monkeypatch.setattr(QiskitDynamicsExecutor, "run_compiled", lambda *_, **__: None)
+    # as on the startup of the API, then the discriminators are trained on first use
+    initialize_backend(
+        _SIMQ1_BACKEND_CONFIG, mss_client=None, mss_url="", is_standalone=True
+    )
+    worker.get_initialized_executor()
+    reset_executor()
+
+    calibration_version = get_calibration_version()
+    queue = Queue("test_execution", connection=real_redis_client)
+    jobs = []
+    for _ in range(2):
+        job_id = f"{uuid.uuid4()}"
+        register_job(job_id)
+        job_file = tmp_path / job_id
+        qobj = decode_qobj(copy.deepcopy(_SIMULATOR_JOB["params"]["qobj"]))
+        save_compiled_qobj(compilation.compile_qobj(qobj), job_file)
+        jobs.append(queue.enqueue(worker.job_execute, job_file))
+
+    Worker([queue], connection=real_redis_client).work(burst=True)
+
+    assert [job.return_value() for job in jobs] == [{"message": "ok"}] * 2
+    assert get_calibration_version() == calibration_version
@@ -0,0 +1,59 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests of the priority queues"""
+from app.utils.queues import PRIORITY_META_KEY, PriorityQueue
+
+
+def _task():
+    """A task that is never run"""
+
+
+def test_dispatches_jobs_by_priority(real_redis_client):
+    """Jobs of higher priority are placed ahead, and at_front ahead of all"""
+    queue = PriorityQueue(
+        "test_priorities", connection=real_redis_client, aging_interval=60.0
+    )
+
+    queue.enqueue_with_priority(0, _task, job_id="low")
+    queue.enqueue_with_priority(2, _task, job_id="high")
+    queue.enqueue_with_priority(1, _task, job_id="middle")
+    queue.enqueue_with_priority(0, _task, job_id="urgent", at_front=True)
+    queue.enqueue(_task, job_id="unprioritized")
+
+    assert queue.job_ids == ["urgent", "high", "middle", "low", "unprioritized"]
+    assert queue.fetch_job("high").meta[PRIORITY_META_KEY] == 2
+
+
+def test_raises_priority_of_queued_job(real_redis_client):
+    """A queued job whose priority is raised moves ahead of the jobs it now exceeds"""
+    queue = PriorityQueue(
+        "test_priorities", connection=real_redis_client, aging_interval=60.0
+    )
+    for job_id in ("first", "second", "third"):
+        queue.enqueue_with_priority(0, _task, job_id=job_id)
+
+    is_queued = queue.set_priority("third", 1)
+
+    assert is_queued
+    assert queue.job_ids == ["third", "first", "second"]
+
+
+def test_ignores_priorities_without_aging_interval(real_redis_client):
+    """Queues without an aging interval are first come first served"""
+    queue = PriorityQueue("test_priorities", connection=real_redis_client)
+
+    queue.enqueue_with_priority(0, _task, job_id="low")
+    queue.enqueue_with_priority(2, _task, job_id="high")
+
+    assert queue.job_ids == ["low", "high"]
+    assert not queue.set_priority("low", 3)
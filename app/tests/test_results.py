@@ -0,0 +1,71 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests for the compact encoding of job results"""
+import io
+
+import numpy as np
+import pytest
+
+from app.services.jobs.results import (
+    get_memory_arrays,
+    is_packed,
+    pack_result,
+    to_npy,
+    to_npz,
+    unpack_result,
+)
+
+
+@pytest.mark.parametrize("max_value, itemsize", [(3, 1), (300, 2), (2**40, 8)])
+def test_pack_result(max_value, itemsize):
+    """The memory is packed in the smallest unsigned dtype and unpacked as hex strings"""
+    result = {
+        "memory": [[hex(value) for value in (0, max_value, 1)], ["0x2"]],
+        "extra": "item",
+    }
+
+    packed = pack_result(result)
+
+    assert is_packed(packed)
+    assert unpack_result(packed) == result
+    assert [array.dtype.itemsize for array in get_memory_arrays(packed)] == [
+        itemsize
+    ] * 2
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        {"memory": [["0X1"]]},
+        {"memory": [["0x01"]]},
+        {"memory": [[hex(2**64)]]},
+        {"memory": None},
+        {},
+    ],
+)
+def test_unpackable_result(result):
+    """Results whose memory cannot be restored exactly are not packed"""
+    assert pack_result(result) is None
+
+
+def test_binary_formats():
+    """The memory is encoded as .npy and .npz files"""
+    arrays = get_memory_arrays({"memory": [["0x1", "0x2"], ["0x3", "0x0"]]})
+
+    npy = np.load(io.BytesIO(to_npy(arrays)))
+    npz = np.load(io.BytesIO(to_npz(arrays[:1])))
+
+    assert npy.tolist() == [[1, 2], [3, 0]]
+    assert npz["experiment_0"].tolist() == [1, 2]
+    with pytest.raises(ValueError):
+        to_npy([arrays[0], arrays[1][:1]])
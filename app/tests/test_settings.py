@@ -3,6 +3,7 @@ import os
 
 import pytest
 import requests
+from fastapi.testclient import TestClient
 from pydantic import ValidationError
 
 from app.libs.quantum_executor.utils.config import (
@@ -69,19 +70,22 @@ def test_redis_connection(real_redis_client):
 
 
 def test_no_mss_connected():
-    """Raises connection errors only when MSS is unavailable and is not standalone"""
+    """Raises connection errors on startup only when MSS is unavailable and is not standalone"""
     remove_modules(["os", "app", "settings"])
 
     os.environ["EXECUTOR_TYPE"] = "quantify"
     os.environ["BACKEND_SETTINGS"] = TEST_BACKEND_SETTINGS_FILE
     os.environ["IS_STANDALONE"] = "False"
 
+    from app.api import app
+
     with pytest.raises(requests.exceptions.ConnectionError):
-        from app.api import app
+        with TestClient(app):
+            pass
 
 
 def test_calibration_seed_required_for_simulator():
-    """Raises validation errors if calibration seed is not set for simulator."""
+    """Raises validation errors on startup if calibration seed is not set for simulator."""
     remove_modules(["os", "app", "settings"])
 
     os.environ["EXECUTOR_TYPE"] = "qiskit_pulse_1q"
@@ -89,14 +93,17 @@ def test_calibration_seed_required_for_simulator():
     os.environ["BACKEND_SETTINGS"] = TEST_SIMQ1_BACKEND_SETTINGS_FILE
     os.environ["CALIBRATION_SEED"] = get_fixture_path("non-existent.toml")
 
+    from app.api import app
+
     with pytest.raises(
         ValidationError, match="Calibration config is required for simulators."
     ):
-        from app.api import app
+        with TestClient(app):
+            pass
 
 
 def test_calibration_seed_broken_for_simulator():
-    """Raises validation errors if calibration seed provided is broken for simulator only."""
+    """Raises validation errors on startup if calibration seed provided is broken for simulator only."""
     remove_modules(["os", "app", "settings"])
 
     os.environ["EXECUTOR_TYPE"] = "qiskit_pulse_1q"
@@ -104,14 +111,17 @@ def test_calibration_seed_broken_for_simulator():
     os.environ["BACKEND_SETTINGS"] = TEST_SIMQ1_BACKEND_SETTINGS_FILE
     os.environ["CALIBRATION_SEED"] = get_fixture_path("broken.seed.toml")
 
+    from app.api import app
+
     with pytest.raises(
         ValidationError, match="Calibration config is required for simulators."
     ):
-        from app.api import app
+        with TestClient(app):
+            pass
 
 
 def test_quantify_metadata_is_broken():
-    """Raises validation errors if quantify metadata conf file is broken"""
+    """Raises validation errors on construction of the executor if quantify metadata is broken"""
     remove_modules(["os", "app", "settings"])
 
     os.environ["EXECUTOR_TYPE"] = "quantify"
@@ -120,12 +130,14 @@ def test_quantify_metadata_is_broken():
     os.environ["QUANTIFY_CONFIG_FILE"] = TEST_QUANTIFY_CONFIG_FILE
     os.environ["QUANTIFY_METADATA_FILE"] = TEST_BROKEN_QUANTIFY_METADATA_FILE
 
+    from app.services.jobs.workers.execution import get_initialized_executor
+
     with pytest.raises(ValidationError):
-        from app.api import app
+        get_initialized_executor()
 
 
 def test_quantify_config_is_broken():
-    """Raises validation errors if quantify config file is broken"""
+    """Raises validation errors on construction of the executor if quantify config is broken"""
     remove_modules(["os", "app", "settings"])
 
     os.environ["EXECUTOR_TYPE"] = "quantify"
@@ -134,5 +146,7 @@ def test_quantify_config_is_broken():
     os.environ["QUANTIFY_CONFIG_FILE"] = TEST_BROKEN_QUANTIFY_CONFIG_FILE
     os.environ["QUANTIFY_METADATA_FILE"] = TEST_QUANTIFY_METADATA_FILE
 
+    from app.services.jobs.workers.execution import get_initialized_executor
+
     with pytest.raises(ValidationError):
-        from app.api import app
+        get_initialized_executor()
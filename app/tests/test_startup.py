@@ -0,0 +1,78 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Tests on the cost of starting up the different BCC processes"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+_ROOT_DIR = Path(__file__).parent.parent.parent
+_HEAVY_MODULES = [
+    "qiskit",
+    "qiskit_dynamics",
+    "qiskit_ibm_provider",
+    "quantify_core",
+    "quantify_scheduler",
+    "qblox_instruments",
+    "jax",
+    "sklearn",
+]
+_LIGHT_PROCESS_MODULES = [
+    "app.api",
+    "app.services.jobs.workers.registration",
+    "app.services.jobs.workers.preprocessing",
+]
+
+
+@pytest.mark.parametrize("module", _LIGHT_PROCESS_MODULES)
+def test_light_processes_do_not_import_heavy_modules(module):
+    """Importing the API, registration or preprocessing does not import the executor's libraries"""
+    report = _import_in_fresh_interpreter(module)
+
+    assert (
+        report["heavy_modules"] == []
+    ), f"importing {module} took {report['elapsed']:.3f}s"
+
+
+def _import_in_fresh_interpreter(module: str) -> dict:
+    """Imports the given module in a new python interpreter and reports on it
+
+    A fresh interpreter is used because the test session has already imported
+    most of the heavy modules.
+
+    Args:
+        module: the dotted path of the module to import
+
+    Returns:
+        dict with the 'elapsed' seconds of the import and the 'heavy_modules' it imported
+    """
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {_HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy_modules': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=_ROOT_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
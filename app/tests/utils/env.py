@@ -83,6 +83,8 @@ def setup_test_env():
     environ["MSS_APP_TOKEN"] = TEST_MSS_APP_TOKEN
     environ["QUANTIFY_CONFIG_FILE"] = TEST_QUANTIFY_CONFIG_FILE
     environ["IS_AUTH_ENABLED"] = "True"
+    # the simulators run the experiments of a job one after the other
+    environ["SIMULATOR_POOL_SIZE"] = "1"
 
     environ["REDIS_HOST"] = TEST_REDIS_HOST
     environ["REDIS_PORT"] = f"{TEST_REDIS_PORT}"
@@ -13,7 +13,9 @@
 """Utility functions for redis when testing"""
 import json
 from datetime import datetime
-from typing import TYPE_CHECKING, Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.services.jobs.results import is_packed, unpack_result
 
 if TYPE_CHECKING:
     import redis
@@ -54,3 +56,32 @@ def register_app_token_job_id(
     }
 
     client.hset(hash_name, redis_key, json.dumps(auth_log))
+
+
+def get_job_entry(client: "redis.Redis", job_id: str) -> Optional[Dict[str, Any]]:
+    """Gets the job supervisor entry of the given job from redis
+
+    Args:
+        client: the redis client
+        job_id: the id of the job
+
+    Returns:
+        the job entry as a nested dict or None if the job does not exist
+    """
+    fields = client.hgetall(f"job_supervisor:jobs:{job_id}")
+    if not fields:
+        return None
+
+    entry = {}
+    for field, value in fields.items():
+        field = field.decode("utf-8")
+        # the arrival time of the job at its location is not part of its entry
+        if field == "located_ts":
+            continue
+        *parents, leaf = field.split(".")
+        node = entry
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = unpack_result(value) if is_packed(value) else json.loads(value)
+
+    return entry
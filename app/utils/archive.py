@@ -0,0 +1,323 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""An indexed on-disk store of the job entries and auth logs archived out of redis"""
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .redis import to_str
+
+# the seconds to wait for a lock held by another process on the database
+_BUSY_TIMEOUT = 30.0
+# the maximum number of values bound in a single query
+_MAX_VARIABLES = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    location INTEGER,
+    registered_at REAL NOT NULL,
+    located_at REAL NOT NULL,
+    finished_at REAL,
+    failed_at REAL,
+    cancelled_at REAL,
+    archived_at REAL NOT NULL,
+    fields TEXT NOT NULL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_registered_at ON jobs (registered_at, job_id);
+CREATE INDEX IF NOT EXISTS jobs_location ON jobs (location, located_at, job_id);
+CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at, job_id);
+CREATE INDEX IF NOT EXISTS jobs_failed_at ON jobs (failed_at, job_id);
+CREATE INDEX IF NOT EXISTS jobs_cancelled_at ON jobs (cancelled_at, job_id);
+CREATE TABLE IF NOT EXISTS auth_logs (
+    key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    auth_log TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS auth_logs_job_id ON auth_logs (job_id);
+"""
+
+# the columns by which the archived jobs can be listed
+_SCORE_COLUMNS = {
+    "registered": "registered_at",
+    "location": "located_at",
+    "finished": "finished_at",
+    "failed": "failed_at",
+    "cancelled": "cancelled_at",
+}
+
+# the redis hash fields of a job entry, with the result as raw bytes
+Fields = Dict[str, Union[str, bytes]]
+
+
+@dataclass
+class ArchivedJob:
+    """A job entry as moved out of redis
+
+    Attributes:
+        job_id: the id of the job
+        fields: the fields of the job's redis hash
+        registered_at: the epoch time the job was registered
+        location: the value of the location of the job
+        located_at: the epoch time the job arrived at its location
+        state_times: the epoch times the job 'finished', 'failed' or was 'cancelled'
+        archived_at: the epoch time the job was archived
+    """
+
+    job_id: str
+    fields: Fields
+    registered_at: float
+    location: Optional[int]
+    located_at: float
+    state_times: Dict[str, float]
+    archived_at: float
+
+
+class Archive:
+    """An SQLite database of the archived job entries and auth logs
+
+    Each thread, and each forked process, opens its own connection to the database
+    on first use, so the archive can be shared by the threads of the API
+    and the workers alike. The database is in WAL mode so that reads are never
+    blocked by the archiver.
+
+    Attributes:
+        path: the path to the database file
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def save_jobs(self, jobs: Iterable[ArchivedJob], result_field: str):
+        """Saves the given job entries, replacing any archived with the same ids
+
+        Args:
+            jobs: the job entries to save
+            result_field: the field of the result, stored as is in its own column
+        """
+        rows = []
+        for job in jobs:
+            fields = {
+                key: to_str(value)
+                for key, value in job.fields.items()
+                if key != result_field
+            }
+            result = job.fields.get(result_field)
+            rows.append(
+                (
+                    job.job_id,
+                    job.location,
+                    job.registered_at,
+                    job.located_at,
+                    job.state_times.get("finished"),
+                    job.state_times.get("failed"),
+                    job.state_times.get("cancelled"),
+                    job.archived_at,
+                    json.dumps(fields),
+                    None if result is None else sqlite3.Binary(_to_bytes(result)),
+                )
+            )
+
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_job_fields(
+        self, job_ids: List[str], result_field: str
+    ) -> Dict[str, Fields]:
+        """Gets the fields of the archived jobs among the given job ids
+
+        Args:
+            job_ids: the ids of the jobs
+            result_field: the field under which to return the result
+
+        Returns:
+            dict of job id and the fields of its redis hash, for the archived jobs
+        """
+        fields_map: Dict[str, Fields] = {}
+        for chunk in _chunks(job_ids):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT job_id, fields, result FROM jobs WHERE job_id IN ({placeholders})",
+                chunk,
+            )
+            for job_id, raw_fields, result in rows:
+                fields: Fields = json.loads(raw_fields)
+                if result is not None:
+                    fields[result_field] = bytes(result)
+                fields_map[job_id] = fields
+
+        return fields_map
+
+    def get_archived_job_ids(self, job_ids: List[str]) -> List[str]:
+        """Gets the ids of the archived jobs among the given job ids
+
+        Args:
+            job_ids: the ids of the jobs
+
+        Returns:
+            the ids of the archived jobs
+        """
+        archived_job_ids = []
+        for chunk in _chunks(job_ids):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT job_id FROM jobs WHERE job_id IN ({placeholders})", chunk
+            )
+            archived_job_ids.extend(job_id for (job_id,) in rows)
+
+        return archived_job_ids
+
+    def list_jobs(
+        self,
+        order_by: str,
+        location: Optional[int] = None,
+        min_score: float = 0.0,
+        cursor: Optional[Tuple[float, str]] = None,
+        limit: int = 100,
+    ) -> List[Tuple[str, float]]:
+        """Lists the ids of the archived jobs in the order of the given time
+
+        Args:
+            order_by: 'registered', 'location', 'finished', 'failed' or 'cancelled'
+                i.e. the time the job was registered, arrived at its location,
+                or got to the given state; jobs without that time are left out
+            location: only list the jobs at the location of this value
+            min_score: only list the jobs whose time is at or after this epoch time
+            cursor: the time and job id after which to list the jobs
+            limit: the maximum number of jobs to list
+
+        Returns:
+            list of the job ids and their times, ordered by time then job id
+        """
+        column = _SCORE_COLUMNS[order_by]
+        conditions = [f"{column} >= ?"]
+        params: List[Union[str, float, int]] = [min_score]
+        if location is not None:
+            conditions.append("location = ?")
+            params.append(location)
+        if cursor is not None:
+            conditions.append(f"({column} > ? OR ({column} = ? AND job_id > ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+
+        query = (
+            f"SELECT job_id, {column} FROM jobs WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {column}, job_id LIMIT ?"
+        )
+        return list(self._connect().execute(query, [*params, limit]))
+
+    def delete_jobs(
+        self, job_ids: List[str], include_auth_logs: bool = True
+    ) -> List[str]:
+        """Deletes the archived jobs among the given job ids, with their auth logs
+
+        Args:
+            job_ids: the ids of the jobs
+            include_auth_logs: whether the archived auth logs of the jobs are deleted too
+
+        Returns:
+            the ids of the jobs that were archived and have been deleted
+        """
+        deleted_job_ids = self.get_archived_job_ids(job_ids)
+        with self._connect() as connection:
+            for chunk in _chunks(deleted_job_ids):
+                placeholders = ", ".join("?" * len(chunk))
+                connection.execute(
+                    f"DELETE FROM jobs WHERE job_id IN ({placeholders})", chunk
+                )
+                if include_auth_logs:
+                    connection.execute(
+                        f"DELETE FROM auth_logs WHERE job_id IN ({placeholders})",
+                        chunk,
+                    )
+
+        return deleted_job_ids
+
+    def save_auth_logs(self, auth_logs: Dict[str, Tuple[str, str]]):
+        """Saves the given auth logs, replacing any archived with the same keys
+
+        Args:
+            auth_logs: dict of the composite key and a tuple of the job id and auth log
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO auth_logs VALUES (?, ?, ?)",
+                [
+                    (key, job_id, auth_log)
+                    for key, (job_id, auth_log) in auth_logs.items()
+                ],
+            )
+
+    def get_auth_logs(self, keys: List[str]) -> Dict[str, str]:
+        """Gets the archived auth logs among the given composite keys
+
+        Args:
+            keys: the composite keys of the app tokens and job ids
+
+        Returns:
+            dict of the composite key and the auth log, for the archived auth logs
+        """
+        auth_logs: Dict[str, str] = {}
+        for chunk in _chunks(keys):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._connect().execute(
+                f"SELECT key, auth_log FROM auth_logs WHERE key IN ({placeholders})",
+                chunk,
+            )
+            auth_logs.update(rows)
+
+        return auth_logs
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread, opening it if need be"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+
+        return connection
+
+    def _reset(self):
+        """Drops the connections, which must not be used in a forked process"""
+        self._local = threading.local()
+
+
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    """Splits the values into lists short enough to be bound in a single query
+
+    Args:
+        values: the values to split
+    """
+    for start in range(0, len(values), _MAX_VARIABLES):
+        yield values[start : start + _MAX_VARIABLES]
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    """Encodes the value read from redis if it is a string
+
+    Args:
+        value: the value read from redis
+    """
+    return value.encode("utf-8") if isinstance(value, str) else value
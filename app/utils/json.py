@@ -15,18 +15,146 @@
 # - Martin Ahindura 2023
 
 import json
+import re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
+
+# the tokens that matter while inside a string, inside a nested value,
+# or directly inside the top-level object.
+# Arrays or objects without strings nor nested values do not change the depth,
+# so consecutive ones are skipped as a single token, e.g. the samples of a waveform.
+_FLAT_VALUE = rb'[\[{][^"\[\]{}]*[\]}]'
+_STRING_TOKENS = re.compile(rb'["\\]')
+_NESTED_TOKENS = re.compile(rb"(?:" + _FLAT_VALUE + rb'[^"\[\]{}]*)+|["\[\]{}]')
+_TOP_LEVEL_TOKENS = re.compile(_FLAT_VALUE + rb'|["\[\]{},:]')
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class JsonItemsScanner:
+    """Extracts the values of some top-level keys of a JSON object fed to it in chunks
+
+    The document is never loaded as a whole. Only the raw bytes of the values of
+    the wanted keys are kept and decoded; any other value, however big, is skipped
+    by tracking the nesting depth and the strings.
+    Scanning stops as soon as all the wanted keys have been found.
+
+    Attributes:
+        keys: the top-level keys whose values are extracted
+        items: the extracted values of the keys found so far
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.keys = frozenset(keys)
+        self.items: Dict[str, Any] = {}
+
+        self._depth = 0
+        self._in_string = False
+        self._is_escaped = False
+        self._is_done = not self.keys
+        # the top-level key whose value is being scanned
+        self._current_key: Optional[str] = None
+        # the raw bytes of the key or value being captured
+        self._raw_key: Optional[bytearray] = None
+        self._raw_value: Optional[bytearray] = None
+
+    @property
+    def is_done(self) -> bool:
+        """Whether all the keys have been found or the object has ended"""
+        return self._is_done
+
+    def feed(self, chunk: bytes):
+        """Scans the next chunk of the JSON document
+
+        Args:
+            chunk: the next bytes of the document
+        """
+        if self._is_done:
+            return
+
+        pos = 0
+        key_start = 0 if self._raw_key is not None else None
+        value_start = 0 if self._raw_value is not None else None
+
+        while pos < len(chunk):
+            if self._is_escaped:
+                self._is_escaped = False
+                pos += 1
+                continue
+
+            if self._in_string:
+                match = _STRING_TOKENS.search(chunk, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == b"\\":
+                    self._is_escaped = True
+                    continue
+
+                self._in_string = False
+                if key_start is not None:
+                    self._raw_key += chunk[key_start : pos - 1]
+                    self._current_key = json.loads(b'"' + self._raw_key + b'"')
+                    self._raw_key = key_start = None
+                continue
+
+            pattern = _TOP_LEVEL_TOKENS if self._depth == 1 else _NESTED_TOKENS
+            match = pattern.search(chunk, pos)
+            if match is None:
+                break
+            token, pos = match.group(), match.end()
+
+            if len(token) > 1:
+                continue
+            elif token == b'"':
+                self._in_string = True
+                if self._depth == 1 and self._current_key is None:
+                    self._raw_key, key_start = bytearray(), pos
+            elif token == b":":
+                if self._current_key in self.keys:
+                    self._raw_value, value_start = bytearray(), pos
+            elif token in (b"{", b"["):
+                self._depth += 1
+            else:
+                if token != b",":
+                    self._depth -= 1
+                if self._depth > 1 or (self._depth == 1 and token != b","):
+                    continue
+
+                # the end of a top-level value
+                if value_start is not None:
+                    self._raw_value += chunk[value_start : match.start()]
+                    self.items[self._current_key] = json.loads(self._raw_value)
+                    self._raw_value = value_start = None
+                self._current_key = None
+                if self._depth < 1 or len(self.items) == len(self.keys):
+                    self._is_done = True
+                    return
+
+        if key_start is not None:
+            self._raw_key += chunk[key_start:]
+        if value_start is not None:
+            self._raw_value += chunk[value_start:]
 
 
-# Note: if the JSON file is big, this may need to be changed. Perhaps
-# the "bigjson" library could help, which reads the file as a stream
-# and uses only what's needed, instead of loading the whole file into
-# memory
 def get_items_from_json(file_path: Path, keys: List[str]) -> Dict[str, Any]:
-    with open(file_path, "rb") as f:
-        contents = json.load(f)
+    """Gets the values of the given top-level keys of the JSON object in the file
+
+    The file is read in chunks and only until all the keys are found.
+
+    Args:
+        file_path: the path to the JSON file
+        keys: the top-level keys to get
 
-    items = [(key, contents[key]) for key in keys if key in contents]
+    Returns:
+        a dict of the keys found in the file and their values
+    """
+    scanner = JsonItemsScanner(keys)
+    with open(file_path, "rb") as file:
+        while not scanner.is_done:
+            chunk = file.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            scanner.feed(chunk)
 
-    return dict(items)
+    return {key: scanner.items[key] for key in keys if key in scanner.items}
@@ -0,0 +1,155 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Utilities for writing log files"""
+import atexit
+import os
+import threading
+from pathlib import Path
+from typing import List, Union
+
+from filelock import FileLock
+
+
+class BufferedLogWriter:
+    """Appends lines to a log file in batches from a background thread
+
+    Lines are buffered in memory and written when the buffer reaches `max_batch_size`
+    lines or every `flush_interval` seconds, whichever comes first.
+    Each batch is appended with a single write while holding a file lock,
+    so that several processes can safely append to the same file.
+    When the file would exceed `max_bytes`, it is rotated to `{path}.1`, `{path}.2` etc.
+
+    Attributes:
+        path: the path to the log file
+        max_batch_size: the number of buffered lines that triggers a flush
+        flush_interval: the maximum number of seconds a line stays in the buffer
+        max_bytes: the size in bytes beyond which the file is rotated. 0 means never
+        backup_count: the number of rotated files to keep
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_bytes: int = 0,
+        backup_count: int = 5,
+    ):
+        self.path = Path(path)
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._file_lock = FileLock(f"{self.path}.lock")
+        self._reset()
+
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def write(self, line: str):
+        """Adds the line to the buffer, to be written to the file later
+
+        Args:
+            line: the line to write, including its line ending
+        """
+        with self._condition:
+            self._buffer.append(line)
+            if self._thread is None:
+                self._start_thread()
+            if len(self._buffer) >= self.max_batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Writes all buffered lines to the file"""
+        with self._flush_lock:
+            with self._condition:
+                lines, self._buffer = self._buffer, []
+
+            if lines:
+                self._append("".join(lines).encode("utf-8"))
+
+    def _reset(self):
+        """Resets the state of the writer in a new process
+
+        The buffered lines are dropped because the parent process writes them,
+        and the background thread does not exist in a forked process.
+        """
+        self._buffer: List[str] = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _start_thread(self):
+        """Starts the background thread that flushes the buffer"""
+        self._thread = threading.Thread(
+            target=self._run, name="buffered-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        """Flushes the buffer whenever it is full or the flush interval elapses"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._buffer) >= self.max_batch_size,
+                    timeout=self.flush_interval,
+                )
+            self.flush()
+
+    def _append(self, data: bytes):
+        """Appends the data to the file, rotating it first if need be
+
+        Args:
+            data: the bytes to append
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._file_lock:
+            if self._should_rotate(len(data)):
+                self._rotate()
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view) :]
+            finally:
+                os.close(fd)
+
+    def _should_rotate(self, size: int) -> bool:
+        """Whether appending the given number of bytes would exceed max_bytes
+
+        Args:
+            size: the number of bytes to append
+        """
+        if self.max_bytes <= 0:
+            return False
+
+        try:
+            return os.path.getsize(self.path) + size > self.max_bytes
+        except FileNotFoundError:
+            return False
+
+    def _rotate(self):
+        """Renames the file to {path}.1, shifting the older backups by one"""
+        if self.backup_count <= 0:
+            os.truncate(self.path, 0)
+            return
+
+        for idx in range(self.backup_count - 1, 0, -1):
+            source = Path(f"{self.path}.{idx}")
+            if source.exists():
+                source.replace(f"{self.path}.{idx + 1}")
+
+        self.path.replace(f"{self.path}.1")
@@ -11,8 +11,234 @@
 # that they have been altered from the originals.
 
 """Utilities for handling queues"""
+import time
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
 from redis import Redis
 from rq import Queue
+from rq.job import Job
+
+if TYPE_CHECKING:
+    from redis.client import Pipeline
+
+# Inserts ARGV[1] into the list KEYS[1] before the first job of a greater score
+# in the sorted set KEYS[2], dropping the jobs no longer in the list as it goes
+_INSERT_BY_SCORE = """
+local function insert_by_score(job_id, score)
+    local bound = "(" .. string.format("%.17g", score)
+    while true do
+        local pivots = redis.call("ZRANGEBYSCORE", KEYS[2], bound, "+inf", "LIMIT", 0, 1)
+        if #pivots == 0 then
+            redis.call("RPUSH", KEYS[1], job_id)
+            break
+        end
+        if redis.call("LINSERT", KEYS[1], "BEFORE", pivots[1], job_id) > 0 then
+            break
+        end
+        redis.call("ZREM", KEYS[2], pivots[1])
+        redis.call("HDEL", KEYS[3], pivots[1])
+    end
+    redis.call("ZADD", KEYS[2], string.format("%.17g", score), job_id)
+end
+"""
+
+# Moves the job ARGV[1] of priority ARGV[2], just pushed into the list KEYS[1],
+# to the place of its virtual enqueue time, the time ARGV[3] less ARGV[2] aging
+# intervals ARGV[4], or to the front if ARGV[5] is set.
+# KEYS[2] is the sorted set of the virtual enqueue times of the queued jobs and
+# KEYS[3] the hash of their priorities. The jobs in them that have been dequeued
+# since, i.e. those ahead of the head of the list, are dropped first.
+_PLACE_SCRIPT = (
+    _INSERT_BY_SCORE
+    + """
+redis.call("LREM", KEYS[1], -1, ARGV[1])
+local head = redis.call("LINDEX", KEYS[1], 0)
+if not head then
+    redis.call("DEL", KEYS[2], KEYS[3])
+else
+    local head_score = redis.call("ZSCORE", KEYS[2], head)
+    if head_score then
+        local stale = redis.call(
+            "ZRANGEBYSCORE", KEYS[2], "-inf", "(" .. head_score, "LIMIT", 0, 1000
+        )
+        if #stale > 0 then
+            redis.call("ZREM", KEYS[2], unpack(stale))
+            redis.call("HDEL", KEYS[3], unpack(stale))
+        end
+    end
+end
+
+redis.call("HSET", KEYS[3], ARGV[1], ARGV[2])
+if ARGV[5] == "1" then
+    redis.call("LPUSH", KEYS[1], ARGV[1])
+    redis.call("ZADD", KEYS[2], "-inf", ARGV[1])
+else
+    insert_by_score(ARGV[1], tonumber(ARGV[3]) - tonumber(ARGV[2]) * tonumber(ARGV[4]))
+end
+"""
+)
+
+# Changes the priority of the queued job ARGV[1] to ARGV[2], moving it in the list
+# KEYS[1] by as many aging intervals ARGV[3] as its priority has changed.
+# Returns 1 if the job was in the queue else 0.
+_SET_PRIORITY_SCRIPT = (
+    _INSERT_BY_SCORE
+    + """
+local old_score = redis.call("ZSCORE", KEYS[2], ARGV[1])
+if not old_score then
+    return 0
+end
+if redis.call("LREM", KEYS[1], 1, ARGV[1]) == 0 then
+    redis.call("ZREM", KEYS[2], ARGV[1])
+    redis.call("HDEL", KEYS[3], ARGV[1])
+    return 0
+end
+
+local old_priority = tonumber(redis.call("HGET", KEYS[3], ARGV[1]) or "0")
+local new_priority = tonumber(ARGV[2])
+redis.call("HSET", KEYS[3], ARGV[1], ARGV[2])
+insert_by_score(
+    ARGV[1], tonumber(old_score) + (old_priority - new_priority) * tonumber(ARGV[3])
+)
+return 1
+"""
+)
+
+
+# the key of the priority of a job in the meta of its rq job
+PRIORITY_META_KEY = "priority"
+
+
+class PriorityQueue(Queue):
+    """A queue that dispatches the jobs of higher priority first, with aging
+
+    rq has no priorities, so the list of the queue is kept sorted by the virtual
+    enqueue time of each job, i.e. its enqueue time less its priority
+    times the aging interval. Waiting one aging interval is thus worth one level
+    of priority and low priority jobs are never starved. The workers
+    dequeue the head of the list as for any other queue.
+
+    Without an aging interval, the queue is first come first served like any rq queue
+    and the priorities are ignored.
+
+    The priority of each job is kept in the meta of its rq job, so that the job
+    is placed by it whenever it is enqueued, including when it is requeued.
+
+    Attributes:
+        aging_interval: the seconds of waiting worth one level of priority
+            or None if the priorities are ignored
+        scores_key: the key of the sorted set of the virtual enqueue times of the jobs
+        priorities_key: the key of the hash of the priorities of the jobs
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connection: "Redis",
+        is_async: bool = True,
+        aging_interval: Optional[float] = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            name: the name of the queue
+            connection: the connection to Redis
+            is_async: whether to dispatch the enqueued tasks in other workers
+            aging_interval: the seconds of waiting worth one level of priority.
+                If None, the priorities are ignored.
+            kwargs: the other arguments of rq's Queue
+        """
+        super().__init__(name, connection=connection, is_async=is_async, **kwargs)
+        self.aging_interval = aging_interval
+        self.scores_key = f"{self.key}:scores"
+        self.priorities_key = f"{self.key}:priorities"
+        self._place_script = connection.register_script(_PLACE_SCRIPT)
+        self._set_priority_script = connection.register_script(_SET_PRIORITY_SCRIPT)
+
+    @property
+    def is_prioritized(self) -> bool:
+        """Whether the jobs are dispatched by their priorities"""
+        return self.aging_interval is not None
+
+    def enqueue_with_priority(self, priority: float, f, *args, **kwargs) -> Job:
+        """Enqueues the function call as a job of the given priority
+
+        Args:
+            priority: the priority of the job; the higher, the sooner it is dispatched
+            f: the function, or its dotted path, to run in the worker
+            args: the positional arguments of `Queue.enqueue`
+            kwargs: the keyword arguments of `Queue.enqueue`, including the 'job_id'
+
+        Returns:
+            the enqueued rq job
+        """
+        meta = {**(kwargs.pop("meta", None) or {}), PRIORITY_META_KEY: priority}
+        return self.enqueue(f, *args, meta=meta, **kwargs)
+
+    def _enqueue_job(
+        self,
+        job: Job,
+        pipeline: Optional["Pipeline"] = None,
+        at_front: bool = False,
+        **kwargs: Any,
+    ) -> Job:
+        """Enqueues the job, then moves it to the place of its priority in the list
+
+        The job is moved in the same pipeline as rq pushes it,
+        so no worker dequeues it in between.
+
+        Args:
+            job: the rq job to enqueue
+            pipeline: the redis pipeline to enqueue in, if any
+            at_front: whether to enqueue the job ahead of all others
+            kwargs: the other arguments of rq's `Queue._enqueue_job`
+
+        Returns:
+            the enqueued rq job
+        """
+        if not (self.is_prioritized and self.is_async):
+            return super()._enqueue_job(
+                job, pipeline=pipeline, at_front=at_front, **kwargs
+            )
+
+        pipe = pipeline if pipeline is not None else self.connection.pipeline()
+        job = super()._enqueue_job(job, pipeline=pipe, at_front=at_front, **kwargs)
+        self._place_script(
+            keys=[self.key, self.scores_key, self.priorities_key],
+            args=[
+                job.id,
+                job.meta.get(PRIORITY_META_KEY, 0),
+                time.time(),
+                self.aging_interval,
+                int(at_front),
+            ],
+            client=pipe,
+        )
+        if pipeline is None:
+            pipe.execute()
+        return job
+
+    def set_priority(self, job_id: str, priority: float) -> bool:
+        """Changes the priority of a job waiting in the queue, moving it accordingly
+
+        The job keeps the time it has already waited to its credit.
+
+        Args:
+            job_id: the id of the rq job
+            priority: the new priority of the job
+
+        Returns:
+            True if the job was waiting in the queue, else False
+        """
+        if not self.is_prioritized:
+            return False
+
+        is_queued = self._set_priority_script(
+            keys=[self.key, self.scores_key, self.priorities_key],
+            args=[job_id, priority, self.aging_interval],
+            client=self.connection,
+        )
+        return bool(is_queued)
 
 
 class QueuePool:
@@ -27,25 +253,59 @@ class QueuePool:
         is_async: whether the queues are to be run asynchronously or not
     """
 
-    def __init__(self, prefix: str, connection: "Redis", is_async: bool = True):
+    def __init__(
+        self,
+        prefix: str,
+        connection: "Redis",
+        is_async: bool = True,
+        priority_stages: Optional[Iterable[str]] = None,
+        aging_interval: Optional[float] = None,
+    ):
         """
         Args:
             prefix: the prefix for the names of the expected queues
             connection: the connection to Redis
             is_async: whether to dispatch the enqueued tasks in other workers
+            priority_stages: the stages whose queues dispatch the jobs by priority,
+                among 'registration', 'pre_processing', 'execution', 'post_processing'.
+                Defaults to none of them
+            aging_interval: the seconds of waiting worth one level of priority
+                in those queues. If None, the priorities are ignored.
         """
         self.connection = connection
         self.is_async = is_async
+        priority_stages = set(priority_stages or ())
 
-        self.job_registration_queue = Queue(
-            f"{prefix}_job_registration", connection=connection, is_async=is_async
-        )
-        self.logfile_postprocessing_queue = Queue(
-            f"{prefix}_logfile_postprocessing", connection=connection, is_async=is_async
-        )
-        self.job_preprocessing_queue = Queue(
-            f"{prefix}_job_preprocessing", connection=connection, is_async=is_async
-        )
-        self.job_execution_queue = Queue(
-            f"{prefix}_job_execution", connection=connection, is_async=is_async
+        def new_queue(stage: str, name: str) -> PriorityQueue:
+            return PriorityQueue(
+                f"{prefix}_{name}",
+                connection=connection,
+                is_async=is_async,
+                aging_interval=aging_interval if stage in priority_stages else None,
+            )
+
+        self.job_registration_queue = new_queue("registration", "job_registration")
+        self.logfile_postprocessing_queue = new_queue(
+            "post_processing", "logfile_postprocessing"
         )
+        self.job_preprocessing_queue = new_queue("pre_processing", "job_preprocessing")
+        self.job_execution_queue = new_queue("execution", "job_execution")
+
+    def get_queue(self, stage: str) -> PriorityQueue:
+        """Returns the queue of the given stage
+
+        Args:
+            stage: 'registration', 'pre_processing', 'execution' or 'post_processing'
+
+        Returns:
+            the queue of the jobs waiting for that stage
+
+        Raises:
+            KeyError: if the stage is unknown
+        """
+        return {
+            "registration": self.job_registration_queue,
+            "pre_processing": self.job_preprocessing_queue,
+            "execution": self.job_execution_queue,
+            "post_processing": self.logfile_postprocessing_queue,
+        }[stage]
@@ -0,0 +1,80 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+"""Helpers for the values read from redis and its pub/sub channels"""
+import asyncio
+from typing import Callable, Optional, Union
+
+from redis.asyncio import Redis as AsyncRedis
+
+# the seconds between reconnection attempts when the pub/sub connection is lost
+RECONNECT_INTERVAL = 1.0
+
+
+def to_str(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """Decodes the value read from redis if it is bytes
+
+    Args:
+        value: the value read from redis
+
+    Returns:
+        the value as a string, or None if it is None
+    """
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+async def listen(
+    redis_db: AsyncRedis,
+    channel: str,
+    on_message: Callable[[bytes, bytes], None],
+    on_subscribed: Callable[[], None],
+    on_lost: Callable[[Exception], None],
+    is_pattern: bool = False,
+):
+    """Passes the messages of the channel to `on_message` until cancelled
+
+    The channel is subscribed to again, every `RECONNECT_INTERVAL` seconds,
+    whenever the subscription is lost.
+
+    Args:
+        redis_db: the async redis connection
+        channel: the channel, or the pattern of the channels, to subscribe to
+        on_message: called with the channel and the data of each message
+        on_subscribed: called once the subscription is confirmed, before its messages
+        on_lost: called with the exception by which the subscription was lost
+        is_pattern: whether the channel is a pattern
+    """
+    subscribe_type, message_type = ("subscribe", "message")
+    if is_pattern:
+        subscribe_type, message_type = ("psubscribe", "pmessage")
+
+    while True:
+        pubsub = redis_db.pubsub()
+        try:
+            if is_pattern:
+                await pubsub.psubscribe(channel)
+            else:
+                await pubsub.subscribe(channel)
+            # wait for the confirmation of the subscription
+            message = None
+            while message is None or message["type"] != subscribe_type:
+                message = await pubsub.get_message(timeout=None)
+            on_subscribed()
+
+            while True:
+                message = await pubsub.get_message(timeout=None)
+                if message is not None and message["type"] == message_type:
+                    on_message(message["channel"], message["data"])
+        except Exception as exp:
+            on_lost(exp)
+            await asyncio.sleep(RECONNECT_INTERVAL)
+        finally:
+            await pubsub.reset()
@@ -0,0 +1,169 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the throughput of the API under mixed job uploads and status polling
+
+Concurrent clients upload jobs while others poll the status of existing jobs.
+The requests/sec and the latencies of each kind of request are printed.
+
+The API is run in-process, on the same event loop as the clients, unless a
+`--base-url` of a running BCC is passed. Any blocking call in an endpoint
+thus shows up as lower throughput and higher latencies for all requests.
+
+It needs a redis server as configured in the .env file or environment.
+Use a throwaway database (REDIS_DB) because it registers jobs and fills the
+registration queue.
+
+Usage:
+
+    python -m benchmarks.api_concurrency --uploads 200 --polls 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+_APP_TOKEN = "benchmark-app-token"
+
+
+async def main(
+    uploads: int, polls: int, concurrency: int, base_url: Optional[str] = None
+):
+    """Runs the benchmark
+
+    Args:
+        uploads: the number of jobs to upload
+        polls: the number of status requests to send
+        concurrency: the number of concurrent clients
+        base_url: the URL of a running BCC. If None, the API is run in-process
+    """
+    if base_url is None:
+        from app.api import app
+
+        transport = httpx.ASGITransport(app=app, client=("testclient", 50000))
+        base_url = "http://testserver"
+    else:
+        transport = None
+
+    headers = {"Authorization": f"Bearer {_APP_TOKEN}"}
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, headers=headers, limits=limits
+    ) as client:
+        polled_job_ids = [await _register_job(client) for _ in range(10)]
+        latencies: Dict[str, List[float]] = {"upload": [], "status": []}
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def upload():
+            async with semaphore:
+                start = time.perf_counter()
+                await _upload_job(client, await _register_credentials(client))
+                latencies["upload"].append(time.perf_counter() - start)
+
+        async def poll(idx: int):
+            async with semaphore:
+                job_id = polled_job_ids[idx % len(polled_job_ids)]
+                start = time.perf_counter()
+                response = await client.get(f"/jobs/{job_id}/status")
+                response.raise_for_status()
+                latencies["status"].append(time.perf_counter() - start)
+
+        tasks = [upload() for _ in range(uploads)] + [poll(i) for i in range(polls)]
+        # interleave the uploads with the polls
+        tasks = tasks[::2] + tasks[1::2]
+
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    # each upload is two requests: registering the credentials and uploading the job
+    total_requests = 2 * uploads + polls
+    print(f"concurrency: {concurrency}, uploads: {uploads}, polls: {polls}")
+    print(f"total: {total_requests} requests in {elapsed:.2f}s")
+    print(f"throughput: {total_requests / elapsed:.1f} requests/sec")
+    for kind, values in latencies.items():
+        if values:
+            values.sort()
+            p95 = values[int(0.95 * (len(values) - 1))]
+            print(
+                f"{kind}: p50 {1000 * statistics.median(values):.1f}ms, "
+                f"p95 {1000 * p95:.1f}ms, max {1000 * values[-1]:.1f}ms"
+            )
+
+
+async def _register_credentials(client: httpx.AsyncClient) -> str:
+    """Registers a new job id for the benchmark app token
+
+    Args:
+        client: the http client
+
+    Returns:
+        the new job id
+    """
+    job_id = f"{uuid.uuid4()}"
+    response = await client.post(
+        "/auth", json={"job_id": job_id, "app_token": _APP_TOKEN}
+    )
+    response.raise_for_status()
+    return job_id
+
+
+async def _upload_job(client: httpx.AsyncClient, job_id: str):
+    """Uploads a job file with the given job id
+
+    Args:
+        client: the http client
+        job_id: the id of the job
+    """
+    job = {"job_id": job_id, "name": "benchmark", "params": {"qobj": {}}}
+    files = {"upload_file": (job_id, json.dumps(job).encode("utf-8"))}
+    response = await client.post("/jobs", files=files)
+    response.raise_for_status()
+
+
+async def _register_job(client: httpx.AsyncClient) -> str:
+    """Creates a job whose status can be polled
+
+    Args:
+        client: the http client
+
+    Returns:
+        the id of the job
+    """
+    from app.services.jobs import service as jobs_service
+
+    job_id = await _register_credentials(client)
+    jobs_service.register_job(job_id)
+    return job_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--base-url", type=str, default=None)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(
+            uploads=args.uploads,
+            polls=args.polls,
+            concurrency=args.concurrency,
+            base_url=args.base_url,
+        )
+    )
@@ -0,0 +1,123 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the authentication overhead per request with and without the auth cache
+
+Clients repeatedly authenticate against a set of registered credentials, as
+status-polling clients do, first reading the auth log from redis each time and
+then through the in-process auth cache. The mean time per authentication of
+each run is printed.
+
+It needs a redis server as configured in the .env file or environment.
+Use a throwaway database (REDIS_DB) because it registers credentials.
+
+Usage:
+
+    python -m benchmarks.auth_cache --jobs 100 --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import List, Optional
+
+from redis.asyncio import Redis
+
+import settings
+from app.services import auth as auth_service
+
+
+async def main(jobs: int, requests: int, concurrency: int):
+    """Runs the benchmark
+
+    Args:
+        jobs: the number of registered credentials
+        requests: the number of authentications of each run
+        concurrency: the number of concurrent clients
+    """
+    redis_db = Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        username=settings.REDIS_USER,
+        password=settings.REDIS_PASSWORD,
+        max_connections=concurrency,
+    )
+    credentials = [
+        auth_service.Credentials(job_id=f"{uuid.uuid4()}", app_token="benchmark")
+        for _ in range(jobs)
+    ]
+    for item in credentials:
+        await auth_service.save_credentials_async(redis_db, payload=item)
+
+    cache = auth_service.AuthLogCache(
+        redis_db, max_size=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL
+    )
+    # start listening to the invalidations before the measurements
+    cache.get("")
+    await asyncio.sleep(0.5)
+
+    print(f"jobs: {jobs}, requests: {requests}, concurrency: {concurrency}")
+    for label, run_cache in [("without cache", None), ("with cache", cache)]:
+        elapsed = await _run(redis_db, credentials, requests, concurrency, run_cache)
+        print(
+            f"{label}: {requests / elapsed:.0f} auths/sec, "
+            f"{1e6 * elapsed / requests:.1f}us per request"
+        )
+
+    await redis_db.close()
+
+
+async def _run(
+    redis_db: Redis,
+    credentials: List[auth_service.Credentials],
+    requests: int,
+    concurrency: int,
+    cache: Optional[auth_service.AuthLogCache],
+) -> float:
+    """Authenticates the credentials in turn by concurrent clients
+
+    Args:
+        redis_db: the async redis connection
+        credentials: the registered credentials
+        requests: the total number of authentications
+        concurrency: the number of concurrent clients
+        cache: the auth cache to use if any
+
+    Returns:
+        the elapsed seconds
+    """
+
+    async def client(offset: int):
+        for idx in range(offset, requests, concurrency):
+            await auth_service.authenticate_async(
+                redis_db,
+                credentials=credentials[idx % len(credentials)],
+                expected_status=auth_service.JobStatus.REGISTERED,
+                cache=cache,
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(
+        main(jobs=args.jobs, requests=args.requests, concurrency=args.concurrency)
+    )
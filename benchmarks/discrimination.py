@@ -0,0 +1,174 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the discrimination of the results of a job into outcomes
+
+A job of one experiment with random IQ points on each qubit is discriminated with
+random linear discriminators for each number of shots and of qubits:
+
+- per channel: the previous implementation, discriminating one channel at a time
+  into an int8 matrix, converted to integers by a product with the powers of 2
+  and to hex strings with np.frompyfunc(hex)
+- batched: `discriminate_results`, discriminating all channels in one stacked
+  matrix product and packing the outcomes in uint64, as stored in redis
+- batched + hex: the same, followed by the formatting of the outcomes as hex
+  strings, as sent to MSS
+
+It needs neither redis nor MSS.
+
+Usage:
+
+    python -m benchmarks.discrimination --shots 1000 100000 1000000 --qubits 1 5 10 20
+"""
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+import xarray as xr
+
+from app.libs.quantum_executor.base.quantum_job import (
+    discriminate_results,
+    outcomes_to_hex,
+)
+from app.libs.quantum_executor.base.quantum_job.dtos import (
+    MeasLvl,
+    MeasRet,
+    QuantumJob,
+)
+from app.services.jobs.workers.postprocessing.discriminators import (
+    LinearDiscriminator,
+)
+
+
+def main(shots: List[int], qubits: List[int], repeats: int):
+    """Runs the benchmark
+
+    Args:
+        shots: the numbers of shots to benchmark
+        qubits: the numbers of qubits to benchmark
+        repeats: the number of times each mode is run
+    """
+    rng = np.random.default_rng(0)
+    print(f"repeats: {repeats}")
+    print(
+        f"{'shots':>8} {'qubits':>6} {'per channel':>12} "
+        f"{'batched':>12} {'batched + hex':>14}"
+    )
+    for no_of_shots in shots:
+        for no_of_qubits in qubits:
+            job = _new_job(rng, no_of_shots=no_of_shots, no_of_qubits=no_of_qubits)
+            discriminator = LinearDiscriminator(
+                version=0,
+                coefficients=rng.normal(size=(no_of_qubits, 2)),
+                intercepts=rng.normal(size=no_of_qubits),
+                rows={idx: idx for idx in range(no_of_qubits)},
+            )
+            modes = [
+                lambda: _discriminate_per_channel(job, discriminator),
+                lambda: discriminate_results(job, discriminator=discriminator),
+                lambda: [
+                    outcomes_to_hex(outcomes)
+                    for outcomes in discriminate_results(
+                        job, discriminator=discriminator
+                    )
+                ],
+            ]
+            durations = [_best_time(fn, repeats=repeats) for fn in modes]
+            print(
+                f"{no_of_shots:>8} {no_of_qubits:>6} "
+                f"{durations[0]:>11.4f}s {durations[1]:>11.4f}s {durations[2]:>13.4f}s"
+            )
+
+
+def _new_job(
+    rng: np.random.Generator, no_of_shots: int, no_of_qubits: int
+) -> QuantumJob:
+    """Creates a job of one experiment with random IQ points on each qubit
+
+    Args:
+        rng: the random number generator
+        no_of_shots: the number of shots of the experiment
+        no_of_qubits: the number of acquisition channels of the experiment
+
+    Returns:
+        the job with its raw results
+    """
+    dataset = xr.Dataset()
+    for ch in range(no_of_qubits):
+        iq_points = rng.normal(size=(no_of_shots, 2)).view(np.complex128)
+        dataset[f"{ch}"] = (["repetition", f"acq_index_{ch}"], iq_points)
+
+    return QuantumJob(
+        tuid="benchmark",
+        meas_return=MeasRet.APPENDED,
+        meas_level=MeasLvl.DISCRIMINATED,
+        meas_return_cols=1,
+        raw_results={"experiment": dataset},
+    )
+
+
+def _discriminate_per_channel(
+    job: QuantumJob, discriminator: LinearDiscriminator
+) -> List[List[str]]:
+    """Discriminates the results one channel at a time, as was done before batching
+
+    Args:
+        job: the job whose results are discriminated
+        discriminator: the discriminator of each channel
+
+    Returns:
+        the hex strings of the outcomes of each experiment
+    """
+    dec_to_hex = np.frompyfunc(hex, 1, 1)
+    memory = []
+    for expt_dataset in job.raw_results.values():
+        channels = [int(ch) for ch in expt_dataset.keys()]
+        results = np.zeros(
+            (max(channels) + 1, expt_dataset.sizes["repetition"]), dtype=np.int8
+        )
+        for acquisition_channel, acquisitions in expt_dataset.items():
+            idx = int(acquisition_channel)
+            results[idx] = discriminator(idx, acquisitions.data[:, 0])
+
+        bitarrays = results.transpose()[:, ::-1]
+        powers_of_base = 2 ** np.arange(bitarrays.shape[1] - 1, -1, -1)
+        memory.append(dec_to_hex(bitarrays @ powers_of_base).tolist())
+    return memory
+
+
+def _best_time(fn: Callable, repeats: int) -> float:
+    """Returns the best number of seconds a call of the function took
+
+    Args:
+        fn: the function to call
+        repeats: the number of times to call it
+
+    Returns:
+        the seconds the fastest call took
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shots", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--qubits", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(shots=args.shots, qubits=args.qubits, repeats=args.repeats)
@@ -0,0 +1,205 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the per-job time of the forking and the long-lived execution workers
+
+Jobs are submitted one at a time to the registration queue, as the API does,
+and the time each spends in the execution queue and worker, from its enqueueing
+for execution to the end of its execution, is measured, first with a forking
+rq worker, then with the LongLivedWorker (LONG_LIVED_EXECUTION_WORKER).
+The jobs are registered and pre-processed by a single FUSED_PREPROCESSING worker.
+The job is the simulator job of the test fixtures, run on the configured
+EXECUTOR_TYPE. The post-processing queue is emptied after each job so that
+no job is post-processed.
+
+It needs a redis server as configured in the .env file or environment, and MSS
+unless IS_STANDALONE is set. Use a throwaway database (REDIS_DB) because
+it registers jobs and empties the queues of DEFAULT_PREFIX.
+
+Usage:
+
+    python -m benchmarks.execution_worker --jobs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+from rq.job import Job, JobStatus
+
+import settings
+from app.services.jobs.service import Location, get_rq_job_id
+from app.services.jobs.workers import JOB_REGISTER_TASK
+from app.utils.queues import QueuePool
+
+# the seconds to wait for a job to be executed, including the warm-up of the executor
+_TIMEOUT = 300.0
+_JOB_FIXTURE = (
+    Path(__file__).parent.parent
+    / "app"
+    / "tests"
+    / "fixtures"
+    / "jobs_to_upload_simulator.json"
+)
+_LONG_LIVED_WORKER_CLASS = (
+    "app.services.jobs.workers.execution.long_lived.LongLivedWorker"
+)
+
+
+def main(jobs: int):
+    """Runs the benchmark
+
+    Args:
+        jobs: the number of jobs to submit with each worker
+    """
+    rq_queues = QueuePool(
+        prefix=settings.DEFAULT_PREFIX,
+        connection=settings.REDIS_CONNECTION,
+        priority_stages=settings.PRIORITY_QUEUES,
+        aging_interval=settings.QUEUE_AGING_INTERVAL,
+    )
+    storage = Path(settings.STORAGE_ROOT) / settings.STORAGE_PREFIX_DIRNAME
+    upload_pool = storage / settings.JOB_UPLOAD_POOL_DIRNAME
+    upload_pool.mkdir(parents=True, exist_ok=True)
+
+    print(f"jobs: {jobs}, executor: {settings.EXECUTOR_TYPE}")
+    modes = [("forking worker", False), ("long-lived worker", True)]
+    for label, is_long_lived in modes:
+        first, *durations = _run(
+            rq_queues, storage, jobs=jobs + 1, is_long_lived=is_long_lived
+        )
+        durations_ms = sorted(1e3 * duration for duration in durations)
+        p95 = durations_ms[int(0.95 * (len(durations_ms) - 1))]
+        print(
+            f"{label}: first job {1e3 * first:.1f}ms, then per job "
+            f"median {statistics.median(durations_ms):.1f}ms, "
+            f"p95 {p95:.1f}ms, mean {statistics.mean(durations_ms):.1f}ms"
+        )
+
+
+def _run(
+    rq_queues: QueuePool, storage: Path, jobs: int, is_long_lived: bool
+) -> List[float]:
+    """Submits the jobs one at a time and times their execution
+
+    Args:
+        rq_queues: the queues of BCC
+        storage: the directory of the job pools
+        jobs: the number of jobs to submit
+        is_long_lived: whether to run the LongLivedWorker instead of a forking worker
+
+    Returns:
+        the seconds each job took from its enqueueing for execution to its end
+    """
+    queues = [
+        rq_queues.job_registration_queue,
+        rq_queues.job_preprocessing_queue,
+        rq_queues.job_execution_queue,
+        rq_queues.logfile_postprocessing_queue,
+    ]
+    for queue in queues:
+        queue.empty()
+
+    env = {**os.environ, "FUSED_PREPROCESSING": "true"}
+    worker_class_args = ["-w", _LONG_LIVED_WORKER_CLASS] if is_long_lived else []
+    worker_args = [
+        [rq_queues.job_registration_queue.name],
+        [*worker_class_args, rq_queues.job_execution_queue.name],
+    ]
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "rq.cli", "worker", "-q", "-u", _get_redis_url()]
+            + args,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for args in worker_args
+    ]
+
+    try:
+        return [_submit_and_wait(rq_queues, storage) for _ in range(jobs)]
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+def _submit_and_wait(rq_queues: QueuePool, storage: Path) -> float:
+    """Submits a job and waits for the end of its execution
+
+    Args:
+        rq_queues: the queues of BCC
+        storage: the directory of the job pools
+
+    Returns:
+        the seconds from its enqueueing for execution to the end of its execution
+
+    Raises:
+        TimeoutError: the job was not executed in time
+        RuntimeError: the execution of the job failed
+    """
+    job_id = f"{uuid.uuid4()}"
+    job_file = storage / settings.JOB_UPLOAD_POOL_DIRNAME / job_id
+    job = json.loads(_JOB_FIXTURE.read_text())[0]
+    job_file.write_text(json.dumps({**job, "job_id": job_id, "name": "benchmark"}))
+
+    start = time.perf_counter()
+    rq_queues.job_registration_queue.enqueue(
+        JOB_REGISTER_TASK,
+        job_file,
+        {"name": "benchmark"},
+        job_id=get_rq_job_id(job_id, Location.REG_Q),
+    )
+
+    rq_job_id = get_rq_job_id(job_id, Location.EXEC_Q)
+    connection = rq_queues.connection
+    while True:
+        if time.perf_counter() - start > _TIMEOUT:
+            raise TimeoutError(f"job {job_id} was not executed in time")
+        if Job.exists(rq_job_id, connection=connection):
+            rq_job = Job.fetch(rq_job_id, connection=connection)
+            status = rq_job.get_status()
+            if status == JobStatus.FINISHED:
+                break
+            if status == JobStatus.FAILED:
+                raise RuntimeError(f"job {job_id} failed: {rq_job.exc_info}")
+        time.sleep(0.001)
+
+    rq_queues.logfile_postprocessing_queue.empty()
+    return (rq_job.ended_at - rq_job.enqueued_at).total_seconds()
+
+
+def _get_redis_url() -> str:
+    """Returns the URL of the redis server in the settings, for the rq workers"""
+    credentials = ""
+    if settings.REDIS_USER or settings.REDIS_PASSWORD:
+        credentials = f"{settings.REDIS_USER or ''}:{settings.REDIS_PASSWORD or ''}@"
+    return (
+        f"redis://{credentials}{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+        f"/{settings.REDIS_DB}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    args = parser.parse_args()
+
+    main(jobs=args.jobs)
@@ -0,0 +1,176 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the submit-to-execution-queue latency with and without fused stages
+
+Jobs are submitted one at a time to the registration queue, as the API does,
+and the time until each reaches the execution queue is measured, first with
+separate registration and pre-processing workers, then with a single
+registration worker that also pre-processes the jobs (FUSED_PREPROCESSING).
+The workers are forking rq workers started as in start_bcc.sh. The job is the
+simulator job of the test fixtures, compiled for the configured EXECUTOR_TYPE.
+The execution queue is emptied after each job so that no job is executed.
+
+It needs a redis server as configured in the .env file or environment.
+Use a throwaway database (REDIS_DB) because it registers jobs and empties
+the queues of DEFAULT_PREFIX.
+
+Usage:
+
+    python -m benchmarks.fused_preprocessing --jobs 100
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+import settings
+from app.services.jobs.service import Location, get_rq_job_id
+from app.services.jobs.workers import JOB_REGISTER_TASK
+from app.utils.queues import QueuePool
+
+# the seconds to wait for a job to reach the execution queue
+_TIMEOUT = 30.0
+_JOB_FIXTURE = (
+    Path(__file__).parent.parent
+    / "app"
+    / "tests"
+    / "fixtures"
+    / "jobs_to_upload_simulator.json"
+)
+
+
+def main(jobs: int):
+    """Runs the benchmark
+
+    Args:
+        jobs: the number of jobs to submit in each mode
+    """
+    rq_queues = QueuePool(
+        prefix=settings.DEFAULT_PREFIX,
+        connection=settings.REDIS_CONNECTION,
+        priority_stages=settings.PRIORITY_QUEUES,
+        aging_interval=settings.QUEUE_AGING_INTERVAL,
+    )
+    storage = Path(settings.STORAGE_ROOT) / settings.STORAGE_PREFIX_DIRNAME
+    upload_pool = storage / settings.JOB_UPLOAD_POOL_DIRNAME
+    upload_pool.mkdir(parents=True, exist_ok=True)
+
+    print(f"jobs: {jobs}")
+    for label, is_fused in [("separate stages", False), ("fused stages", True)]:
+        latencies = _run(rq_queues, storage, jobs=jobs, is_fused=is_fused)
+        latencies_ms = sorted(1e3 * latency for latency in latencies)
+        p95 = latencies_ms[int(0.95 * (len(latencies_ms) - 1))]
+        print(
+            f"{label}: submit to execution queue "
+            f"median {statistics.median(latencies_ms):.1f}ms, "
+            f"p95 {p95:.1f}ms, mean {statistics.mean(latencies_ms):.1f}ms"
+        )
+
+
+def _run(rq_queues: QueuePool, storage: Path, jobs: int, is_fused: bool) -> List[float]:
+    """Submits the jobs one at a time and times their arrival at the execution queue
+
+    Args:
+        rq_queues: the queues of BCC
+        storage: the directory of the job pools
+        jobs: the number of jobs to submit
+        is_fused: whether to run the workers with FUSED_PREPROCESSING
+
+    Returns:
+        the seconds each job took from submission to the execution queue
+    """
+    queues = [rq_queues.job_registration_queue, rq_queues.job_preprocessing_queue]
+    for queue in [*queues, rq_queues.job_execution_queue]:
+        queue.empty()
+
+    env = {**os.environ, "FUSED_PREPROCESSING": "true" if is_fused else "false"}
+    worker_queues = queues[:1] if is_fused else queues
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "rq.cli", "worker", "-q", "-u", _get_redis_url()]
+            + [queue.name],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for queue in worker_queues
+    ]
+
+    try:
+        # the first job only warms the workers up
+        _submit_and_wait(rq_queues, storage)
+        return [_submit_and_wait(rq_queues, storage) for _ in range(jobs)]
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+def _submit_and_wait(rq_queues: QueuePool, storage: Path) -> float:
+    """Submits a job and waits for it to reach the execution queue
+
+    Args:
+        rq_queues: the queues of BCC
+        storage: the directory of the job pools
+
+    Returns:
+        the seconds from submission to the execution queue
+    """
+    job_id = f"{uuid.uuid4()}"
+    job_file = storage / settings.JOB_UPLOAD_POOL_DIRNAME / job_id
+    job = json.loads(_JOB_FIXTURE.read_text())[0]
+    job_file.write_text(json.dumps({**job, "job_id": job_id, "name": "benchmark"}))
+    execution_queue = rq_queues.job_execution_queue
+
+    start = time.perf_counter()
+    rq_queues.job_registration_queue.enqueue(
+        JOB_REGISTER_TASK,
+        job_file,
+        {"name": "benchmark"},
+        job_id=get_rq_job_id(job_id, Location.REG_Q),
+    )
+    while execution_queue.count == 0:
+        if time.perf_counter() - start > _TIMEOUT:
+            raise TimeoutError(f"job {job_id} did not reach the execution queue")
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+
+    execution_queue.empty()
+    (storage / settings.JOB_EXECUTION_POOL_DIRNAME / job_id).unlink(missing_ok=True)
+    return elapsed
+
+
+def _get_redis_url() -> str:
+    """Returns the URL of the redis server in the settings, for the rq workers"""
+    credentials = ""
+    if settings.REDIS_USER or settings.REDIS_PASSWORD:
+        credentials = f"{settings.REDIS_USER or ''}:{settings.REDIS_PASSWORD or ''}@"
+    return (
+        f"redis://{credentials}{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+        f"/{settings.REDIS_DB}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    args = parser.parse_args()
+
+    main(jobs=args.jobs)
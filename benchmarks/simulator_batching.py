@@ -0,0 +1,126 @@
+# This code is part of Tergite
+#
+# (C) Copyright Chalmers Next Labs 2025
+#
+# This code is licensed under the Apache License, Version 2.0. You may
+# obtain a copy of this license in the LICENSE.txt file in the root directory
+# of this source tree or at http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+
+"""Benchmark of the simulation of a qobj one experiment at a time and in batches
+
+A qobj of many copies of the experiment of the simulator job of the test fixtures
+is compiled and run on the one-qubit qiskit dynamics executor of the test fixtures,
+first with one run of the backend per experiment, then with all the experiments
+in one run, and with batches of the given size. No pool of processes is used,
+so the gain is only that of batching.
+
+It needs the settings of the .env file or environment, but neither redis nor MSS.
+
+Usage:
+
+    python -m benchmarks.simulator_batching --experiments 100 --batch-size 25
+"""
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+from typing import Callable
+
+from app.libs.properties.dtos import BackendConfig
+from app.libs.quantum_executor.base.compiler import CompiledQobj, decode_qobj
+from app.libs.quantum_executor.base.executor import QuantumExecutor
+from app.libs.quantum_executor.qiskit.executor import QiskitDynamicsExecutor
+
+_FIXTURES = Path(__file__).parent.parent / "app" / "tests" / "fixtures"
+_JOB_FIXTURE = _FIXTURES / "jobs_to_upload_simulator.json"
+_BACKEND_CONFIG_FILE = _FIXTURES / "backend_config.simq1.toml"
+_SEED_FILE = _FIXTURES / "qiskit_pulse_1q.seed.toml"
+
+
+def main(experiments: int, batch_size: int, repeats: int):
+    """Runs the benchmark
+
+    Args:
+        experiments: the number of experiments in the qobj
+        batch_size: the size of the batches of the last mode
+        repeats: the number of times the qobj is run in each mode
+    """
+    backend_config = BackendConfig.from_toml(_BACKEND_CONFIG_FILE, seed_file=_SEED_FILE)
+    qobj_dict = json.loads(_JOB_FIXTURE.read_text())[0]["params"]["qobj"]
+    # the copies are distinct objects since the decoding of each one modifies it
+    qobj_dict["experiments"] = [
+        copy.deepcopy(qobj_dict["experiments"][idx % len(qobj_dict["experiments"])])
+        for idx in range(experiments)
+    ]
+
+    print(f"experiments: {experiments}, repeats: {repeats}")
+    modes = [
+        ("one run per experiment", 0, QuantumExecutor._run_experiments),
+        ("one run for all experiments", 0, QiskitDynamicsExecutor._run_experiments),
+        (
+            f"one run per {batch_size} experiments",
+            batch_size,
+            QiskitDynamicsExecutor._run_experiments,
+        ),
+    ]
+    for label, size, run_experiments in modes:
+        executor = QiskitDynamicsExecutor.new_one_qubit(
+            backend_config=backend_config, batch_size=size
+        )
+        compiled_qobj = executor.compiler.compile(decode_qobj(copy.deepcopy(qobj_dict)))
+        # the first run only warms the solver up
+        _time_run(executor, compiled_qobj, run_experiments)
+        durations = [
+            _time_run(executor, compiled_qobj, run_experiments) for _ in range(repeats)
+        ]
+        best = min(durations)
+        print(
+            f"{label}: best {best:.3f}s, "
+            f"{1e3 * best / experiments:.2f}ms per experiment"
+        )
+
+
+def _time_run(
+    executor: QiskitDynamicsExecutor,
+    compiled_qobj: CompiledQobj,
+    run_experiments: Callable,
+) -> float:
+    """Runs the experiments of the compiled qobj and returns the seconds it took
+
+    Args:
+        executor: the executor to run the experiments on
+        compiled_qobj: the compiled qobj whose experiments are run
+        run_experiments: the implementation of `_run_experiments` to use
+
+    Returns:
+        the seconds the run took
+    """
+    start = time.perf_counter()
+    results = run_experiments(
+        executor,
+        compiled_qobj.experiments,
+        native_config=compiled_qobj.native_config,
+        logger=None,
+    )
+    elapsed = time.perf_counter() - start
+    assert len(results) == len(compiled_qobj.experiments)
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--experiments", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    main(
+        experiments=args.experiments,
+        batch_size=args.batch_size,
+        repeats=args.repeats,
+    )
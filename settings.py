@@ -20,7 +20,7 @@ from pathlib import Path
 
 import redis
 from starlette.config import Config
-from starlette.datastructures import URL
+from starlette.datastructures import URL, CommaSeparatedStrings
 
 # NOTE: shell env variables take precedence over the configuration file
 env_file = os.environ.get("ENV_FILE", default=".env")
@@ -34,6 +34,9 @@ FIXTURES_DIR = Path(__file__).parent / "app" / "tests" / "fixtures"
 APP_SETTINGS = config("APP_SETTINGS", cast=str, default="production")
 IS_AUTH_ENABLED = config("IS_AUTH_ENABLED", cast=bool, default=True)
 IS_STANDALONE = config("IS_STANDALONE", cast=bool, default=False)
+# the in-process cache of the credentials of the API; a TTL of 0 disables it
+AUTH_CACHE_MAX_SIZE = config("AUTH_CACHE_MAX_SIZE", cast=int, default=10000)
+AUTH_CACHE_TTL = config("AUTH_CACHE_TTL", cast=float, default=30.0)
 _is_production = APP_SETTINGS == "production"
 
 if not IS_AUTH_ENABLED and _is_production:
@@ -57,6 +60,8 @@ LOGFILE_UPLOAD_POOL_DIRNAME = config(
 JOB_UPLOAD_POOL_DIRNAME = config(
     "JOB_UPLOAD_POOL_DIRNAME", cast=str, default="job_upload_pool"
 )
+# the maximum size of an uploaded job file, after decompression
+JOB_UPLOAD_MAX_BYTES = config("JOB_UPLOAD_MAX_BYTES", cast=int, default=1073741824)
 JOB_PRE_PROC_POOL_DIRNAME = config(
     "JOB_PRE_PROC_POOL_DIRNAME", cast=str, default="job_preproc_pool"
 )
@@ -66,6 +71,22 @@ JOB_EXECUTION_POOL_DIRNAME = config(
 JOB_SUPERVISOR_LOG = config(
     "JOB_SUPERVISOR_LOG", cast=str, default="job_supervisor.log"
 )
+# 'text' or 'json' (i.e. JSON lines)
+JOB_SUPERVISOR_LOG_FORMAT = config(
+    "JOB_SUPERVISOR_LOG_FORMAT", cast=str, default="text"
+)
+JOB_SUPERVISOR_LOG_MAX_BYTES = config(
+    "JOB_SUPERVISOR_LOG_MAX_BYTES", cast=int, default=10 * 1024 * 1024
+)
+JOB_SUPERVISOR_LOG_BACKUP_COUNT = config(
+    "JOB_SUPERVISOR_LOG_BACKUP_COUNT", cast=int, default=5
+)
+JOB_SUPERVISOR_LOG_BATCH_SIZE = config(
+    "JOB_SUPERVISOR_LOG_BATCH_SIZE", cast=int, default=100
+)
+JOB_SUPERVISOR_LOG_FLUSH_INTERVAL = config(
+    "JOB_SUPERVISOR_LOG_FLUSH_INTERVAL", cast=float, default=1.0
+)
 EXECUTOR_DATA_DIRNAME = config(
     "EXECUTOR_DATA_DIRNAME", cast=str, default="executor_data"
 )
@@ -77,6 +98,45 @@ if not os.path.exists(_executor_data_dir_path):
     os.makedirs(_executor_data_dir_path)
 EXECUTOR_DATA_DIR = _executor_data_dir_path
 
+# Finished, failed and cancelled jobs are moved out of redis into the SQLite
+# archive JOB_ARCHIVE_AGE seconds after they got to that state, by the API every
+# JOB_ARCHIVE_INTERVAL seconds. A JOB_ARCHIVE_AGE of 0 disables the archiving.
+JOB_ARCHIVE_FILE = config(
+    "JOB_ARCHIVE_FILE",
+    cast=str,
+    default=os.path.join(STORAGE_ROOT, DEFAULT_PREFIX, "job_archive.sqlite3"),
+)
+JOB_ARCHIVE_AGE = config("JOB_ARCHIVE_AGE", cast=float, default=7 * 24 * 3600.0)
+JOB_ARCHIVE_INTERVAL = config("JOB_ARCHIVE_INTERVAL", cast=float, default=600.0)
+
+# The stages whose queues dispatch the jobs by their priorities instead of first come,
+# among 'registration', 'pre_processing', 'execution' and 'post_processing'.
+# A job waiting QUEUE_AGING_INTERVAL seconds gains one level of priority over
+# the jobs enqueued after it, so that low priority jobs are never starved.
+PRIORITY_QUEUES = config(
+    "PRIORITY_QUEUES", cast=CommaSeparatedStrings, default="execution"
+)
+QUEUE_AGING_INTERVAL = config("QUEUE_AGING_INTERVAL", cast=float, default=60.0)
+
+# The approximate number of the latest job transitions kept in the redis stream
+# from which the analytics of the stages are computed
+JOB_TRANSITIONS_MAXLEN = config("JOB_TRANSITIONS_MAXLEN", cast=int, default=100000)
+
+# Whether the registration worker also pre-processes the jobs, enqueueing them
+# for execution directly instead of through the pre-processing queue and worker
+FUSED_PREPROCESSING = config("FUSED_PREPROCESSING", cast=bool, default=False)
+
+# Whether the execution worker runs the jobs in its own long-lived process, keeping
+# the executor warm, instead of forking a work horse per job. It stops, to be
+# restarted, once its memory grows by more than EXECUTION_WORKER_MAX_MEMORY_GROWTH
+# bytes; 0 disables that limit.
+LONG_LIVED_EXECUTION_WORKER = config(
+    "LONG_LIVED_EXECUTION_WORKER", cast=bool, default=False
+)
+EXECUTION_WORKER_MAX_MEMORY_GROWTH = config(
+    "EXECUTION_WORKER_MAX_MEMORY_GROWTH", cast=int, default=2 * 1024 * 1024 * 1024
+)
+
 # Definition of backend property names
 BACKEND_SETTINGS = config(
     "BACKEND_SETTINGS",
@@ -123,6 +183,18 @@ if APP_SETTINGS == "test" and not os.environ.get("BLACKLISTED"):
 # - dot-env-template.txt
 EXECUTOR_TYPE = config("EXECUTOR_TYPE", default="quantify")
 
+# The simulators, i.e. the qiskit_pulse_* executors, control no shared hardware so
+# SIMULATOR_EXECUTION_WORKERS execution workers run jobs in parallel, each simulating
+# the experiments of its job in a pool of SIMULATOR_POOL_SIZE processes.
+# A SIMULATOR_POOL_SIZE of 0 shares the cores of the machine among the workers.
+# Only long-lived execution workers simulate in a pool, started by the first job of
+# several batches; forking workers simulate in their own process.
+SIMULATOR_EXECUTION_WORKERS = config("SIMULATOR_EXECUTION_WORKERS", cast=int, default=1)
+SIMULATOR_POOL_SIZE = config("SIMULATOR_POOL_SIZE", cast=int, default=0)
+# The maximum number of experiments of a job that a simulator runs in one batch,
+# i.e. in a single run of its backend. 0 runs all the experiments of a job at once.
+SIMULATOR_BATCH_SIZE = config("SIMULATOR_BATCH_SIZE", cast=int, default=100)
+
 # This will load the hardware configuration from a yaml file, which contains the properties for the
 # cluster or other instrument setup. For more information check:
 # - quantify-config.example.yml
@@ -133,6 +205,18 @@ QUANTIFY_CONFIG_FILE = config(
 QUANTIFY_METADATA_FILE = config(
     "QUANTIFY_METADATA_FILE", default=Path(__file__).parent / "quantify-metadata.yml"
 )
+# The compiled quantify schedules are cached in COMPILED_SCHEDULE_CACHE_DIR, keyed by
+# the schedule, the quantify config and the calibration version. The least recently
+# used ones are evicted once they take more than COMPILED_SCHEDULE_CACHE_MAX_BYTES.
+# A COMPILED_SCHEDULE_CACHE_MAX_BYTES of 0 disables the cache.
+COMPILED_SCHEDULE_CACHE_DIR = config(
+    "COMPILED_SCHEDULE_CACHE_DIR",
+    cast=str,
+    default=os.path.join(STORAGE_ROOT, DEFAULT_PREFIX, "compiled_schedule_cache"),
+)
+COMPILED_SCHEDULE_CACHE_MAX_BYTES = config(
+    "COMPILED_SCHEDULE_CACHE_MAX_BYTES", cast=int, default=1024 * 1024 * 1024
+)
 
 # -------------
 # Redis config
@@ -142,6 +226,8 @@ REDIS_PORT = config("REDIS_PORT", default=6379)
 REDIS_USER = config("REDIS_USER", default=None)
 REDIS_PASSWORD = config("REDIS_PASSWORD", default=None)
 REDIS_DB = config("REDIS_DB", cast=int, default=0)
+# the maximum number of connections in the pool of the async connection used by the API
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", cast=int, default=50)
 
 # For convenience to import globally
 REDIS_CONNECTION = redis.Redis(
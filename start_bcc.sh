@@ -27,6 +27,12 @@ should_be_int() {
   [[ ! "$val" =~ ^[0-9]+$ ]]  &&  exit_with_error "$msg";
 }
 
+# whether the value is true as the settings read booleans i.e. 'true' or '1' in any case
+is_true() {
+  local val="${1,,}";
+  [[ "$val" = "true" || "$val" = "1" ]];
+}
+
 load_env() {
   local env_file="$1";
   if [ ! -f "$env_file" ]; then
@@ -134,8 +140,29 @@ fi
 
 # Worker processes
 rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_job_registration" &
-rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_job_preprocessing" &
-rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_job_execution" &
+if ! is_true "$FUSED_PREPROCESSING"; then
+  rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_job_preprocessing" &
+fi
+# simulators share no hardware so several execution workers can run their jobs in parallel
+execution_workers=1
+if [[ "$EXECUTOR_TYPE" = qiskit_pulse_* ]]; then
+  execution_workers=$(var_or_default "$SIMULATOR_EXECUTION_WORKERS" "1")
+  should_be_int "$execution_workers" "Config Error. Use SIMULATOR_EXECUTION_WORKERS=<int> in the .env file.";
+fi
+for _ in $(seq "$execution_workers"); do
+  if is_true "$LONG_LIVED_EXECUTION_WORKER"; then
+    # restarted whenever it stops e.g. when its memory has grown too much
+    (
+      while true; do
+        rq worker -u "$REDIS_URL" \
+          -w app.services.jobs.workers.execution.long_lived.LongLivedWorker \
+          "${DEFAULT_PREFIX}_job_execution" || sleep 1;
+      done
+    ) &
+  else
+    rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_job_execution" &
+  fi
+done
 rq worker -u "$REDIS_URL" "${DEFAULT_PREFIX}_logfile_postprocessing" &
 
 # REST-API